@@ -1,8 +1,30 @@
+import asyncio
 import os
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
+from vm_poc_common import fastjson
+from vm_poc_common.fastjson import FastJSONResponse
+from vm_poc_common.metrics import install_metrics
+from app.synthetic import (
+    ECHO_MAX_DELAY_MS,
+    ECHO_MAX_RESPONSE_BYTES,
+    LATENCY_DISTRIBUTIONS,
+    parse_status_mix,
+    payload,
+    payload_chunks,
+    pick_status,
+    read_body_chunks,
+    sample_delay,
+)
 
-app = FastAPI(title="VM POC Echo Service")
+SERVICE_NAME = os.getenv("SERVICE_NAME", "vm-poc-backend-echo")
+
+app = FastAPI(title="VM POC Echo Service", default_response_class=FastJSONResponse)
+install_metrics(app, SERVICE_NAME)
+
+# Status codes that must not carry a body
+_BODYLESS = {204, 304}
 
 
 @app.get("/healthz")
@@ -12,15 +34,81 @@ def health_check() -> dict:
 
 
 @app.post("/echo")
-async def echo_payload(request: Request) -> dict:
+async def echo_payload(request: Request) -> FastJSONResponse:
     """Return the request JSON body along with contextual metadata."""
-    payload = await request.json()
-    return {
-        "service": os.getenv("SERVICE_NAME", "vm-poc-backend-echo"),
-        "received": payload,
-    }
+    chunks, _ = await read_body_chunks(request)
+    try:
+        body = fastjson.loads(b"".join(chunks))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Request body is not valid JSON")
+    # Freshly parsed JSON needs no jsonable_encoder pass
+    return FastJSONResponse({
+        "service": SERVICE_NAME,
+        "received": body,
+    })
+
+
+@app.post("/echo/raw")
+async def echo_raw(request: Request) -> StreamingResponse:
+    """Send the request body back byte for byte, with its content type, without parsing it.
+
+    The body is read completely (up to ``ECHO_MAX_BODY_BYTES``) before the reply
+    starts, so clients that upload everything before reading cannot deadlock.
+    """
+    chunks, total = await read_body_chunks(request)
+    return StreamingResponse(
+        iter(chunks),
+        media_type=request.headers.get("content-type", "application/octet-stream"),
+        headers={"Content-Length": str(total)},
+    )
+
+
+@app.get("/synthetic")
+@app.post("/synthetic")
+async def synthetic(
+    request: Request,
+    size: int = Query(1024, ge=0, le=ECHO_MAX_RESPONSE_BYTES, description="Response body size in bytes"),
+    format: str = Query("json", pattern="^(json|bytes)$", description="`json` padding object or raw `bytes`"),
+    latency_ms: float = Query(0.0, ge=0, le=ECHO_MAX_DELAY_MS, description="Mean delay before responding"),
+    jitter_ms: float = Query(0.0, ge=0, le=ECHO_MAX_DELAY_MS, description="Spread of the delay"),
+    distribution: str = Query("fixed", description=f"Delay distribution: {', '.join(LATENCY_DISTRIBUTIONS)}"),
+    status: str = Query("200", description="Status code, or a weighted mix such as `200:90,503:8,500:2`"),
+    chunk_size: int = Query(0, ge=0, le=ECHO_MAX_RESPONSE_BYTES, description="Stream the body in chunks of this size"),
+    chunk_delay_ms: float = Query(0.0, ge=0, le=ECHO_MAX_DELAY_MS, description="Pause between streamed chunks"),
+) -> Response:
+    """Tunable response for load tests: payload size, latency distribution, status mix and chunking.
+
+    A POST body is read and discarded (subject to ``ECHO_MAX_BODY_BYTES``) so
+    upload cost can be measured too.
+    """
+    codes, weights = parse_status_mix(status)
+    delay = sample_delay(distribution, latency_ms, jitter_ms)
+    _, received = await read_body_chunks(request, keep=False)
+    if delay:
+        await asyncio.sleep(delay)
+
+    status_code = pick_status(codes, weights)
+    headers = {"X-Echo-Delay-Ms": f"{delay * 1000:.1f}", "X-Echo-Received-Bytes": str(received)}
+    media_type = "application/json" if format == "json" else "application/octet-stream"
+    if status_code in _BODYLESS:
+        return Response(status_code=status_code, headers=headers)
+    if not chunk_size:
+        return Response(content=payload(size, format == "json"), status_code=status_code,
+                        media_type=media_type, headers=headers)
+
+    async def chunks():
+        for index, chunk in enumerate(payload_chunks(size, chunk_size, format == "json")):
+            if index and chunk_delay_ms:
+                await asyncio.sleep(chunk_delay_ms / 1000.0)
+            yield chunk
+
+    return StreamingResponse(chunks(), status_code=status_code, media_type=media_type, headers=headers)
 
 
 @app.get("/")
 def root() -> dict:
-    return {"message": "Send a POST /echo with JSON payload to see it mirrored back."}
+    return {
+        "message": "Send a POST /echo with JSON payload to see it mirrored back.",
+        "load_testing": "POST /echo/raw mirrors any body unparsed; /synthetic?size=&latency_ms=&status= "
+                        "returns a tunable response.",
+    }
@@ -0,0 +1,133 @@
+# app/synthetic.py
+"""Building blocks for the echo service's load-testing modes.
+
+Request bodies are read with a size cap and never joined or parsed unless a
+route needs to. Synthetic payloads are sliced from one filler block built at
+import time, so a response costs a single copy (one slice per chunk when
+streaming). Latency is drawn from a configurable distribution and the status
+code from a weighted mix.
+"""
+import math
+import os
+import random
+import string
+from typing import List, Sequence, Tuple
+
+from fastapi import HTTPException, Request
+
+# Bodies above this are rejected with 413 before (or while) they are read
+ECHO_MAX_BODY_BYTES = int(os.getenv("ECHO_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+# Largest synthetic payload a query string may ask for
+ECHO_MAX_RESPONSE_BYTES = int(os.getenv("ECHO_MAX_RESPONSE_BYTES", str(64 * 1024 * 1024)))
+# Upper bound for any single injected delay
+ECHO_MAX_DELAY_MS = float(os.getenv("ECHO_MAX_DELAY_MS", "30000"))
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "exponential", "lognormal")
+
+# Printable so it is valid inside a JSON string; letters and digits keep
+# ingress gzip from shrinking it to nothing
+_FILLER = "".join(random.Random(0).choices(string.ascii_letters + string.digits, k=64 * 1024)).encode("ascii")
+_JSON_PREFIX = b'{"padding":"'
+_JSON_SUFFIX = b'"}'
+
+
+async def read_body_chunks(request: Request, limit: int = ECHO_MAX_BODY_BYTES, keep: bool = True) -> Tuple[List[bytes], int]:
+    """Read the body as received; returns ``(chunks, total_bytes)`` and raises 413 past ``limit``.
+
+    With ``keep=False`` the chunks are counted and dropped.
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+    chunks: List[bytes] = []
+    total = 0
+    async for chunk in request.stream():
+        total += len(chunk)
+        if total > limit:
+            raise HTTPException(status_code=413, detail=f"Request body exceeds {limit} bytes")
+        if keep and chunk:
+            chunks.append(chunk)
+    return chunks, total
+
+
+def parse_status_mix(spec: str) -> Tuple[List[int], List[float]]:
+    """``"200"`` or weighted ``"200:90,503:8,500:2"`` -> (codes, weights)."""
+    codes: List[int] = []
+    weights: List[float] = []
+    try:
+        for part in spec.split(","):
+            code, _, weight = part.strip().partition(":")
+            codes.append(int(code))
+            weights.append(float(weight) if weight else 1.0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid status mix {spec!r}; expected e.g. 200:90,503:10")
+    if any(not 200 <= code <= 599 for code in codes) or any(w < 0 for w in weights) or sum(weights) <= 0:
+        raise HTTPException(status_code=400, detail=f"Invalid status mix {spec!r}")
+    return codes, weights
+
+
+def pick_status(codes: Sequence[int], weights: Sequence[float]) -> int:
+    if len(codes) == 1:
+        return codes[0]
+    return random.choices(codes, weights)[0]
+
+
+def sample_delay(distribution: str, latency_ms: float, jitter_ms: float) -> float:
+    """One delay in seconds; ``latency_ms`` is the mean (the median for lognormal)."""
+    if latency_ms <= 0 and jitter_ms <= 0:
+        return 0.0
+    if distribution == "fixed":
+        delay = latency_ms
+    elif distribution == "uniform":
+        delay = random.uniform(latency_ms - jitter_ms, latency_ms + jitter_ms)
+    elif distribution == "normal":
+        delay = random.gauss(latency_ms, jitter_ms)
+    elif distribution == "exponential":
+        delay = random.expovariate(1.0 / latency_ms) if latency_ms > 0 else 0.0
+    elif distribution == "lognormal":
+        # jitter_ms widens the tail: sigma = ln(1 + jitter/median)
+        sigma = (jitter_ms / latency_ms) if latency_ms > 0 else 0.0
+        delay = random.lognormvariate(0.0, math.log1p(sigma)) * latency_ms
+    else:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown latency distribution {distribution!r}; use one of {LATENCY_DISTRIBUTIONS}"
+        )
+    return min(max(delay, 0.0), ECHO_MAX_DELAY_MS) / 1000.0
+
+
+def payload(size: int, as_json: bool) -> bytes:
+    """``size`` bytes of filler; as JSON, ``{"padding": "..."}`` padded to ``size`` (minimum 14)."""
+    if as_json:
+        inner = max(size - len(_JSON_PREFIX) - len(_JSON_SUFFIX), 0)
+        return b"".join((_JSON_PREFIX, *_filler_parts(inner), _JSON_SUFFIX))
+    return b"".join(_filler_parts(size))
+
+
+def payload_chunks(size: int, chunk_size: int, as_json: bool):
+    """The same bytes as ``payload`` as a sequence of at most ``chunk_size``-byte pieces."""
+    if not as_json:
+        for start in range(0, size, chunk_size):
+            yield _slice(start, min(chunk_size, size - start))
+        return
+    inner = max(size - len(_JSON_PREFIX) - len(_JSON_SUFFIX), 0)
+    yield _JSON_PREFIX
+    for start in range(0, inner, chunk_size):
+        yield _slice(start, min(chunk_size, inner - start))
+    yield _JSON_SUFFIX
+
+
+def _slice(start: int, length: int) -> bytes:
+    offset = start % len(_FILLER)
+    if offset + length <= len(_FILLER):
+        return _FILLER[offset:offset + length]
+    return b"".join(_filler_parts(length, offset))
+
+
+def _filler_parts(size: int, offset: int = 0) -> List[bytes]:
+    parts = []
+    while size > 0:
+        piece = _FILLER[offset:offset + size]
+        parts.append(piece)
+        size -= len(piece)
+        offset = 0
+    return parts
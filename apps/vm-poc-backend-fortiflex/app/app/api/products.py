@@ -1,113 +1,171 @@
-import logging
-import os
-from functools import lru_cache
-from typing import List, Dict, Any
+import base64
+import binascii
+import hashlib
+import json
+import re
+from typing import List, Dict, Any, Iterable, Optional
 
-import boto3
-from botocore.exceptions import BotoCoreError, ClientError
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-logger = logging.getLogger(__name__)
+from app.catalog import CatalogSnapshot, catalog
+from vm_poc_common.fastjson import FastJSONResponse
+from app.http_cache import (
+    CATALOG_CACHE_CONTROL,
+    choose_encoding,
+    etag_matches,
+    not_modified_since,
+)
 
 router = APIRouter()
 
-_FALLBACK_PRODUCTS: List[Dict[str, Any]] = [
-    {
-        "id": "1",
-        "name": "FortiGate VM Base",
-        "sku": "FG-VM-BUNDLE",
-        "cloud": "AWS",
-        "price": "0.12/hr",
-        "description": "1 vCPU, 2GB RAM, basic firewall",
-        "title": "FortiGate VM01 Base",
-        "image_url": "images/FortiGate-VM01.png",
-    },
-    {
-        "id": "2",
-        "name": "FortiGate VM Advanced",
-        "sku": "FG-VM-ADVANCED",
-        "cloud": "AWS",
-        "price": "0.24/hr",
-        "description": "2 vCPU, 4GB RAM, advanced firewall features",
-        "title": "FortiGate VM02 Advanced",
-        "image_url": "images/FortiGate-VM02.png",
-    },
-    {
-        "id": "3",
-        "name": "FortiGate VM HA",
-        "sku": "FG-VM-HA",
-        "cloud": "AWS",
-        "price": "0.48/hr",
-        "description": "4 vCPU, 8GB RAM, premium firewall features",
-        "title": "FortiGate VM03 Premium",
-        "image_url": "images/FortiGate-VM-HA.png",
-    },
-    {
-        "id": "4",
-        "name": "FortiGate VM MAX",
-        "sku": "FG-VM-MAX",
-        "cloud": "AWS",
-        "price": "0.96/hr",
-        "description": "8 vCPU, 16GB RAM, enterprise-grade firewall",
-        "title": "FortiGate VM MAX",
-        "image_url": "images/FortiGate-VM-MAX.png",
-    },
-    {
-        "id": "5",
-        "name": "FortiGate FLEX",
-        "sku": "FG-FLEX",
-        "cloud": "AWS",
-        "price": "1.92/hr",
-        "description": "16 vCPU, 32GB RAM, ultimate firewall features",
-        "title": "FortiGate FLEX",
-        "image_url": "images/FortiGate-Flex.png",
-    },
-]
-
-
-def _dynamodb_resource_kwargs() -> Dict[str, Any]:
-    kwargs: Dict[str, Any] = {}
-    region = os.getenv("AWS_REGION")
-    endpoint = os.getenv("AWS_ENDPOINT_URL_DYNAMODB")
-    if region:
-        kwargs["region_name"] = region
-    if endpoint:
-        kwargs["endpoint_url"] = endpoint
-    return kwargs
-
-
-@lru_cache(maxsize=1)
-def _products_table():
-    table_name = os.getenv("PRODUCTS_TABLE_NAME")
-    if not table_name:
-        logger.info("PRODUCTS_TABLE_NAME not set; serving fallback catalog.")
+SORTABLE_FIELDS = {"id", "name", "title", "sku", "cloud", "price"}
+MAX_PAGE_SIZE = 500
+
+_PRICE_RE = re.compile(r"[-+]?\d*\.?\d+")
+
+
+def _price_value(item: Dict[str, Any]) -> Optional[float]:
+    """Numeric part of prices such as "0.12/hr"; None when absent or unparsable."""
+    price = item.get("price")
+    if price is None:
         return None
+    match = _PRICE_RE.search(str(price))
+    return float(match.group()) if match else None
+
+
+def _encode_cursor(offset: int, version: str) -> str:
+    raw = json.dumps({"o": offset, "v": version}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
+
+def _decode_cursor(cursor: str, version: str) -> int:
+    """Offset from a cursor issued for catalog ``version``; 409 once the catalog has changed."""
     try:
-        dynamodb = boto3.resource("dynamodb", **_dynamodb_resource_kwargs())
-        return dynamodb.Table(table_name)
-    except (BotoCoreError, ClientError) as exc:
-        logger.warning("Unable to initialise DynamoDB table %s: %s", table_name, exc)
-        return None
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded))
+        offset, cursor_version = int(decoded["o"]), str(decoded["v"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_version != version:
+        # Offsets into another version could skip or repeat products
+        raise HTTPException(status_code=409, detail="Catalog changed since this cursor was issued; restart without a cursor")
+    return offset
+
+
+def _candidates(snapshot: CatalogSnapshot, cloud: Optional[str], sku: Optional[str]) -> Iterable[Dict[str, Any]]:
+    # Start from the smallest pre-built index the filters allow
+    if sku:
+        items = snapshot.by_sku.get(sku.lower(), ())
+        if cloud:
+            return [item for item in items if str(item.get("cloud", "")).lower() == cloud.lower()]
+        return items
+    if cloud:
+        return snapshot.by_cloud.get(cloud.lower(), ())
+    return snapshot.items
+
+
+def _not_modified(request: Request, etags, modified_ts: float) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since
+        return etag_matches(if_none_match, etags)
+    return not_modified_since(request.headers.get("if-modified-since"), modified_ts)
+
+
+def _full_catalog_response(request: Request, snapshot: CatalogSnapshot) -> Response:
+    encoded = snapshot.encoded
+    coding = choose_encoding(request.headers.get("accept-encoding"), encoded.bodies)
+    headers = {
+        "ETag": encoded.etag_for(coding),
+        "Last-Modified": encoded.last_modified,
+        "Cache-Control": CATALOG_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if _not_modified(request, encoded.etags, encoded.last_modified_ts):
+        return Response(status_code=304, headers=headers)
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(content=encoded.bodies[coding], media_type="application/json", headers=headers)
 
 
 @router.get("/api/products")
-def get_products() -> List[Dict[str, Any]]:
-    table = _products_table()
-    if not table:
-        return _FALLBACK_PRODUCTS
+async def get_products(
+    request: Request,
+    response: Response,
+    cloud: Optional[str] = Query(None, description="Only products for this cloud (case-insensitive)"),
+    sku: Optional[str] = Query(None, description="Only products with this SKU (case-insensitive)"),
+    min_price: Optional[float] = Query(None, description="Minimum hourly price"),
+    max_price: Optional[float] = Query(None, description="Maximum hourly price"),
+    sort: Optional[str] = Query(None, description="Sort field, prefix with '-' for descending"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+) -> List[Dict[str, Any]]:
+    """Return the catalog, optionally filtered, sorted, projected and paginated.
 
-    try:
-        response = table.scan()
-    except (BotoCoreError, ClientError) as exc:
-        logger.warning(
-            "Failed to read products from DynamoDB table %s: %s", table.name, exc
-        )
-        return _FALLBACK_PRODUCTS
-
-    items: List[Dict[str, Any]] = response.get("Items", [])
-    if not items:
-        logger.info("DynamoDB table %s is empty; returning fallback catalog.", table.name)
-        return _FALLBACK_PRODUCTS
-
-    return sorted(items, key=lambda item: item.get("id", ""))
+    With no parameters the full catalog is returned exactly as before, from a
+    body pre-encoded once per catalog version (gzip/br when accepted) with a
+    strong ETag and ``304 Not Modified`` support. When more pages exist the opaque cursor for the next one is sent in the
+    ``X-Next-Cursor`` header and the filtered total in ``X-Total-Count``. A cursor is only valid for the catalog
+    version it was issued for; after a change it is rejected with 409 and paging restarts from the top.
+    """
+    if not catalog.loaded and (cloud or sku):
+        # Cold start: answer from the cloud/SKU index while the full load runs. No
+        # match may only mean the items predate the index keys, so ask the snapshot
+        catalog.load_in_background()
+        items = await catalog.lookup(cloud, sku)
+        if not items:
+            items = list(_candidates(await catalog.ensure_loaded(), cloud, sku))
+        # Index results belong to no snapshot: their cursors expire once it loads
+        version = catalog.snapshot.version
+    else:
+        snapshot = await catalog.ensure_loaded()
+        if not any((cloud, sku, min_price is not None, max_price is not None, sort, fields, limit, cursor)):
+            return _full_catalog_response(request, snapshot)
+
+        # Query results are derived from one catalog version: weak ETag per (version, query)
+        query_hash = hashlib.sha256(str(request.query_params).encode("utf-8")).hexdigest()[:16]
+        etag = f'W/"{snapshot.version}-{query_hash}"'
+        validators = {
+            "ETag": etag,
+            "Last-Modified": snapshot.encoded.last_modified,
+            "Cache-Control": CATALOG_CACHE_CONTROL,
+        }
+        if _not_modified(request, {etag}, snapshot.encoded.last_modified_ts):
+            return Response(status_code=304, headers=validators)
+        response.headers.update(validators)
+        items = _candidates(snapshot, cloud, sku)
+        version = snapshot.version
+
+    if min_price is not None or max_price is not None:
+        low = float("-inf") if min_price is None else min_price
+        high = float("inf") if max_price is None else max_price
+        items = [item for item in items if (price := _price_value(item)) is not None and low <= price <= high]
+
+    if sort:
+        field = sort.lstrip("-")
+        if field not in SORTABLE_FIELDS:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by {field!r}")
+        if field == "price":
+            sort_key = lambda item: (_price_value(item) is None, _price_value(item) or 0.0)
+        else:
+            sort_key = lambda item: str(item.get(field, ""))
+        items = sorted(items, key=sort_key, reverse=sort.startswith("-"))
+    else:
+        items = list(items)
+
+    total = len(items)
+    offset = _decode_cursor(cursor, version) if cursor else 0
+    end = total if limit is None else offset + limit
+    page = items[offset:end]
+    response.headers["X-Total-Count"] = str(total)
+    if end < total:
+        response.headers["X-Next-Cursor"] = _encode_cursor(end, version)
+
+    if fields:
+        wanted = [name.strip() for name in fields.split(",") if name.strip()]
+        page = [{name: item[name] for name in wanted if name in item} for item in page]
+    # Catalog items are already plain JSON data: skip response-model validation
+    return FastJSONResponse(page, headers=response.headers)
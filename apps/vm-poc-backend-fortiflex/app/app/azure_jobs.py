@@ -0,0 +1,298 @@
+# app/azure_jobs.py
+"""Background tracking of Azure Automation webhook runs behind ``/api/azuremagic``.
+
+``submit`` returns a job immediately and a task does the slow part: post to
+``AZURE_WEBHOOK_URL``, then poll the
+resulting Automation job until it reaches a final state. Polling needs
+``AZURE_AUTOMATION_JOB_URL``, a URL template with a ``{job_id}`` placeholder
+(normally the ARM ``.../automationAccounts/<name>/jobs/{job_id}?api-version=...``
+endpoint), plus either ``AZURE_AUTOMATION_BEARER_TOKEN`` or the
+``AZURE_TENANT_ID``/``AZURE_CLIENT_ID``/``AZURE_CLIENT_SECRET`` of a service
+principal. Without it the job ends as ``submitted`` once Azure accepts the
+webhook call.
+
+The webhook starts a runbook, so it is only retried when Azure cannot have
+acted on the call: a connection that never opened, or a 429. A timeout or a
+5xx after the request went out ends the job as ``unknown``, since the runbook
+may or may not be running.
+
+Repeat submissions for the same ``flexentitlementtoken`` return the job
+already in flight (or one that completed within ``AZURE_DEDUP_SECONDS``)
+instead of launching a second VM. Every state change bumps ``version`` and
+wakes long-poll and SSE watchers.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from app.http_client import get_http_client
+from app.token_cache import TokenCache
+from app.upstream import parse_retry_after
+
+logger = logging.getLogger(__name__)
+
+AZURE_WEBHOOK_URL = os.getenv(
+    "AZURE_WEBHOOK_URL",
+    "https://f1dcf3d2-d4e7-45f4-ac93-5394986d1fb4.webhook.eus.azure-automation.net/webhooks?token=rxkK0Qcjo5xDG4xBGkKhF1ixbqIdLaHTI3oop1XJ2BY%3d",
+)
+AZURE_AUTOMATION_JOB_URL = os.getenv("AZURE_AUTOMATION_JOB_URL")
+AZURE_AUTOMATION_BEARER_TOKEN = os.getenv("AZURE_AUTOMATION_BEARER_TOKEN")
+AZURE_TENANT_ID = os.getenv("AZURE_TENANT_ID")
+AZURE_CLIENT_ID = os.getenv("AZURE_CLIENT_ID")
+AZURE_CLIENT_SECRET = os.getenv("AZURE_CLIENT_SECRET")
+AZURE_LOGIN_BASE = os.getenv("AZURE_LOGIN_BASE", "https://login.microsoftonline.com").rstrip("/")
+AZURE_MANAGEMENT_SCOPE = os.getenv("AZURE_MANAGEMENT_SCOPE", "https://management.azure.com/.default")
+
+AZURE_WEBHOOK_ATTEMPTS = int(os.getenv("AZURE_WEBHOOK_ATTEMPTS", "4"))
+AZURE_POLL_INITIAL = float(os.getenv("AZURE_POLL_INITIAL", "2"))
+AZURE_POLL_MAX = float(os.getenv("AZURE_POLL_MAX", "30"))
+AZURE_POLL_FACTOR = float(os.getenv("AZURE_POLL_FACTOR", "1.6"))
+AZURE_POLL_TIMEOUT = float(os.getenv("AZURE_POLL_TIMEOUT", "3600"))
+AZURE_DEDUP_SECONDS = float(os.getenv("AZURE_DEDUP_SECONDS", "900"))
+AZURE_JOB_RETENTION = float(os.getenv("AZURE_JOB_RETENTION", "86400"))
+
+# Automation job states that will not change again
+FINAL_AZURE_STATES = {"Completed", "Failed", "Stopped", "Suspended"}
+TERMINAL = {"submitted", "completed", "failed", "unknown"}
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+# Failures where the webhook call cannot have reached Azure
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class WebhookOutcomeUnknown(RuntimeError):
+    """The webhook call may have started the runbook; retrying could launch it twice."""
+
+
+@dataclass
+class AzureJob:
+    id: str
+    token_hash: str
+    user: Optional[str]
+    status: str = "queued"  # queued -> submitting -> running -> completed | failed | submitted | unknown
+    azure_job_ids: List[str] = field(default_factory=list)
+    azure_status: Optional[str] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    version: int = 0
+
+    def public(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("token_hash")
+        data["status_url"] = f"/api/azuremagic/{self.id}"
+        data["events_url"] = f"/api/azuremagic/{self.id}/events"
+        return data
+
+
+def backoff_delays(initial: float, factor: float, maximum: float):
+    """Exponential delays with +/-20% jitter so many watchers don't poll in lockstep."""
+    delay = initial
+    while True:
+        yield delay * random.uniform(0.8, 1.2)
+        delay = min(delay * factor, maximum)
+
+
+def _job_ids(response: httpx.Response) -> List[str]:
+    """Job ids from an accepted webhook reply; the runbook has started either way, so never raise."""
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    job_ids = body.get("JobIds") if isinstance(body, dict) else None
+    if not isinstance(job_ids, list):
+        logger.warning("Azure webhook accepted the call but returned no JobIds: %s", response.text[:200])
+        return []
+    return [str(job_id) for job_id in job_ids]
+
+
+class AzureJobTracker:
+    def __init__(self):
+        self.jobs: Dict[str, AzureJob] = {}
+        self._by_token: Dict[str, str] = {}
+        self._tasks: Dict[str, "asyncio.Task[None]"] = {}
+        self._changed: Optional[asyncio.Condition] = None
+        self._arm_tokens = TokenCache(refresh_margin=300)
+
+    @property
+    def changed(self) -> asyncio.Condition:
+        if self._changed is None:
+            self._changed = asyncio.Condition()
+        return self._changed
+
+    # ------------------------------------------------------------ public API
+    def submit(self, flex_token: str, user: Optional[str]):
+        """Return ``(job, created)``; ``created`` is False for a deduplicated repeat."""
+        self._prune()
+        token_hash = hashlib.sha256(flex_token.encode("utf-8")).hexdigest()
+        existing = self.jobs.get(self._by_token.get(token_hash, ""))
+        if existing is not None and self._dedupes(existing):
+            return existing, False
+
+        job = AzureJob(id=uuid.uuid4().hex, token_hash=token_hash, user=user)
+        self.jobs[job.id] = job
+        self._by_token[token_hash] = job.id
+        self._tasks[job.id] = asyncio.create_task(self._run(job, {"user": user, "flexentitlementtoken": flex_token}))
+        self._tasks[job.id].add_done_callback(lambda _t, job_id=job.id: self._tasks.pop(job_id, None))
+        return job, True
+
+    def get(self, job_id: str) -> Optional[AzureJob]:
+        return self.jobs.get(job_id)
+
+    async def wait_for_change(self, job: AzureJob, since: int, timeout: float) -> AzureJob:
+        """Long-poll: return once ``job.version`` passes ``since``, the job ends, or ``timeout`` expires."""
+        async with self.changed:
+            try:
+                await asyncio.wait_for(
+                    self.changed.wait_for(lambda: job.version > since or job.status in TERMINAL), timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+        return job
+
+    async def stop(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ------------------------------------------------------------ internals
+    @staticmethod
+    def _dedupes(job: AzureJob) -> bool:
+        if job.status not in TERMINAL:
+            return True
+        if job.status == "failed":
+            return False  # let the user retry
+        # "unknown" dedupes like a success: the VM may be on its way
+        return time.time() - (job.finished_at or 0) < AZURE_DEDUP_SECONDS
+
+    def _prune(self) -> None:
+        cutoff = time.time() - AZURE_JOB_RETENTION
+        for job_id in [j.id for j in self.jobs.values() if j.status in TERMINAL and (j.finished_at or 0) < cutoff]:
+            job = self.jobs.pop(job_id)
+            if self._by_token.get(job.token_hash) == job_id:
+                del self._by_token[job.token_hash]
+
+    async def _update(self, job: AzureJob, **changes: Any) -> None:
+        for name, value in changes.items():
+            setattr(job, name, value)
+        job.updated_at = time.time()
+        if job.status in TERMINAL and job.finished_at is None:
+            job.finished_at = job.updated_at
+        job.version += 1
+        async with self.changed:
+            self.changed.notify_all()
+
+    async def _run(self, job: AzureJob, payload: Dict[str, Any]) -> None:
+        try:
+            await self._update(job, status="submitting")
+            job_ids = await self._post_webhook(payload)
+            if not AZURE_AUTOMATION_JOB_URL or not job_ids:
+                await self._update(job, status="submitted", azure_job_ids=job_ids)
+                return
+            await self._update(job, status="running", azure_job_ids=job_ids)
+            await self._poll(job, job_ids[0])
+        except asyncio.CancelledError:
+            raise
+        except WebhookOutcomeUnknown as exc:
+            logger.warning("Azure automation job %s: %s", job.id, exc)
+            await self._update(job, status="unknown", error=str(exc))
+        except Exception as exc:
+            logger.warning("Azure automation job %s failed: %s", job.id, exc)
+            await self._update(job, status="failed", error=str(exc))
+
+    async def _post_webhook(self, payload: Dict[str, Any]) -> List[str]:
+        client = get_http_client()
+        delays = backoff_delays(1.0, 2.0, 10.0)
+        for attempt in range(1, AZURE_WEBHOOK_ATTEMPTS + 1):
+            last_attempt = attempt == AZURE_WEBHOOK_ATTEMPTS
+            retry_after = None
+            try:
+                response = await client.post(AZURE_WEBHOOK_URL, json=payload)
+            except _NOT_SENT as exc:
+                if last_attempt:
+                    raise RuntimeError(f"Azure webhook unreachable: {exc}") from exc
+            except httpx.TransportError as exc:
+                raise WebhookOutcomeUnknown(
+                    f"Azure webhook call failed after it was sent ({type(exc).__name__}); "
+                    "check the Automation account before submitting again"
+                ) from exc
+            else:
+                if response.status_code < 300:
+                    return _job_ids(response)
+                if response.status_code >= 500:
+                    raise WebhookOutcomeUnknown(
+                        f"Azure webhook returned {response.status_code}; the runbook may still have started: "
+                        f"{response.text[:200]}"
+                    )
+                if response.status_code != 429 or last_attempt:
+                    raise RuntimeError(f"Azure webhook returned {response.status_code}: {response.text[:200]}")
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            await asyncio.sleep(max(next(delays), retry_after or 0))
+        return []
+
+    async def _poll(self, job: AzureJob, azure_job_id: str) -> None:
+        client = get_http_client()
+        url = AZURE_AUTOMATION_JOB_URL.format(job_id=azure_job_id)
+        deadline = time.monotonic() + AZURE_POLL_TIMEOUT
+        for delay in backoff_delays(AZURE_POLL_INITIAL, AZURE_POLL_FACTOR, AZURE_POLL_MAX):
+            await asyncio.sleep(delay)
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Gave up waiting for Azure job {azure_job_id} after {AZURE_POLL_TIMEOUT:.0f}s")
+            try:
+                response = await client.get(url, headers=await self._auth_headers())
+            except httpx.TransportError as exc:
+                logger.info("Polling Azure job %s failed, will retry: %s", azure_job_id, exc)
+                continue
+            if response.status_code == 401:
+                self._arm_tokens.invalidate(("arm", AZURE_CLIENT_ID or ""))
+                continue
+            if response.status_code in _RETRY_STATUS or response.status_code == 404:
+                continue  # throttled, or the job record is not visible yet
+            if response.status_code >= 300:
+                raise RuntimeError(f"Azure job status returned {response.status_code}: {response.text[:200]}")
+            body = response.json()
+            state = (body.get("properties") or body).get("status")
+            if state != job.azure_status:
+                await self._update(job, azure_status=state)
+            if state in FINAL_AZURE_STATES:
+                if state == "Completed":
+                    await self._update(job, status="completed")
+                else:
+                    await self._update(job, status="failed", error=f"Azure job {state.lower()}")
+                return
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        if AZURE_AUTOMATION_BEARER_TOKEN:
+            return {"Authorization": f"Bearer {AZURE_AUTOMATION_BEARER_TOKEN}"}
+        if not (AZURE_TENANT_ID and AZURE_CLIENT_ID and AZURE_CLIENT_SECRET):
+            return {}
+        result = await self._arm_tokens.get_token(("arm", AZURE_CLIENT_ID), self._fetch_arm_token)
+        if isinstance(result, tuple):
+            raise RuntimeError(f"Azure AD token request failed: {result[0].get('error')}")
+        return {"Authorization": f"Bearer {result['access_token']}"}
+
+    async def _fetch_arm_token(self):
+        response = await get_http_client().post(
+            f"{AZURE_LOGIN_BASE}/{AZURE_TENANT_ID}/oauth2/v2.0/token",
+            data={
+                "grant_type": "client_credentials",
+                "client_id": AZURE_CLIENT_ID,
+                "client_secret": AZURE_CLIENT_SECRET,
+                "scope": AZURE_MANAGEMENT_SCOPE,
+            },
+        )
+        if response.status_code != 200:
+            return {"error": response.text[:200]}, response.status_code
+        return response.json()
+
+
+azure_jobs = AzureJobTracker()
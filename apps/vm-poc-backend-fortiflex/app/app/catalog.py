@@ -0,0 +1,353 @@
+# app/catalog.py
+"""In-memory product catalog snapshot backed by the shared DynamoDB table.
+
+The whole table is loaded with parallel, paginated scan segments into an
+immutable, pre-sorted snapshot indexed by cloud and SKU. A background task
+refreshes it every ``CATALOG_REFRESH_SECONDS``; when ``CATALOG_VERSION_ID``
+names a marker item (e.g. ``__catalog_version__`` with a ``version``
+attribute) the refresh first reads that single item and only rescans when
+the version changed. Request handlers read the current snapshot without any
+I/O.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.dynamodb import dynamodb_resource_kwargs
+from app.http_cache import EncodedBody, encode_representations
+from vm_poc_common.metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+CATALOG_VERSION_ID = os.getenv("CATALOG_VERSION_ID")
+CATALOG_SCAN_SEGMENTS = int(os.getenv("CATALOG_SCAN_SEGMENTS", "4"))
+
+# Secondary indexes created by dynamodb/seed_products.py (ensure_table). They
+# are keyed on lower-cased copies of cloud/sku written by the seeder, so a
+# Query matches case-insensitively like the snapshot's by_cloud/by_sku
+CLOUD_SKU_INDEX = "cloud-sku-lower-index"
+SKU_INDEX = "sku-lower-index"
+INDEX_KEY_ATTRIBUTES = ("cloud_lower", "sku_lower")
+
+DYNAMODB_SECONDS = Histogram("catalog_dynamodb_seconds", "Product catalog DynamoDB read latency", ["operation"])
+
+
+# boto3 takes a large share of process start, and is not needed at all
+# without PRODUCTS_TABLE_NAME; it is imported when the table is first opened
+def _boto_errors() -> Tuple[type, ...]:
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    return BotoCoreError, ClientError
+
+
+_FALLBACK_PRODUCTS: List[Dict[str, Any]] = [
+    {
+        "id": "1",
+        "name": "FortiGate VM Base",
+        "sku": "FG-VM-BUNDLE",
+        "cloud": "AWS",
+        "price": "0.12/hr",
+        "description": "1 vCPU, 2GB RAM, basic firewall",
+        "title": "FortiGate VM01 Base",
+        "image_url": "images/FortiGate-VM01.png",
+    },
+    {
+        "id": "2",
+        "name": "FortiGate VM Advanced",
+        "sku": "FG-VM-ADVANCED",
+        "cloud": "AWS",
+        "price": "0.24/hr",
+        "description": "2 vCPU, 4GB RAM, advanced firewall features",
+        "title": "FortiGate VM02 Advanced",
+        "image_url": "images/FortiGate-VM02.png",
+    },
+    {
+        "id": "3",
+        "name": "FortiGate VM HA",
+        "sku": "FG-VM-HA",
+        "cloud": "AWS",
+        "price": "0.48/hr",
+        "description": "4 vCPU, 8GB RAM, premium firewall features",
+        "title": "FortiGate VM03 Premium",
+        "image_url": "images/FortiGate-VM-HA.png",
+    },
+    {
+        "id": "4",
+        "name": "FortiGate VM MAX",
+        "sku": "FG-VM-MAX",
+        "cloud": "AWS",
+        "price": "0.96/hr",
+        "description": "8 vCPU, 16GB RAM, enterprise-grade firewall",
+        "title": "FortiGate VM MAX",
+        "image_url": "images/FortiGate-VM-MAX.png",
+    },
+    {
+        "id": "5",
+        "name": "FortiGate FLEX",
+        "sku": "FG-FLEX",
+        "cloud": "AWS",
+        "price": "1.92/hr",
+        "description": "16 vCPU, 32GB RAM, ultimate firewall features",
+        "title": "FortiGate FLEX",
+        "image_url": "images/FortiGate-Flex.png",
+    },
+]
+
+
+@lru_cache(maxsize=1)
+def _products_table():
+    table_name = os.getenv("PRODUCTS_TABLE_NAME")
+    if not table_name:
+        logger.info("PRODUCTS_TABLE_NAME not set; serving fallback catalog.")
+        return None
+
+    import boto3
+
+    try:
+        dynamodb = boto3.resource("dynamodb", **dynamodb_resource_kwargs())
+        return dynamodb.Table(table_name)
+    except _boto_errors() as exc:
+        logger.warning("Unable to initialise DynamoDB table %s: %s", table_name, exc)
+        return None
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """One immutable catalog version; ``items`` is sorted by id and never mutated."""
+
+    items: Tuple[Dict[str, Any], ...]
+    version: str
+    source: str
+    loaded_at: float
+    by_cloud: Dict[str, Tuple[Dict[str, Any], ...]] = field(default_factory=dict)
+    by_sku: Dict[str, Tuple[Dict[str, Any], ...]] = field(default_factory=dict)
+    # Full-catalog body, ETag/Last-Modified and gzip/br encodings for this version
+    encoded: Optional[EncodedBody] = None
+
+
+def _content_version(items: Tuple[Dict[str, Any], ...]) -> str:
+    raw = json.dumps(items, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _group_by(items: Tuple[Dict[str, Any], ...], attribute: str) -> Dict[str, Tuple[Dict[str, Any], ...]]:
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for item in items:
+        value = item.get(attribute)
+        if value is not None:
+            groups.setdefault(str(value).lower(), []).append(item)
+    return {key: tuple(group) for key, group in groups.items()}
+
+
+def _make_snapshot(
+    items: List[Dict[str, Any]],
+    source: str,
+    version: Optional[str] = None,
+    previous: Optional[CatalogSnapshot] = None,
+) -> CatalogSnapshot:
+    ordered = tuple(sorted(items, key=lambda item: item.get("id", "")))
+    version = version or _content_version(ordered)
+    if previous is not None and previous.version == version:
+        # Unchanged: keep the old snapshot so its encodings and Last-Modified stay valid
+        return previous
+    loaded_at = time.time()
+    return CatalogSnapshot(
+        items=ordered,
+        version=version,
+        source=source,
+        loaded_at=loaded_at,
+        by_cloud=_group_by(ordered, "cloud"),
+        by_sku=_group_by(ordered, "sku"),
+        encoded=encode_representations(list(ordered), version, loaded_at),
+    )
+
+
+def _without_index_keys(item: Dict[str, Any]) -> Dict[str, Any]:
+    if not any(name in item for name in INDEX_KEY_ATTRIBUTES):
+        return item
+    return {key: value for key, value in item.items() if key not in INDEX_KEY_ATTRIBUTES}
+
+
+def _scan_segment(table, segment: int, total_segments: int) -> List[Dict[str, Any]]:
+    """Read one scan segment, following LastEvaluatedKey past the 1 MB page limit."""
+    # Low-level clients are thread-safe; boto3 resources are not. A resource's
+    # client still returns items already deserialized to Python types
+    client = table.meta.client
+    kwargs: Dict[str, Any] = {"TableName": table.name}
+    if total_segments > 1:
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+    items: List[Dict[str, Any]] = []
+    while True:
+        response = client.scan(**kwargs)
+        items.extend(_without_index_keys(item) for item in response.get("Items", []))
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return items
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+def scan_all(table, segments: int = CATALOG_SCAN_SEGMENTS) -> List[Dict[str, Any]]:
+    """Read every item, running ``segments`` parallel scan segments concurrently."""
+    with DYNAMODB_SECONDS.time("scan"):
+        if segments <= 1:
+            return _scan_segment(table, 0, 1)
+        with ThreadPoolExecutor(max_workers=segments, thread_name_prefix="catalog-scan") as pool:
+            parts = pool.map(lambda segment: _scan_segment(table, segment, segments), range(segments))
+            return [item for part in parts for item in part]
+
+
+def query_index(table, cloud: Optional[str] = None, sku: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Look up products by cloud and/or SKU through the GSIs created by the seeder."""
+    from boto3.dynamodb.conditions import Key
+
+    if cloud:
+        index, condition = CLOUD_SKU_INDEX, Key("cloud_lower").eq(cloud.lower())
+        if sku:
+            condition = condition & Key("sku_lower").eq(sku.lower())
+    elif sku:
+        index, condition = SKU_INDEX, Key("sku_lower").eq(sku.lower())
+    else:
+        raise ValueError("query_index needs a cloud or sku")
+
+    kwargs: Dict[str, Any] = {"IndexName": index, "KeyConditionExpression": condition}
+    items: List[Dict[str, Any]] = []
+    with DYNAMODB_SECONDS.time("query"):
+        while True:
+            response = table.query(**kwargs)
+            items.extend(_without_index_keys(item) for item in response.get("Items", []))
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return sorted(items, key=lambda item: item.get("id", ""))
+            kwargs["ExclusiveStartKey"] = last_key
+
+
+class CatalogService:
+    def __init__(self, refresh_seconds: float = CATALOG_REFRESH_SECONDS, version_id: Optional[str] = CATALOG_VERSION_ID):
+        self.refresh_seconds = refresh_seconds
+        self.version_id = version_id
+        self._fallback = _make_snapshot(_FALLBACK_PRODUCTS, source="fallback")
+        self._snapshot: Optional[CatalogSnapshot] = None
+        # When DynamoDB was last read successfully; ``loaded_at`` only moves
+        # when the content changes
+        self.checked_at = 0.0
+        self._load_lock = asyncio.Lock()
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._warmup: Optional["asyncio.Task[CatalogSnapshot]"] = None
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        """Current snapshot; the fallback catalog until the first load lands."""
+        return self._snapshot or self._fallback
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    def _remote_version(self, table) -> Optional[str]:
+        if not self.version_id:
+            return None
+        item = table.get_item(Key={"id": self.version_id}).get("Item")
+        return str(item["version"]) if item and "version" in item else None
+
+    def load(self, force: bool = False) -> CatalogSnapshot:
+        """Blocking load; keeps the previous snapshot if DynamoDB is unavailable."""
+        table = _products_table()
+        if not table:
+            self._snapshot = self._fallback
+            return self._snapshot
+
+        try:
+            version = self._remote_version(table)
+            current = self._snapshot
+            if not force and version and current and current.version == version:
+                self.checked_at = time.time()
+                return current
+            items = scan_all(table)
+        except _boto_errors() as exc:
+            logger.warning(
+                "Failed to read products from DynamoDB table %s: %s", table.name, exc
+            )
+            # Serve the last good (or fallback) catalog until the next refresh
+            if self._snapshot is None:
+                self._snapshot = self._fallback
+            return self._snapshot
+
+        self.checked_at = time.time()
+        if self.version_id:
+            items = [item for item in items if item.get("id") != self.version_id]
+        if not items:
+            logger.info("DynamoDB table %s is empty; returning fallback catalog.", table.name)
+            self._snapshot = self._fallback
+            return self._snapshot
+
+        snapshot = _make_snapshot(items, source="dynamodb", version=version, previous=self._snapshot)
+        if snapshot is not self._snapshot:
+            logger.info("Loaded catalog version %s (%s items)", snapshot.version, len(snapshot.items))
+        self._snapshot = snapshot
+        return snapshot
+
+    async def refresh(self, force: bool = False) -> CatalogSnapshot:
+        async with self._load_lock:
+            return await asyncio.to_thread(self.load, force)
+
+    async def ensure_loaded(self) -> CatalogSnapshot:
+        if self._snapshot is None:
+            async with self._load_lock:
+                if self._snapshot is None:
+                    await asyncio.to_thread(self.load, True)
+        return self.snapshot
+
+    def load_in_background(self) -> None:
+        if self._snapshot is None and (self._warmup is None or self._warmup.done()):
+            self._warmup = asyncio.create_task(self.ensure_loaded())
+
+    async def lookup(self, cloud: Optional[str] = None, sku: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Targeted GSI Query, used to answer filtered reads before the first full load lands."""
+        table = _products_table()
+        if table is None:
+            return None
+        try:
+            return await asyncio.to_thread(query_index, table, cloud, sku)
+        except _boto_errors() as exc:
+            logger.warning("Index query on %s failed: %s", table.name, exc)
+            return None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Catalog refresh failed")
+
+    def after_fork(self) -> None:
+        """Drop the DynamoDB client inherited from a pre-fork parent; it is reopened on next use."""
+        _products_table.cache_clear()
+
+    async def start(self) -> None:
+        await self.ensure_loaded()
+        if self.refresh_seconds > 0 and time.time() - self.checked_at > self.refresh_seconds:
+            # Checked before a fork, possibly long ago for a recycled worker
+            await self.refresh()
+        if self._task is None and self.refresh_seconds > 0 and _products_table() is not None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+catalog = CatalogService()
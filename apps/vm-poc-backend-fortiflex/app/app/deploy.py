@@ -1,26 +1,617 @@
-# Placeholder for Terraform orchestration
-# backend/app/deploy.py
-import json, os, subprocess, uuid
-from typing import Dict
+# app/deploy.py
+"""Terraform job engine behind ``/api/deploy``.
 
+Jobs run ``terraform init/plan/apply`` as asyncio subprocesses on a bounded
+pool of ``DEPLOY_MAX_WORKERS`` workers. Runs for the same workspace are
+serialized; different workspaces run in parallel.
+
+Each (module, workspace) pair gets a persistent working copy under
+``TF_WORK_DIR/runs``, so its ``.terraform`` directory (providers, backend
+config) and local state survive between runs, and ``init`` is skipped when
+the module sources and backend settings are unchanged. Provider downloads go
+through a shared ``TF_PLUGIN_CACHE_DIR``.
+
+Job records and logs are files under ``TF_WORK_DIR/jobs``. Only one process
+runs jobs: the one holding an exclusive ``flock`` on ``jobs/engine.lock``.
+Other workers of the same pod hand new jobs and cancel requests to it through
+the ``jobs/queue`` and ``jobs/cancel`` directories, read job records from disk
+and tail the log files. When the runner exits, the next process to poll takes
+the lock and puts queued and interrupted running jobs back on the queue.
+
+tfvars never go into the job record; they sit in a private (0600) file next
+to it, which terraform reads as its ``-var-file``, until the job finishes.
+``TF_BINARY`` may point at a fake terraform (see ``benchmarks/fake_terraform.py``).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so every process runs its own jobs
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TF_BINARY = os.getenv("TF_BINARY", "terraform")
+TF_MODULES_DIR = Path(os.getenv("TF_MODULES_DIR", str(Path(__file__).resolve().parents[2] / "terraform")))
+TF_WORK_DIR = Path(os.getenv("TF_WORK_DIR", "/tmp/vm-poc-terraform"))
+TF_PLUGIN_CACHE_DIR = Path(os.getenv("TF_PLUGIN_CACHE_DIR", str(TF_WORK_DIR / "plugin-cache")))
 TF_STATE_BUCKET = os.getenv("TF_STATE_BUCKET")
-TF_STATE_TABLE  = os.getenv("TF_STATE_TABLE")   # DynamoDB lock table
-
-def run_tf(module_dir: str, tfvars: Dict, workspace: str):
-    run_id = str(uuid.uuid4())
-    tfvars_file = f"/tmp/{run_id}.tfvars.json"
-    with open(tfvars_file, "w") as f:
-        json.dump(tfvars, f)
-
-    backend_cfg = [
-      f"-backend-config=bucket={TF_STATE_BUCKET}",
-      f"-backend-config=key=marketplace/{workspace}.tfstate",
-      f"-backend-config=region={os.getenv('AWS_REGION','us-west-2')}",
-      f"-backend-config=dynamodb_table={TF_STATE_TABLE}",
-      "-backend-config=encrypt=true"
-    ]
-
-    subprocess.run(["terraform","-chdir",module_dir,"init","-upgrade","-reconfigure",*backend_cfg], check=True)
-    subprocess.run(["terraform","-chdir",module_dir,"apply","-auto-approve",f"-var-file={tfvars_file}"], check=True)
-    out = subprocess.run(["terraform","-chdir",module_dir,"output","-json"], check=True, capture_output=True)
-    return json.loads(out.stdout)
\ No newline at end of file
+TF_STATE_TABLE = os.getenv("TF_STATE_TABLE")  # DynamoDB lock table
+DEPLOY_MAX_WORKERS = int(os.getenv("DEPLOY_MAX_WORKERS", "2"))
+DEPLOY_STOP_GRACE_SECONDS = float(os.getenv("DEPLOY_STOP_GRACE_SECONDS", "20"))
+# How often workers that do not run jobs look for the runner's lock, and the
+# runner for handed-over jobs and cancel requests; also the log tail interval
+DEPLOY_POLL_SECONDS = float(os.getenv("DEPLOY_POLL_SECONDS", "1"))
+
+ACTIONS = ("plan", "apply", "destroy")
+TERMINAL = {"succeeded", "failed", "cancelled"}
+_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+_INIT_MARKER = ".vm-poc-init"
+_COPY_IGNORE = shutil.ignore_patterns(".terraform", "terraform.tfstate*", "*.tfplan", ".git")
+
+
+class DeployError(ValueError):
+    """Invalid deploy request (unknown module, bad workspace name, ...)."""
+
+
+@dataclass
+class Job:
+    id: str
+    module: str
+    workspace: str
+    action: str
+    owner: Optional[str] = None
+    status: str = "queued"
+    phase: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    exit_code: Optional[int] = None
+    error: Optional[str] = None
+    outputs: Optional[Dict[str, Any]] = None
+    attempts: int = 0
+
+    def public(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["events_url"] = f"/api/deploy/{self.id}/events"
+        return data
+
+
+class JobLog:
+    """Append-only log file plus live fan-out to subscribers."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lines = 0
+        if path.exists():
+            with path.open("rb") as handle:
+                self.lines = sum(1 for _ in handle)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._closed = False
+
+    def write(self, line: str) -> None:
+        with self.path.open("a", encoding="utf-8") as handle:
+            handle.write(line + "\n")
+        seq = self.lines
+        self.lines += 1
+        for queue in self._subscribers:
+            queue.put_nowait((seq, line))
+
+    def close(self) -> None:
+        self._closed = True
+        for queue in self._subscribers:
+            queue.put_nowait(None)
+
+    def reopen(self) -> None:
+        self._closed = False
+
+    async def follow(self) -> AsyncIterator[str]:
+        """Yield every line written so far, then new lines until the job ends."""
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            seen = 0
+            if self.path.exists():
+                with self.path.open("r", encoding="utf-8") as handle:
+                    for line in handle:
+                        seen += 1
+                        yield line.rstrip("\n")
+            if self._closed:
+                return
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                seq, line = item
+                if seq >= seen:
+                    yield line
+        finally:
+            self._subscribers.discard(queue)
+
+
+class JobStore:
+    """One JSON record and one log file per job, plus the hand-off directories."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.queue_dir = root / "queue"
+        self.cancel_dir = root / "cancel"
+        for directory in (self.root, self.queue_dir, self.cancel_dir):
+            directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    def record_path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.json"
+
+    def log_path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.log"
+
+    def tfvars_path(self, job_id: str) -> Path:
+        return self.root / f"{job_id}.tfvars.json"
+
+    def lock_path(self) -> Path:
+        return self.root / "engine.lock"
+
+    def save(self, job: Job) -> None:
+        tmp = self.record_path(job.id).with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(asdict(job)))
+        os.replace(tmp, self.record_path(job.id))  # atomic, so a crash never leaves half a record
+
+    def save_tfvars(self, job_id: str, tfvars: Dict[str, Any]) -> None:
+        path = self.tfvars_path(job_id)
+        tmp = path.with_suffix(".tmp")
+        with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as handle:
+            json.dump(tfvars, handle)
+        os.replace(tmp, path)
+
+    def _read(self, path: Path) -> Job:
+        data = json.loads(path.read_text())
+        data.pop("tfvars", None)  # records from before tfvars moved out
+        return Job(**data)
+
+    def load(self, job_id: str) -> Optional[Job]:
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            return self._read(self.record_path(job_id))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as exc:
+            logger.warning("Unreadable deploy job %s: %s", job_id, exc)
+            return None
+
+    def load_all(self) -> List[Job]:
+        jobs = []
+        for path in self.root.glob("*.json"):
+            if path.name.endswith(".tfvars.json"):
+                continue
+            try:
+                jobs.append(self._read(path))
+            except (OSError, ValueError, TypeError) as exc:
+                logger.warning("Skipping unreadable deploy job %s: %s", path.name, exc)
+        return sorted(jobs, key=lambda job: job.created_at)
+
+    def mark(self, directory: Path, job_id: str) -> None:
+        (directory / job_id).touch()
+
+    def take(self, directory: Path) -> List[str]:
+        """Job ids marked in ``directory``, removing the marks."""
+        ids = []
+        for path in directory.iterdir():
+            path.unlink(missing_ok=True)
+            if _JOB_ID.match(path.name):
+                ids.append(path.name)
+        return ids
+
+
+def _check_name(kind: str, value: str) -> str:
+    if not _NAME.match(value or ""):
+        raise DeployError(f"Invalid {kind} name: {value!r}")
+    return value
+
+
+def _fingerprint(run_dir: Path, backend_args: List[str]) -> str:
+    digest = hashlib.sha256("\0".join(backend_args).encode("utf-8"))
+    for path in sorted(run_dir.rglob("*")):
+        if ".terraform" in path.parts or not path.is_file():
+            continue
+        if path.suffix in (".tf", ".hcl") or path.name.endswith(".tf.json"):
+            digest.update(str(path.relative_to(run_dir)).encode("utf-8"))
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _redact_outputs(outputs: Dict[str, Any]) -> Dict[str, Any]:
+    """``terraform output -json`` with the values of sensitive outputs blanked."""
+    return {
+        name: {**output, "value": "(sensitive)"} if isinstance(output, dict) and output.get("sensitive") else output
+        for name, output in outputs.items()
+    }
+
+
+class DeployEngine:
+    def __init__(self, work_dir: Path = TF_WORK_DIR, modules_dir: Path = TF_MODULES_DIR,
+                 binary: str = TF_BINARY, max_workers: int = DEPLOY_MAX_WORKERS,
+                 plugin_cache_dir: Path = TF_PLUGIN_CACHE_DIR):
+        self.work_dir = work_dir
+        self.modules_dir = modules_dir
+        self.binary = binary
+        self.max_workers = max(1, max_workers)
+        self.plugin_cache_dir = plugin_cache_dir
+        self.store: Optional[JobStore] = None
+        self.jobs: Dict[str, Job] = {}
+        self.logs: Dict[str, JobLog] = {}
+        self._pending: List[str] = []
+        self._busy: Set[Tuple[str, str]] = set()
+        self._procs: Dict[str, asyncio.subprocess.Process] = {}
+        self._cancelled: Set[str] = set()
+        self._cond: Optional[asyncio.Condition] = None
+        self._stopping = False
+        self._workers: List["asyncio.Task[None]"] = []
+        self._lock_fd: Optional[int] = None
+        self._poller: Optional["asyncio.Task[None]"] = None
+
+    # ------------------------------------------------------------ lifecycle
+    @property
+    def leader(self) -> bool:
+        """Whether this process runs the jobs (holds the engine lock)."""
+        return self._lock_fd is not None
+
+    async def start(self) -> None:
+        if self._poller is not None:
+            return
+        self._stopping = False
+        self.store = JobStore(self.work_dir / "jobs")
+        self.plugin_cache_dir.mkdir(parents=True, exist_ok=True)
+        self._cond = asyncio.Condition()
+        if self._acquire_lock():
+            self._lead()
+        else:
+            logger.info("Another process runs deploy jobs; handing new ones over to it")
+        self._poller = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        """Stop workers; running terraform gets SIGINT and the job is resumed on next start."""
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        self._stopping = True
+        for proc in list(self._procs.values()):
+            if proc.returncode is None:
+                proc.send_signal(signal.SIGINT)  # terraform releases state locks on SIGINT
+        if self._procs:
+            await asyncio.wait([asyncio.create_task(p.wait()) for p in self._procs.values()],
+                               timeout=DEPLOY_STOP_GRACE_SECONDS)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)  # lets another process take over
+            self._lock_fd = None
+
+    def _acquire_lock(self) -> bool:
+        fd = os.open(self.store.lock_path(), os.O_RDWR | os.O_CREAT, 0o600)
+        if fcntl is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return False
+        self._lock_fd = fd
+        return True
+
+    def _lead(self) -> None:
+        """Take over the queue: re-queue unfinished jobs and start the workers."""
+        # Hand-off marks are cleared first: any job they name is loaded below
+        self.store.take(self.store.queue_dir)
+        self.jobs, self._pending = {}, []
+        for job in self.store.load_all():
+            self.jobs[job.id] = job
+            if job.status in ("queued", "running"):
+                if job.status == "running":
+                    self._log(job, f"--- backend restarted during {job.phase or 'run'}; re-queuing job ---")
+                job.status, job.phase = "queued", None
+                self.store.save(job)
+                self._pending.append(job.id)
+        if self._pending:
+            logger.info("Resuming %s deploy jobs", len(self._pending))
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.max_workers)]
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(DEPLOY_POLL_SECONDS)
+            try:
+                if not self.leader:
+                    if self._acquire_lock():
+                        logger.info("Taking over the deploy job queue")
+                        self._lead()
+                    continue
+                await self._take_queued()
+                for job_id in self.store.take(self.store.cancel_dir):
+                    await self.cancel(job_id)
+            except Exception:
+                logger.exception("Deploy job hand-off failed")
+
+    async def _take_queued(self) -> None:
+        """Pick up jobs submitted through other processes."""
+        for job_id in self.store.take(self.store.queue_dir):
+            job = None if job_id in self.jobs else self.store.load(job_id)
+            if job is not None and job.status == "queued":
+                self.jobs[job_id] = job
+                async with self._cond:
+                    self._pending.append(job_id)
+                    self._cond.notify_all()
+
+    # ------------------------------------------------------------ public API
+    def module_dir(self, module: Optional[str]) -> Path:
+        if not module:
+            path = self.modules_dir
+        else:
+            path = self.modules_dir / _check_name("module", module)
+        if not path.is_dir():
+            raise DeployError(f"Unknown terraform module: {module or '(default)'}")
+        return path
+
+    async def submit(self, workspace: str, tfvars: Dict[str, Any], action: str = "apply",
+                     module: Optional[str] = None, owner: Optional[str] = None) -> Job:
+        if action not in ACTIONS:
+            raise DeployError(f"Unsupported action {action!r}; expected one of {', '.join(ACTIONS)}")
+        _check_name("workspace", workspace)
+        self.module_dir(module)
+        job = Job(id=uuid.uuid4().hex, module=module or "", workspace=workspace, action=action, owner=owner)
+        # The variables first: a saved record always has them
+        self.store.save_tfvars(job.id, tfvars)
+        self.store.save(job)
+        if not self.leader:
+            JobLog(self.store.log_path(job.id)).write(f"queued {action} for workspace {workspace}")
+            self.store.mark(self.store.queue_dir, job.id)
+            return job
+        self.jobs[job.id] = job
+        self._log(job, f"queued {action} for workspace {workspace}")
+        async with self._cond:
+            self._pending.append(job.id)
+            self._cond.notify_all()
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job as the runner has it; other processes read its last saved record."""
+        return self.jobs.get(job_id) or self.store.load(job_id)
+
+    def list(self, limit: int = 50, owner: Optional[str] = None) -> List[Job]:
+        """Most recent jobs first; only ``owner``'s when given."""
+        source = self.jobs.values() if self.leader else self.store.load_all()
+        jobs = [job for job in source if owner is None or job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)[:limit]
+
+    async def follow(self, job: Job) -> AsyncIterator[str]:
+        """Log lines of ``job`` until it ends: live in the runner, by tailing the file elsewhere."""
+        if job.id in self.jobs:
+            async for line in self.job_log(job).follow():
+                yield line
+            return
+        async for line in self._tail(job.id):
+            yield line
+
+    async def _tail(self, job_id: str) -> AsyncIterator[str]:
+        path = self.store.log_path(job_id)
+        offset, partial = 0, b""
+        while True:
+            # The runner logs a job's last line before saving its final status
+            job = self.store.load(job_id)
+            finished = job is None or job.status in TERMINAL
+            try:
+                with path.open("rb") as handle:
+                    handle.seek(offset)
+                    chunk = handle.read()
+            except FileNotFoundError:
+                chunk = b""
+            offset += len(chunk)
+            *lines, partial = (partial + chunk).split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8", errors="replace")
+            if finished:
+                return
+            await asyncio.sleep(DEPLOY_POLL_SECONDS)
+
+    def job_log(self, job: Job) -> JobLog:
+        log = self.logs.get(job.id)
+        if log is None:
+            log = self.logs[job.id] = JobLog(self.store.log_path(job.id))
+            if job.status in TERMINAL:
+                log.close()
+        return log
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        if not self.leader:
+            # The runner acts on it within DEPLOY_POLL_SECONDS
+            job = self.store.load(job_id)
+            if job is not None and job.status not in TERMINAL:
+                self.store.mark(self.store.cancel_dir, job_id)
+            return job
+        if job_id not in self.jobs:
+            await self._take_queued()
+        job = self.jobs.get(job_id)
+        if job is None or job.status in TERMINAL:
+            return job
+        self._cancelled.add(job_id)
+        async with self._cond:
+            if job_id in self._pending:
+                self._pending.remove(job_id)
+                self._finish(job, "cancelled", error="Cancelled before start")
+                return job
+        proc = self._procs.get(job_id)
+        if proc is not None and proc.returncode is None:
+            self._log(job, "--- cancel requested; interrupting terraform ---")
+            proc.send_signal(signal.SIGINT)
+        return job
+
+    # ------------------------------------------------------------ scheduling
+    def _next_runnable(self) -> Optional[str]:
+        for job_id in self._pending:
+            job = self.jobs[job_id]
+            if (job.module, job.workspace) not in self._busy:
+                return job_id
+        return None
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            async with self._cond:
+                await self._cond.wait_for(lambda: not self._stopping and self._next_runnable() is not None)
+                job_id = self._next_runnable()
+                self._pending.remove(job_id)
+                job = self.jobs[job_id]
+                slot = (job.module, job.workspace)
+                self._busy.add(slot)
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:  # a broken job must not take the worker down
+                logger.exception("Deploy job %s crashed", job.id)
+                self._finish(job, "failed", error=f"{type(exc).__name__}: {exc}")
+            finally:
+                async with self._cond:
+                    self._busy.discard(slot)
+                    self._cond.notify_all()
+
+    # ------------------------------------------------------------ execution
+    def _log(self, job: Job, line: str) -> None:
+        self.job_log(job).write(line)
+
+    def _finish(self, job: Job, status: str, error: Optional[str] = None) -> None:
+        job.status, job.error, job.finished_at = status, error, time.time()
+        self._log(job, f"--- job {status}{': ' + error if error else ''} ---")
+        self.store.save(job)
+        self.job_log(job).close()
+        self._cancelled.discard(job.id)
+        self.store.tfvars_path(job.id).unlink(missing_ok=True)
+
+    def _backend_args(self, job: Job) -> List[str]:
+        if not TF_STATE_BUCKET:
+            return []  # local state inside the per-workspace run directory
+        key = f"marketplace/{job.module + '/' if job.module else ''}{job.workspace}.tfstate"
+        args = [
+            f"-backend-config=bucket={TF_STATE_BUCKET}",
+            f"-backend-config=key={key}",
+            f"-backend-config=region={os.getenv('AWS_REGION', 'us-west-2')}",
+            "-backend-config=encrypt=true",
+        ]
+        if TF_STATE_TABLE:
+            args.append(f"-backend-config=dynamodb_table={TF_STATE_TABLE}")
+        return args
+
+    def _env(self) -> Dict[str, str]:
+        return {
+            **os.environ,
+            "TF_IN_AUTOMATION": "1",
+            "TF_INPUT": "0",
+            "CHECKPOINT_DISABLE": "1",
+            "TF_PLUGIN_CACHE_DIR": str(self.plugin_cache_dir),
+        }
+
+    def _prepare(self, job: Job) -> Path:
+        """Sync module sources into the workspace's persistent run directory."""
+        run_dir = self.work_dir / "runs" / (job.module or "default") / job.workspace
+        shutil.copytree(self.module_dir(job.module), run_dir, dirs_exist_ok=True, ignore=_COPY_IGNORE)
+        return run_dir
+
+    async def _terraform(self, job: Job, run_dir: Path, *args: str, capture: bool = False) -> Tuple[int, str]:
+        if job.id in self._cancelled:
+            return 130, ""
+        job.phase = args[0]
+        self.store.save(job)
+        self._log(job, f"$ terraform {' '.join(args)}")
+        proc = await asyncio.create_subprocess_exec(
+            self.binary, f"-chdir={run_dir}", *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE if capture else asyncio.subprocess.STDOUT,
+            env=self._env(),
+        )
+        self._procs[job.id] = proc
+        captured: List[str] = []
+        try:
+            async for raw in proc.stdout:
+                line = raw.decode("utf-8", errors="replace").rstrip("\n")
+                if capture:
+                    captured.append(line)
+                else:
+                    self._log(job, line)
+            if capture:
+                for raw in (await proc.stderr.read()).decode("utf-8", errors="replace").splitlines():
+                    self._log(job, raw)
+            code = await proc.wait()
+        finally:
+            self._procs.pop(job.id, None)
+        return code, "\n".join(captured)
+
+    async def _run(self, job: Job) -> None:
+        job.status, job.started_at, job.attempts = "running", time.time(), job.attempts + 1
+        job.exit_code = job.error = None
+        self.job_log(job).reopen()
+        self.store.save(job)
+        tfvars = str(self.store.tfvars_path(job.id))
+        if not os.path.exists(tfvars):
+            return self._finish(job, "failed", error="The job's variables are gone; submit it again")
+        run_dir = await asyncio.to_thread(self._prepare, job)
+
+        backend_args = self._backend_args(job)
+        fingerprint = await asyncio.to_thread(_fingerprint, run_dir, backend_args)
+        marker = run_dir / ".terraform" / _INIT_MARKER
+        if marker.exists() and marker.read_text() == fingerprint:
+            self._log(job, "--- module and backend unchanged; reusing initialized directory ---")
+        else:
+            code, _ = await self._terraform(job, run_dir, "init", "-input=false", "-no-color", "-reconfigure", *backend_args)
+            if code != 0:
+                return self._failed(job, code, "terraform init failed")
+            marker.parent.mkdir(exist_ok=True)
+            marker.write_text(fingerprint)
+
+        plan_file = f"{job.id}.tfplan"
+        plan_args = ["plan", "-input=false", "-no-color", f"-var-file={tfvars}", f"-out={plan_file}"]
+        if job.action == "destroy":
+            plan_args.append("-destroy")
+        code, _ = await self._terraform(job, run_dir, *plan_args)
+        if code != 0:
+            return self._failed(job, code, "terraform plan failed")
+
+        try:
+            if job.action != "plan":
+                code, _ = await self._terraform(job, run_dir, "apply", "-input=false", "-no-color", "-auto-approve", plan_file)
+                if code != 0:
+                    return self._failed(job, code, "terraform apply failed")
+                code, output = await self._terraform(job, run_dir, "output", "-json", capture=True)
+                if code == 0 and output.strip():
+                    job.outputs = _redact_outputs(json.loads(output))
+        finally:
+            (run_dir / plan_file).unlink(missing_ok=True)
+
+        job.exit_code, job.phase = 0, None
+        self._finish(job, "succeeded")
+
+    def _failed(self, job: Job, code: int, message: str) -> None:
+        job.exit_code = code
+        if self._stopping and job.id not in self._cancelled:
+            # Interrupted by shutdown: keep it "running" so the next start re-queues it
+            self._log(job, "--- interrupted by backend shutdown; will resume on restart ---")
+            self.store.save(job)
+        elif job.id in self._cancelled:
+            self._finish(job, "cancelled", error="Cancelled while running")
+        else:
+            self._finish(job, "failed", error=f"{message} (exit {code})")
+
+
+deploy_engine = DeployEngine()
@@ -0,0 +1,16 @@
+# app/dynamodb.py
+"""DynamoDB connection settings shared by the catalog and cache backends."""
+import os
+from typing import Any, Dict
+
+
+def dynamodb_resource_kwargs() -> Dict[str, Any]:
+    """Build boto3 resource kwargs from AWS_REGION / AWS_ENDPOINT_URL_DYNAMODB."""
+    kwargs: Dict[str, Any] = {}
+    region = os.getenv("AWS_REGION")
+    endpoint = os.getenv("AWS_ENDPOINT_URL_DYNAMODB")
+    if region:
+        kwargs["region_name"] = region
+    if endpoint:
+        kwargs["endpoint_url"] = endpoint
+    return kwargs
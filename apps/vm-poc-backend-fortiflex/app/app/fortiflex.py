@@ -1,31 +1,82 @@
 # backend/app/fortiflex.py
 import os, requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
+from urllib3.util.retry import Retry
+
+from app.upstream import (
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, UPSTREAM_BACKOFF_BASE, UPSTREAM_MAX_ATTEMPTS,
+    CircuitBreaker, CircuitOpenError, fortiflex_limiter,
+)
 
 FLEX_BASE = os.getenv("FORTIFLEX_BASE_URL")  # e.g. https://fortiflex.example/api
 FLEX_USER = os.getenv("FORTIFLEX_USERNAME")
 FLEX_PASS = os.getenv("FORTIFLEX_PASSWORD")
 FLEX_ORG  = os.getenv("FORTIFLEX_ORG_ID")
 
+# (connect, read) timeouts in seconds
+READ_TIMEOUT = (5, 30)
+WRITE_TIMEOUT = (5, 60)
+
+_breaker = CircuitBreaker("fortiflex-sync", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS)
+_session = None
+
+def _retry_policy():
+    kwargs = dict(
+        total=UPSTREAM_MAX_ATTEMPTS - 1,
+        backoff_factor=UPSTREAM_BACKOFF_BASE,
+        status_forcelist=(429, 500, 502, 503, 504),
+        # POST is not idempotent: only GETs are retried on 5xx/read errors
+        allowed_methods=frozenset({"GET", "HEAD", "OPTIONS"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=UPSTREAM_BACKOFF_BASE, **kwargs)
+    except TypeError:  # urllib3 < 2 has no jitter option
+        return Retry(**kwargs)
+
 def flex_session():
-    s = requests.Session()
-    s.auth = HTTPBasicAuth(FLEX_USER, FLEX_PASS)
-    s.headers.update({"Accept":"application/json","Content-Type":"application/json"})
-    return s
+    """Shared, pooled session with retries; reused across calls."""
+    global _session
+    if _session is None:
+        s = requests.Session()
+        s.auth = HTTPBasicAuth(FLEX_USER, FLEX_PASS)
+        s.headers.update({"Accept":"application/json","Content-Type":"application/json"})
+        s.mount("https://", HTTPAdapter(max_retries=_retry_policy(), pool_maxsize=10))
+        s.mount("http://", HTTPAdapter(max_retries=_retry_policy(), pool_maxsize=10))
+        _session = s
+    return _session
+
+def _guarded(method: str, url: str, **kwargs):
+    owner = object()
+    if not _breaker.allow(owner):
+        raise CircuitOpenError("fortiflex-sync circuit is open")
+    try:
+        fortiflex_limiter.acquire_sync()
+        r = flex_session().request(method, url, **kwargs)
+    except requests.RequestException:
+        _breaker.record_failure()
+        raise
+    except BaseException:
+        _breaker.release(owner)  # no verdict; free a half-open probe
+        raise
+    if r.status_code >= 500:
+        _breaker.record_failure()
+    else:
+        _breaker.record_success()
+    r.raise_for_status()
+    return r
 
 def check_points(sku: str, qty: int = 1):
-    s = flex_session()
     # Map to your collection’s endpoint (adjust path names to match your API)
-    r = s.get(f"{FLEX_BASE}/orgs/{FLEX_ORG}/points/available")
-    r.raise_for_status()
+    r = _guarded("GET", f"{FLEX_BASE}/orgs/{FLEX_ORG}/points/available", timeout=READ_TIMEOUT)
     return r.json()
 
 def entitle(sku: str, cloud: str, version: str, qty: int = 1):
-    s = flex_session()
     payload = {
         "sku": sku, "cloud": cloud, "version": version, "quantity": qty
         # add contract, term, asset group, etc. per your collection
     }
-    r = s.post(f"{FLEX_BASE}/orgs/{FLEX_ORG}/entitlements", json=payload, timeout=60)
-    r.raise_for_status()
-    return r.json()
\ No newline at end of file
+    r = _guarded("POST", f"{FLEX_BASE}/orgs/{FLEX_ORG}/entitlements", json=payload, timeout=WRITE_TIMEOUT)
+    return r.json()
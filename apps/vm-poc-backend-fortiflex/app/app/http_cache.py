@@ -0,0 +1,97 @@
+# app/http_cache.py
+"""HTTP validators and pre-encoded bodies for read-mostly JSON resources."""
+import gzip
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+from vm_poc_common.fastjson import dumps
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+CATALOG_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=300"
+
+
+def dump_json(value: Any) -> bytes:
+    return dumps(value)
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """One JSON document with its validators and every content-coding, built once."""
+
+    bodies: Dict[str, bytes]  # content-coding ("identity", "gzip", "br") -> bytes
+    etag: str  # quoted strong tag for the identity body
+    last_modified: str  # IMF-fixdate
+    last_modified_ts: float
+
+    def etag_for(self, coding: str) -> str:
+        # Strong validators must differ per content-coding
+        if coding == "identity":
+            return self.etag
+        return f'{self.etag[:-1]}-{coding}"'
+
+    @property
+    def etags(self):
+        return {self.etag_for(coding) for coding in self.bodies}
+
+
+def encode_representations(value: Any, version: str, modified_ts: float) -> EncodedBody:
+    raw = dump_json(value)
+    bodies = {"identity": raw, "gzip": gzip.compress(raw, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        bodies["br"] = brotli.compress(raw, quality=11)
+    return EncodedBody(
+        bodies=bodies,
+        etag=f'"{version}"',
+        last_modified=formatdate(modified_ts, usegmt=True),
+        last_modified_ts=modified_ts,
+    )
+
+
+def choose_encoding(accept_encoding: Optional[str], available) -> str:
+    """Pick the best pre-encoded body the client accepts (br > gzip > identity)."""
+    accepted: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        if coding in available and accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return "identity"
+
+
+def _strip_weak(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(if_none_match: Optional[str], etags) -> bool:
+    """Weak comparison, as required for If-None-Match (RFC 9110 13.1.2)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {_strip_weak(tag.strip()) for tag in if_none_match.split(",")}
+    return any(_strip_weak(tag) in candidates for tag in etags)
+
+
+def not_modified_since(if_modified_since: Optional[str], modified_ts: float) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(modified_ts) <= int(since)
@@ -0,0 +1,77 @@
+# app/http_client.py
+"""Shared, pooled httpx client used for every outbound upstream call.
+
+One ``httpx.AsyncClient`` is created per worker in the FastAPI lifespan and
+reused by the routers, so requests to FortiCloud/FortiFlex keep their TCP+TLS
+connections alive instead of handshaking on every call.
+"""
+import logging
+import os
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_WRITE_TIMEOUT = float(os.getenv("HTTP_WRITE_TIMEOUT", "30"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _build_client() -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        connect=HTTP_CONNECT_TIMEOUT,
+        read=HTTP_READ_TIMEOUT,
+        write=HTTP_WRITE_TIMEOUT,
+        pool=HTTP_POOL_TIMEOUT,
+    )
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is missing; using HTTP/1.1.")
+            http2 = False
+    return httpx.AsyncClient(limits=limits, timeout=timeout, http2=http2)
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Create the shared client; called once from the application lifespan."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        logger.info(
+            "Shared HTTP client started (max_connections=%s, keepalive=%s)",
+            HTTP_MAX_CONNECTIONS,
+            HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Shared HTTP client closed")
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it lazily if the lifespan has not run."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
@@ -1,22 +1,65 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import products
-from app.routes.saml import saml_router as saml_router
-from starlette.middleware.sessions import SessionMiddleware
+from app.routes.saml import saml_router as saml_router, saml_settings
+from app.sessions import ServerSideSessionMiddleware
 from app.routes.fortiflex import router as fortiflex_router
 from app.routes.debug import router as debug_router
 from app.routes.whoami import router as whoami_router
 from app.routes.azuremagic import router as azure_router
+from app.routes.deploy import router as deploy_router
+from app.routes.health import router as health_router
+from app.http_client import start_http_client, close_http_client
+from app.catalog import catalog
+from app.deploy import deploy_engine
+from app.azure_jobs import azure_jobs
+from vm_poc_common.metrics import install_metrics
+from vm_poc_common.fastjson import FastJSONResponse
+from app.warmup import warmup
+import asyncio
+import logging
 import os
 
 
 SESSION_SECRET = os.getenv("SESSION_SECRET", "fallback-insecure-dev-key")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
-app = FastAPI()
+# Configured by the entry point rather than at import of whichever router loads first
+logging.basicConfig(
+    level=LOG_LEVEL,  # Use DEBUG to see all logs
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled upstream client per worker, closed cleanly on shutdown
+    await start_http_client()
+    await deploy_engine.start()
+    # Slow imports and loads run after the server is listening; /readyz waits for them
+    warmup.start([
+        ("catalog", catalog.start),
+        # Parse SAML settings/certs and SP metadata once, before the first login
+        # (a no-op in workers forked by app.server, which already did it)
+        ("saml", lambda: asyncio.to_thread(saml_settings)),
+    ])
+    try:
+        yield
+    finally:
+        await warmup.stop()
+        await deploy_engine.stop()
+        await azure_jobs.stop()
+        await catalog.stop()
+        await close_http_client()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 # Add this here — with the actual secret key
 #app.add_middleware(SessionMiddleware, secret_key="your-very-secret-key")
-app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
+# Cookie holds only a signed session id; data lives in the SESSION_BACKEND store
+app.add_middleware(ServerSideSessionMiddleware, secret_key=SESSION_SECRET)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,9 +69,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Outermost, so latency covers session and CORS handling too
+install_metrics(app, "fortiflex-backend")
+
+app.include_router(health_router)
 app.include_router(products.router)
 app.include_router(saml_router)
 app.include_router(fortiflex_router)
 app.include_router(debug_router)
 app.include_router(whoami_router)
 app.include_router(azure_router)
+app.include_router(deploy_router)
@@ -0,0 +1,371 @@
+# app/points.py
+"""Local FortiFlex points engine behind ``/api/fortiflex/estimate``.
+
+FortiFlex charges each entitlement a number of points per day. Numeric
+parameters (CPUs, devices, daily storage) add to it linearly and option
+parameters (service package) scale it::
+
+    points/day = (base + sum(value * per_unit[param])) * prod(multiplier[param][option])
+
+The API has no rate table, only ``/tools/calc`` for one configuration at a
+time. So the rates of each product type and parameter set (a *signature*)
+are derived from a few ``/tools/calc`` probes around the first
+configuration seen: one per numeric parameter and one per option value.
+More probes check that the model holds: a third value of each numeric
+parameter and one configuration that moves every parameter at once. The
+rates are shared by every user of the process for ``FORTIFLEX_RATES_TTL``
+seconds; an option value seen later costs one probe. After that, estimates
+for thousands of configs and entitlements are a NumPy pass over their
+distinct configurations.
+
+A signature that fails a check (a parameter priced in tiers, say), or
+whose check probes ``/tools/calc`` rejects, is priced through
+``/tools/calc`` instead, once per distinct configuration.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from vm_poc_common.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+RATES_TTL = float(os.getenv("FORTIFLEX_RATES_TTL", str(24 * 60 * 60)))
+# Relative error allowed on the check probes; /tools/calc rounds to 4 decimals
+RATES_TOLERANCE = float(os.getenv("FORTIFLEX_RATES_TOLERANCE", "0.001"))
+CALC_CONCURRENCY = int(os.getenv("FORTIFLEX_CALC_CONCURRENCY", "8"))
+
+CALC_PROBES = Counter("fortiflex_points_calc_calls_total", "Upstream /tools/calc calls made by the points engine",
+                      ["purpose"])
+
+# (product type id, numeric parameter ids, option parameter ids)
+Signature = Tuple[int, Tuple[int, ...], Tuple[int, ...]]
+Params = Dict[int, Any]
+ConfigKey = Tuple[int, Tuple[Tuple[int, str], ...]]
+# Points per day of one configuration, or the (error, status) of the failed upstream call
+Calc = Callable[[int, Params], Awaitable[Union[float, Tuple[Dict[str, Any], int]]]]
+
+
+class CalcFailed(Exception):
+    def __init__(self, error: Tuple[Dict[str, Any], int]):
+        super().__init__(error[0].get("error"))
+        self.error = error
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _plain(value: float) -> Union[int, float]:
+    return int(value) if float(value).is_integer() else value
+
+
+def _third_value(reference: float, far: float, seen: Set[float]) -> float:
+    """A value of a numeric parameter besides the two its slope comes from, to test linearity.
+
+    Prefers a value the configs actually use, nearest the middle. Otherwise it
+    takes the midpoint, rounded if the parameter looks integral, or, with no
+    integer in between, the next step above both.
+    """
+    middle = (reference + far) / 2
+    others = seen - {reference, far}
+    if others:
+        return min(others, key=lambda value: (abs(value - middle), value))
+    if reference.is_integer() and far.is_integer():
+        middle = float(round(middle))
+        if middle in (reference, far):
+            return max(reference, far) + abs(far - reference)
+    return middle
+
+
+@dataclass
+class ProductRates:
+    signature: Signature
+    reference: Params
+    reference_points: float
+    base: float = 0.0
+    per_unit: Optional[np.ndarray] = None  # aligned with signature[1]
+    multipliers: Dict[int, Dict[str, float]] = field(default_factory=dict)
+    linear: bool = True
+    # Distinct configurations priced upstream when the model does not hold
+    exact: Dict[ConfigKey, float] = field(default_factory=dict)
+    expires_at: float = 0.0
+
+    def missing_options(self, configs: List[Params]) -> Set[Tuple[int, str]]:
+        return {(param, str(config[param])) for config in configs for param in self.signature[2]
+                if str(config[param]) not in self.multipliers.get(param, {})}
+
+    def per_day(self, configs: List[Params]) -> np.ndarray:
+        numeric, options = self.signature[1], self.signature[2]
+        values = np.array([[float(config[param]) for param in numeric] for config in configs], dtype=np.float64)
+        points = self.base + (values @ self.per_unit if numeric else 0.0)
+        points = np.broadcast_to(points, (len(configs),)).copy()
+        for param in options:
+            labels, codes = np.unique([str(config[param]) for config in configs], return_inverse=True)
+            factors = np.array([self.multipliers[param][label] for label in labels])
+            points *= factors[codes]
+        return np.round(points, 4)
+
+
+def config_key(product_type_id: int, params: Params) -> ConfigKey:
+    return product_type_id, tuple(sorted((param, str(value)) for param, value in params.items()))
+
+
+def signature_of(product_type_id: int, params: Params) -> Signature:
+    numeric = tuple(sorted(param for param, value in params.items() if _number(value) is not None))
+    options = tuple(sorted(param for param in params if param not in numeric))
+    return product_type_id, numeric, options
+
+
+class PointsEngine:
+    def __init__(self, ttl: float = RATES_TTL, tolerance: float = RATES_TOLERANCE,
+                 concurrency: int = CALC_CONCURRENCY):
+        self.ttl = ttl
+        self.tolerance = tolerance
+        self.concurrency = max(1, concurrency)
+        self.rates: Dict[Signature, ProductRates] = {}
+        self._locks: Dict[Signature, asyncio.Lock] = {}
+
+    async def _calc(self, calc: Calc, product_type_id: int, params: Params, purpose: str) -> float:
+        CALC_PROBES.inc(purpose)
+        result = await calc(product_type_id, params)
+        if isinstance(result, tuple):
+            raise CalcFailed(result)
+        return result
+
+    async def _calibrate(self, signature: Signature, configs: List[Params], calc: Calc) -> ProductRates:
+        product_type_id, numeric, options = signature
+        reference = configs[0]
+        ref_values = {param: float(reference[param]) for param in numeric}
+        probes: List[Params] = []
+        checks: List[Params] = []
+        spread: Dict[int, float] = {}
+        for param in numeric:
+            # The value furthest from the reference keeps /tools/calc rounding out of the slope
+            seen = {float(config[param]) for config in configs}
+            others = seen - {ref_values[param]}
+            value = max(others, key=lambda v: abs(v - ref_values[param])) if others else (ref_values[param] * 2 or 1.0)
+            spread[param] = value
+            probes.append({**reference, param: _plain(value)})
+            # Two points always fit a line; a third shows whether the parameter is priced in tiers
+            checks.append({**reference, param: _plain(_third_value(ref_values[param], value, seen))})
+        option_values = [(param, value) for param in options
+                         for value in sorted({str(config[param]) for config in configs} - {str(reference[param])})]
+        probes += [{**reference, param: value} for param, value in option_values]
+        # Every parameter moved at once: checks additivity and scaling together
+        combined: Params = {**reference, **{param: _plain(value) for param, value in spread.items()}}
+        moved: Dict[int, str] = {}
+        for param, value in option_values:
+            moved.setdefault(param, value)
+        combined.update(moved)
+        if len(numeric) + len(moved) > 1:
+            checks.append(combined)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe(params: Params, purpose: str) -> float:
+            async with semaphore:
+                return await self._calc(calc, product_type_id, params, purpose)
+
+        results, outcomes = await asyncio.gather(
+            asyncio.gather(probe(reference, "calibrate"), *(probe(params, "calibrate") for params in probes)),
+            asyncio.gather(*(probe(params, "check") for params in checks), return_exceptions=True),
+        )
+        for outcome in outcomes:
+            if isinstance(outcome, BaseException) and not isinstance(outcome, CalcFailed):
+                raise outcome
+        reference_points = results[0]
+        rates = ProductRates(signature, dict(reference), reference_points, expires_at=time.monotonic() + self.ttl)
+        slopes = [(results[1 + i] - reference_points) / (spread[param] - ref_values[param])
+                  for i, param in enumerate(numeric)]
+        rates.per_unit = np.array(slopes, dtype=np.float64)
+        rates.base = reference_points - sum(slope * ref_values[param] for slope, param in zip(slopes, numeric))
+        rates.multipliers = {param: {str(reference[param]): 1.0} for param in options}
+        if option_values and not reference_points:
+            # Nothing to scale at the reference point; price these configs upstream
+            rates.linear = False
+        else:
+            for (param, value), points in zip(option_values, results[1 + len(numeric):]):
+                rates.multipliers[param][value] = points / reference_points
+        for params, actual in zip(checks, outcomes if rates.linear else []):
+            if isinstance(actual, CalcFailed):
+                # Whatever the reason, the model is unverified for this signature
+                logger.warning("/tools/calc rejected a check probe for product type %s (%s); pricing it upstream",
+                               product_type_id, actual)
+                rates.linear = False
+                break
+            predicted = float(rates.per_day([params])[0])
+            if abs(predicted - actual) > max(self.tolerance * abs(actual), 1e-3):
+                logger.warning("Points for product type %s do not follow the model at %s (predicted %s, "
+                               "/tools/calc %s); pricing them upstream", product_type_id, params, predicted, actual)
+                rates.linear = False
+                break
+        logger.info("Calibrated points rates for product type %s with %s /tools/calc calls",
+                    product_type_id, len(results) + len(checks))
+        return rates
+
+    async def _add_options(self, rates: ProductRates, missing: Set[Tuple[int, str]], calc: Calc) -> None:
+        if not rates.reference_points:
+            # Nothing to scale at the reference point; price these configs upstream
+            rates.linear = False
+            return
+        product_type_id = rates.signature[0]
+        ordered = sorted(missing)
+        results = await asyncio.gather(*(
+            self._calc(calc, product_type_id, {**rates.reference, param: value}, "option")
+            for param, value in ordered
+        ))
+        for (param, value), points in zip(ordered, results):
+            rates.multipliers[param][value] = points / rates.reference_points
+
+    async def _exact(self, rates: ProductRates, configs: List[Params], calc: Calc) -> np.ndarray:
+        product_type_id = rates.signature[0]
+        keys = [config_key(product_type_id, config) for config in configs]
+        missing = {key: config for key, config in zip(keys, configs) if key not in rates.exact}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def price(key: ConfigKey, config: Params) -> None:
+            async with semaphore:
+                rates.exact[key] = await self._calc(calc, product_type_id, config, "exact")
+
+        await asyncio.gather(*(price(key, config) for key, config in missing.items()))
+        return np.array([rates.exact[key] for key in keys], dtype=np.float64)
+
+    async def _signature_per_day(self, signature: Signature, configs: List[Params], calc: Calc) -> np.ndarray:
+        lock = self._locks.setdefault(signature, asyncio.Lock())
+        async with lock:
+            rates = self.rates.get(signature)
+            if rates is None or rates.expires_at <= time.monotonic():
+                rates = self.rates[signature] = await self._calibrate(signature, configs, calc)
+            if rates.linear:
+                missing = rates.missing_options(configs)
+                if missing:
+                    await self._add_options(rates, missing, calc)
+            if not rates.linear:
+                return await self._exact(rates, configs, calc)
+        return rates.per_day(configs)
+
+    async def per_day(self, configs: List[Tuple[int, Params]], calc: Calc) -> np.ndarray:
+        """Points per day of each distinct ``(product type id, params)``; raises CalcFailed."""
+        groups: Dict[Signature, List[int]] = {}
+        for index, (product_type_id, params) in enumerate(configs):
+            groups.setdefault(signature_of(product_type_id, params), []).append(index)
+        signatures = list(groups)
+        results = await asyncio.gather(*(
+            self._signature_per_day(signature, [configs[i][1] for i in groups[signature]], calc)
+            for signature in signatures
+        ))
+        per_day = np.zeros(len(configs), dtype=np.float64)
+        for signature, values in zip(signatures, results):
+            per_day[groups[signature]] = values
+        return per_day
+
+    def status(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {"productTypeId": signature[0], "numeric": list(signature[1]), "options": list(signature[2]),
+             "linear": rates.linear, "base": round(rates.base, 6),
+             "perUnit": dict(zip(signature[1], np.round(rates.per_unit, 6).tolist())),
+             "multipliers": rates.multipliers, "exactConfigs": len(rates.exact),
+             "expiresIn": round(max(rates.expires_at - now, 0.0))}
+            for signature, rates in self.rates.items()
+        ]
+
+
+def _parse_items(items: List[Any]):
+    """Distinct configs of ``items``, each item's index into them and its count; or an (error, status)."""
+    configs: List[Tuple[int, Params]] = []
+    inverse: List[int] = []
+    counts: List[float] = []
+    seen: Dict[ConfigKey, int] = {}
+    # Items resolved from the same config (a fleet of entitlements) share one parameters list
+    by_list: Dict[Tuple[int, int], int] = {}
+    for index, item in enumerate(items):
+        try:
+            product_type_id = int(item["productTypeId"])
+            parameters = item.get("parameters") or []
+            count = float(item.get("count", 1))
+            if not math.isfinite(count) or count < 0:
+                raise ValueError(count)
+            position = by_list.get((product_type_id, id(parameters)))
+            if position is None:
+                params = {int(p["id"]): p["value"] for p in parameters}
+                key = config_key(product_type_id, params)
+                position = seen.get(key)
+                if position is None:
+                    position = seen[key] = len(configs)
+                    configs.append((product_type_id, params))
+                by_list[(product_type_id, id(parameters))] = position
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return {"error": f"items[{index}] needs productTypeId, parameters [{{id, value}}] and a "
+                             "non-negative numeric count"}, 400
+        inverse.append(position)
+        counts.append(count)
+    return configs, np.array(inverse, dtype=np.intp), np.array(counts, dtype=np.float64)
+
+
+async def estimate(items: List[Any], days: float, calc: Calc, include_inactive: bool = False,
+                   engine: Optional["PointsEngine"] = None):
+    """Points per day and for ``days`` per item, with totals; or an (error, status) tuple.
+
+    Items carrying a ``status`` other than ``ACTIVE`` (entitlements as listed
+    by FortiFlex) count as 0 points unless ``include_inactive``, matching
+    ``/entitlements/points``. An item's own ``days`` overrides ``days``.
+    """
+    parsed = _parse_items(items)
+    if isinstance(parsed[1], int):
+        return parsed
+    configs, inverse, counts = parsed
+    item_days = np.full(len(items), float(days))
+    for index, item in enumerate(items):
+        if "days" in item:
+            value = _number(item["days"])
+            if value is None or not math.isfinite(value) or value <= 0:
+                return {"error": f"items[{index}].days must be a positive number"}, 400
+            item_days[index] = value
+    try:
+        distinct = await (engine or points_engine).per_day(configs, calc)
+    except CalcFailed as exc:
+        return exc.error
+
+    per_day = distinct[inverse]
+    if not include_inactive:
+        active = np.array([item.get("status", "ACTIVE") == "ACTIVE" for item in items], dtype=bool)
+        counts = np.where(active, counts, 0.0)
+    daily = per_day * counts
+    points = np.round(daily * item_days, 4)
+
+    type_ids = np.array([product_type_id for product_type_id, _ in configs], dtype=np.int64)[inverse]
+    types, type_codes = np.unique(type_ids, return_inverse=True)
+    by_type = [
+        {"productTypeId": int(type_id), "count": float(count), "pointsPerDay": round(float(per), 4),
+         "points": round(float(total), 4)}
+        for type_id, count, per, total in zip(
+            types, np.bincount(type_codes, counts, len(types)), np.bincount(type_codes, daily, len(types)),
+            np.bincount(type_codes, points, len(types)))
+    ]
+    item_rows = [
+        {key: item[key] for key in ("serialNumber", "configId", "productTypeId") if key in item}
+        | {"count": count, "pointsPerDay": unit, "points": total}
+        for item, count, unit, total in zip(items, counts.tolist(), per_day.tolist(), points.tolist())
+    ]
+    return {
+        "days": days,
+        "totalPointsPerDay": round(float(daily.sum()), 4),
+        "totalPoints": round(float(points.sum()), 4),
+        "distinctConfigs": len(configs),
+        "byProductType": by_type,
+        "items": item_rows,
+    }
+
+
+points_engine = PointsEngine()
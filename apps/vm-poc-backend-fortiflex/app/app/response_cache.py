@@ -0,0 +1,198 @@
+# app/response_cache.py
+"""Read-through response cache for the FortiFlex list endpoints.
+
+Entries are keyed by ``(user, account, program serial, path, body hash)`` and
+kept in an LRU bounded by an approximate byte budget. Each entry is fresh for
+its route TTL and then stale for ``FORTIFLEX_CACHE_STALE_SECONDS`` more:
+stale hits are answered immediately while a single background refresh runs.
+Mutating FortiFlex calls drop the list entries they affect, and a fetch that
+was already running when they did is not cached.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX_BYTES = int(os.getenv("FORTIFLEX_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_STALE_SECONDS = float(os.getenv("FORTIFLEX_CACHE_STALE_SECONDS", "300"))
+
+# Fresh lifetime per upstream list path, in seconds
+ROUTE_TTLS: Dict[str, float] = {
+    "/programs/list": float(os.getenv("FORTIFLEX_CACHE_TTL_PROGRAMS", "300")),
+    "/configs/list": float(os.getenv("FORTIFLEX_CACHE_TTL_CONFIGS", "60")),
+    "/entitlements/list": float(os.getenv("FORTIFLEX_CACHE_TTL_ENTITLEMENTS", "30")),
+    "/groups/list": float(os.getenv("FORTIFLEX_CACHE_TTL_GROUPS", "60")),
+}
+
+_ENTITLEMENT_VIEWS = ("/entitlements/list", "/groups/list", "/programs/list")
+
+# Upstream mutation path -> cached list paths it makes stale. The cache is per
+# process: only the worker that handled the mutation drops its entries, so
+# other workers and replicas can serve the old list for up to the route TTL
+# plus FORTIFLEX_CACHE_STALE_SECONDS
+INVALIDATES: Dict[str, Tuple[str, ...]] = {
+    "/configs/create": ("/configs/list",),
+    "/configs/update": ("/configs/list",),
+    "/configs/disable": ("/configs/list", "/entitlements/list"),
+    "/configs/enable": ("/configs/list", "/entitlements/list"),
+    "/entitlements/vm/create": _ENTITLEMENT_VIEWS,
+    "/entitlements/hardware/create": _ENTITLEMENT_VIEWS,
+    "/entitlements/cloud/create": _ENTITLEMENT_VIEWS,
+    "/entitlements/update": _ENTITLEMENT_VIEWS,
+    "/entitlements/stop": _ENTITLEMENT_VIEWS,
+    "/entitlements/reactivate": _ENTITLEMENT_VIEWS,
+    "/entitlements/transfer": _ENTITLEMENT_VIEWS,
+    "/groups/nexttoken": ("/groups/list",),
+}
+
+Scope = Tuple[str, str, str]  # (user, account, program serial)
+CacheKey = Tuple[str, str, str, str, str]
+Fetcher = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class RawBody:
+    """Upstream response bytes cached verbatim; passthrough routes never parse them."""
+
+    content: bytes
+    media_type: str = "application/json"
+    _gzipped: Optional[bytes] = None
+
+    def gzipped(self) -> bytes:
+        if self._gzipped is None:
+            self._gzipped = gzip.compress(self.content, compresslevel=6, mtime=0)
+        return self._gzipped
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    fresh_until: float
+    stale_until: float
+
+
+def body_hash(body: Optional[dict]) -> str:
+    raw = json.dumps(body or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, stale_seconds: float = CACHE_STALE_SECONDS):
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._inflight: Dict[CacheKey, "asyncio.Task[Any]"] = {}
+        # Bumped by invalidate(); a fetch that sees it move discards its result
+        self._generations: Dict[Tuple[Scope, str], int] = {}
+        self._bytes = 0
+
+    @staticmethod
+    def make_key(scope: Scope, path: str, body: Optional[dict]) -> CacheKey:
+        return (*scope, path, body_hash(body))
+
+    def get(self, key: CacheKey, allow_stale: bool = False, allow_expired: bool = False) -> Optional[Any]:
+        """Return a cached value; ``allow_expired`` serves anything still in memory."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if allow_expired or now < entry.fresh_until or (allow_stale and now < entry.stale_until):
+            self._entries.move_to_end(key)
+            return entry.value
+        return None
+
+    async def get_or_fetch(self, key: CacheKey, ttl: float, fetcher: Fetcher) -> Any:
+        """Serve fresh or stale-while-revalidate hits, otherwise fetch once.
+
+        Results that are ``(error, status)`` tuples are returned but never cached.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            now = time.monotonic()
+            if now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                return entry.value
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self._refresh(key, ttl, fetcher)
+                return entry.value
+        return await asyncio.shield(self._refresh(key, ttl, fetcher))
+
+    def _refresh(self, key: CacheKey, ttl: float, fetcher: Fetcher) -> "asyncio.Task[Any]":
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, ttl, fetcher, self._generation(key)))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key) if self._inflight.get(key) is done else None)
+        return task
+
+    def _generation(self, key: CacheKey) -> int:
+        return self._generations.get((key[:3], key[3]), 0)
+
+    async def _fetch(self, key: CacheKey, ttl: float, fetcher: Fetcher, generation: int) -> Any:
+        value = await fetcher()
+        # Read before a mutation that finished meanwhile: return it, but do not cache it
+        if not isinstance(value, tuple) and self._generation(key) == generation:
+            self.put(key, value, ttl)
+        return value
+
+    def put(self, key: CacheKey, value: Any, ttl: float) -> None:
+        if isinstance(value, RawBody):
+            size = len(value.content) * 2  # leaves room for the gzip variant
+        else:
+            try:
+                size = len(json.dumps(value, separators=(",", ":"), default=str))
+            except (TypeError, ValueError):
+                return
+        if size > self.max_bytes:
+            logger.info("Response for %s exceeds cache budget (%s bytes); not cached", key[3], size)
+            return
+        self._drop(key)
+        now = time.monotonic()
+        self._entries[key] = _Entry(value, size, now + ttl, now + ttl + self.stale_seconds)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+
+    def invalidate(self, scope: Scope, paths: Iterable[str]) -> int:
+        paths = set(paths)
+        for path in paths:
+            self._generations[(scope, path)] = self._generations.get((scope, path), 0) + 1
+        # Later reads start a new fetch instead of joining one that began before the mutation
+        for key in [k for k in self._inflight if k[:3] == scope and k[3] in paths]:
+            del self._inflight[key]
+        stale = [k for k in self._entries if k[:3] == scope and k[3] in paths]
+        for key in stale:
+            self._drop(key)
+        return len(stale)
+
+    def invalidate_after(self, scope: Scope, mutation_path: str) -> None:
+        paths = INVALIDATES.get(mutation_path)
+        if paths:
+            dropped = self.invalidate(scope, paths)
+            logger.debug("FortiFlex %s invalidated %s cached responses", mutation_path, dropped)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+response_cache = ResponseCache()
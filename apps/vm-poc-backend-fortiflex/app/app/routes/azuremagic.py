@@ -1,31 +1,102 @@
-import httpx
+import json
+
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.azure_jobs import TERMINAL, azure_jobs
 
 
 router = APIRouter()
 
+# Upper bound for one long-poll request; clients re-issue with the returned version
+LONG_POLL_MAX_SECONDS = 30
+SSE_KEEPALIVE_SECONDS = 15
+
+
+def _not_found(job_id: str) -> JSONResponse:
+    return JSONResponse(content={"error": f"Azure job {job_id} not found"}, status_code=404)
+
+
 @router.post(
     "/api/azuremagic",
     summary="Call Azure Magic WebHook",
-    description="Calls Azure Webhook to launch terraform for deployment of FGT into workshop env with Flex Token."
+    description=(
+        "Queues a call to the Azure Automation webhook that launches terraform for deployment of FGT "
+        "into the workshop env with a Flex Token. Returns the tracking job immediately (202); repeat "
+        "submissions for the same token return the existing job."
+    ),
+    status_code=202,
 )
 async def azuremagic(request: Request):
     """
     Calls Azuremagic with information for the current user.
 
-    Returns: JobID Response from Azure Automation Webhook
+    Returns: tracking job with `status_url` (long-poll) and `events_url` (SSE)
     """
     session = request.session
-    data = await request.json()
-    payload = {
-        "user": session.get("user.name"),
-        "flexentitlementtoken": data.get("flexentitlementtoken")
-    }
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse(content={"error": "Request body must be a JSON object"}, status_code=400)
+    flex_token = data.get("flexentitlementtoken")
+    if not flex_token:
+        return JSONResponse(content={"error": "flexentitlementtoken is required"}, status_code=400)
 
-    webhook_url = "https://f1dcf3d2-d4e7-45f4-ac93-5394986d1fb4.webhook.eus.azure-automation.net/webhooks?token=rxkK0Qcjo5xDG4xBGkKhF1ixbqIdLaHTI3oop1XJ2BY%3d"
+    user = session.get("user.name") or (session.get("user") or {}).get("name")
+    job, created = azure_jobs.submit(flex_token, user)
+    content = job.public()
+    if job.user != user:
+        # Deduplicated onto someone else's launch of the same token: do not reveal who
+        content.pop("user")
+    return JSONResponse(
+        content={**content, "deduplicated": not created},
+        status_code=202 if created else 200,
+    )
+
+
+@router.get(
+    "/api/azuremagic/{job_id}",
+    summary="Get Azure Magic job status",
+    description=(
+        "Returns the job. With `wait=N` this long-polls for up to N seconds (max 30) until the job's "
+        "`version` is greater than `since`, or the job reaches a final state."
+    ),
+)
+async def azuremagic_status(job_id: str, wait: float = 0, since: int = -1):
+    job = azure_jobs.get(job_id)
+    if job is None:
+        return _not_found(job_id)
+    if wait > 0 and job.version <= since and job.status not in TERMINAL:
+        await azure_jobs.wait_for_change(job, since, min(wait, LONG_POLL_MAX_SECONDS))
+    return job.public()
+
+
+@router.get(
+    "/api/azuremagic/{job_id}/events",
+    summary="Stream Azure Magic job status (SSE)",
+    description="Server-sent `status` events on every change; the stream ends once the job is final.",
+)
+async def azuremagic_events(job_id: str, request: Request):
+    job = azure_jobs.get(job_id)
+    if job is None:
+        return _not_found(job_id)
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(webhook_url, json=payload)
+    async def events():
+        version = -1
+        while True:
+            if job.version > version:
+                version = job.version
+                yield f"event: status\ndata: {json.dumps(job.public())}\n\n"
+            if job.status in TERMINAL or await request.is_disconnected():
+                return
+            await azure_jobs.wait_for_change(job, version, SSE_KEEPALIVE_SECONDS)
+            if job.version <= version:
+                yield ": keepalive\n\n"
 
-    return JSONResponse(content=response.json(), status_code=response.status_code)
\ No newline at end of file
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
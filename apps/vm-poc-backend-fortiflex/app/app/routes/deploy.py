@@ -0,0 +1,161 @@
+import asyncio
+import json
+from typing import Any, Dict, Literal, Optional
+
+from fastapi import APIRouter, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.deploy import DeployError, deploy_engine
+
+router = APIRouter()
+
+# Comment lines keep idle SSE connections open through proxies
+SSE_KEEPALIVE_SECONDS = 15
+
+
+class DeployRequest(BaseModel):
+    workspace: str = Field(..., description="Terraform workspace; runs for the same workspace never overlap")
+    tfvars: Dict[str, Any] = Field(default_factory=dict, description="Variables passed as a -var-file")
+    action: Literal["plan", "apply", "destroy"] = "apply"
+    module: Optional[str] = Field(None, description="Module directory under TF_MODULES_DIR (default: its root)")
+
+
+def _not_found(job_id: str) -> JSONResponse:
+    return JSONResponse(content={"error": f"Deploy job {job_id} not found"}, status_code=404)
+
+
+def _not_authenticated() -> JSONResponse:
+    return JSONResponse(content={"error": "Not authenticated"}, status_code=401)
+
+
+def session_owner(session) -> Optional[str]:
+    """The signed-in SAML user a deploy job belongs to, or None without a login."""
+    user = session.get("user") or {}
+    return user.get("email") or user.get("nameid") or None
+
+
+def _owned_job(job_id: str, owner: str):
+    # Other users' jobs are reported as missing rather than forbidden
+    job = deploy_engine.get(job_id)
+    return job if job is not None and job.owner == owner else None
+
+
+@router.post(
+    "/api/deploy",
+    summary="Queue a Terraform deployment",
+    description=(
+        "Queues `terraform init/plan/apply` for a workspace and returns the job immediately (202). "
+        "Follow progress at `events_url` (SSE) or `/api/deploy/{job_id}/ws`."
+    ),
+    tags=["Deploy"],
+    status_code=202,
+)
+async def post_deploy(payload: DeployRequest, request: Request):
+    owner = session_owner(request.session)
+    if owner is None:
+        return _not_authenticated()
+    try:
+        job = await deploy_engine.submit(
+            payload.workspace, payload.tfvars, action=payload.action, module=payload.module, owner=owner
+        )
+    except DeployError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return job.public()
+
+
+@router.get("/api/deploy", summary="List your recent deploy jobs", tags=["Deploy"])
+async def list_deploys(request: Request, limit: int = 50):
+    owner = session_owner(request.session)
+    if owner is None:
+        return _not_authenticated()
+    return {"jobs": [job.public() for job in deploy_engine.list(min(max(limit, 1), 500), owner=owner)]}
+
+
+@router.get("/api/deploy/{job_id}", summary="Get a deploy job", tags=["Deploy"])
+async def get_deploy(job_id: str, request: Request):
+    owner = session_owner(request.session)
+    if owner is None:
+        return _not_authenticated()
+    job = _owned_job(job_id, owner)
+    if job is None:
+        return _not_found(job_id)
+    return job.public()
+
+
+@router.post("/api/deploy/{job_id}/cancel", summary="Cancel a queued or running deploy job", tags=["Deploy"])
+async def cancel_deploy(job_id: str, request: Request):
+    owner = session_owner(request.session)
+    if owner is None:
+        return _not_authenticated()
+    if _owned_job(job_id, owner) is None:
+        return _not_found(job_id)
+    job = await deploy_engine.cancel(job_id)
+    return job.public()
+
+
+@router.get(
+    "/api/deploy/{job_id}/events",
+    summary="Stream deploy logs (SSE)",
+    description="Server-sent events: one `log` event per Terraform output line, then a final `status` event.",
+    tags=["Deploy"],
+)
+async def deploy_events(job_id: str, request: Request):
+    owner = session_owner(request.session)
+    if owner is None:
+        return _not_authenticated()
+    job = _owned_job(job_id, owner)
+    if job is None:
+        return _not_found(job_id)
+
+    async def events():
+        lines = deploy_engine.follow(job).__aiter__()
+        next_line = asyncio.ensure_future(lines.__anext__())
+        try:
+            while True:
+                done, _ = await asyncio.wait({next_line}, timeout=SSE_KEEPALIVE_SECONDS)
+                if await request.is_disconnected():
+                    return
+                if not done:
+                    yield ": keepalive\n\n"
+                    continue
+                try:
+                    line = next_line.result()
+                except StopAsyncIteration:
+                    break
+                yield f"event: log\ndata: {json.dumps(line)}\n\n"
+                next_line = asyncio.ensure_future(lines.__anext__())
+            final = deploy_engine.get(job.id) or job
+            yield f"event: status\ndata: {json.dumps(final.public())}\n\n"
+        finally:
+            next_line.cancel()
+            await lines.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/api/deploy/{job_id}/ws")
+async def deploy_ws(websocket: WebSocket, job_id: str):
+    await websocket.accept()
+    owner = session_owner(websocket.session)
+    if owner is None:
+        await websocket.send_json({"type": "error", "error": "Not authenticated"})
+        await websocket.close(code=4401)
+        return
+    job = _owned_job(job_id, owner)
+    if job is None:
+        await websocket.send_json({"type": "error", "error": f"Deploy job {job_id} not found"})
+        await websocket.close(code=4404)
+        return
+    try:
+        async for line in deploy_engine.follow(job):
+            await websocket.send_json({"type": "log", "line": line})
+        final = deploy_engine.get(job.id) or job
+        await websocket.send_json({"type": "status", "job": final.public()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
@@ -1,21 +1,71 @@
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-import httpx
-#import os
-from datetime import datetime, timedelta
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import math
+import os
 import logging
+import time
+import zlib
 
-logging.basicConfig(
-    level=logging.INFO,  # Use DEBUG to see all logs
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s"
-)
+import httpx
+from starlette.background import BackgroundTask
 
-logger = logging.getLogger(__name__)
+from app.upstream import CircuitOpenError, fortiflex_api, forticloud_auth
+from app.token_cache import cache_key, token_cache
+from app.response_cache import ROUTE_TTLS, RawBody, response_cache
+from vm_poc_common.metrics import Histogram
+from app.http_cache import choose_encoding
+from vm_poc_common import fastjson
+from vm_poc_common.fastjson import FastJSONResponse
 
+logger = logging.getLogger(__name__)
 
-FORTICLOUD_AUTH_BASE = "https://customerapiauth.fortinet.com/api/v1"
-FORTIFLEX_API_BASE = "https://support.fortinet.com/ES/api/fortiflex/v2"
+UPSTREAM_SECONDS = Histogram(
+    "fortiflex_upstream_request_seconds", "FortiFlex API latency per path, including retries", ["path", "status"]
+)
+TOKEN_FETCH_SECONDS = Histogram("fortiflex_token_fetch_seconds", "FortiCloud OAuth token fetch latency", ["status"])
+
+
+# Override to point at a local stand-in such as apps/vm-poc-fortiflex-mock
+FORTICLOUD_AUTH_BASE = os.getenv("FORTICLOUD_AUTH_BASE", "https://customerapiauth.fortinet.com/api/v1").rstrip("/")
+FORTIFLEX_API_BASE = os.getenv("FORTIFLEX_API_BASE", "https://support.fortinet.com/ES/api/fortiflex/v2").rstrip("/")
+
+# Passthrough read routes gzip bodies of at least this size for clients that accept it
+PASSTHROUGH_GZIP = os.getenv("FORTIFLEX_PASSTHROUGH_GZIP", "true").lower() == "true"
+PASSTHROUGH_GZIP_MIN_BYTES = int(os.getenv("FORTIFLEX_PASSTHROUGH_GZIP_MIN_BYTES", "1024"))
+# Upstream error bodies are echoed in "details"; cap them so a huge page is not copied around
+UPSTREAM_ERROR_DETAILS_MAX = 2048
+
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("FORTIFLEX_BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("FORTIFLEX_BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_OPERATIONS = int(os.getenv("FORTIFLEX_BATCH_MAX_OPERATIONS", "500"))
+
+ESTIMATE_MAX_ITEMS = int(os.getenv("FORTIFLEX_ESTIMATE_MAX_ITEMS", "100000"))
+
+# Batch op name -> upstream path; mirrors the single-item config/entitlement routes
+BATCH_OPERATIONS = {
+    "configs/create": "/configs/create",
+    "configs/update": "/configs/update",
+    "configs/disable": "/configs/disable",
+    "configs/enable": "/configs/enable",
+    "entitlements/vm/create": "/entitlements/vm/create",
+    "entitlements/hardware/create": "/entitlements/hardware/create",
+    "entitlements/cloud/create": "/entitlements/cloud/create",
+    "entitlements/update": "/entitlements/update",
+    "entitlements/stop": "/entitlements/stop",
+    "entitlements/reactivate": "/entitlements/reactivate",
+    "entitlements/vm/token": "/entitlements/vm/token",
+    "entitlements/points": "/entitlements/points",
+    "entitlements/transfer": "/entitlements/transfer",
+}
+
+# Continuation fields used when an upstream list response is paginated
+NEXT_PAGE_FIELD = "nextPageToken"
+PAGE_TOKEN_FIELD = "pageToken"
 
 router = APIRouter()
 
@@ -25,6 +75,18 @@ class FortiFlexCredentials(BaseModel):
     serialNumber: str
     accountId: str
 
+class BatchOperation(BaseModel):
+    op: str = Field(..., description="Operation name, e.g. 'entitlements/stop'")
+    body: Dict[str, Any] = Field(default_factory=dict, description="JSON body forwarded to FortiFlex")
+    id: Optional[str] = Field(None, description="Client correlation id echoed in the result")
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation]
+    concurrency: Optional[int] = Field(None, ge=1, description="Max upstream calls in flight")
+
+def _session_token_key(request: Request):
+    return cache_key(request.session.get("fortiflex_username") or "", request.session.get("fortiflex_api_key") or "")
+
 async def get_valid_access_token(request: Request):
     username = request.session.get("fortiflex_username")
     api_key = request.session.get("fortiflex_api_key")
@@ -32,28 +94,20 @@ async def get_valid_access_token(request: Request):
     if not username or not api_key:
         logger.error("FortiFlex credentials not found in session")
         return {"error": "FortiFlex credentials not found in session"}, 401
-    
-
-    access_token = request.session.get("fortiflex_access_token")
-    token_expiry_str = request.session.get("fortiflex_token_expiry")
 
-    if access_token and token_expiry_str:
-        token_expiry = datetime.fromisoformat(token_expiry_str)
-        if datetime.utcnow() < token_expiry:
-            # Token is still valid
-            logger.info("Using existing FortiFlex access token")
-            return {"access_token": access_token}
+    # Served from the process-wide cache; concurrent misses share one fetch
+    return await token_cache.get_token(
+        _session_token_key(request),
+        lambda: get_new_fortiflex_token(username, api_key),
+    )
 
-    # Token missing or expired, fetch a new one
-    logger.info("Fetching new FortiFlex access token")
-    return await get_new_fortiflex_token(username, api_key, request)
-
-async def get_new_fortiflex_token(username, api_key, request):
+async def get_new_fortiflex_token(username, api_key):
 
     if not username or not api_key:
         logger.error("Missing API credentials for FortiFlex")
         return {"error": "Missing API credentials"}, 401
 
+    logger.info("Fetching new FortiFlex access token")
     token_url = f"{FORTICLOUD_AUTH_BASE}/oauth/token/"
     data = {
         "grant_type": "password",
@@ -62,51 +116,211 @@ async def get_new_fortiflex_token(username, api_key, request):
         "password": api_key
     }
 
-    async with httpx.AsyncClient() as client:
-        token_resp = await client.post(token_url, data=data)
-        if token_resp.status_code != 200:
-            logger.error(f"Failed to retrieve token: {token_resp.text}")
-            return {"error": "Failed to retrieve token", "details": token_resp.text}, 401
-
-        token_data = token_resp.json()
-        access_token = token_data.get("access_token")
-        expires_in = token_data.get("expires_in", 3600)
-
-        request.session["fortiflex_access_token"] = access_token
-        request.session["fortiflex_token_expiry"] = (datetime.utcnow() + timedelta(seconds=expires_in)).isoformat()
+    started = time.perf_counter()
+    try:
+        token_resp = await forticloud_auth.request("POST", token_url, route="/oauth/token/", data=data)
+    except CircuitOpenError as e:
+        logger.error(f"FortiCloud auth circuit open: {e}")
+        return {"error": "FortiCloud auth temporarily unavailable", "details": str(e)}, 503
+    except httpx.HTTPError as e:
+        TOKEN_FETCH_SECONDS.observe(time.perf_counter() - started, "error")
+        logger.error(f"Failed to reach FortiCloud auth: {e}")
+        return {"error": "Failed to reach FortiCloud auth", "details": str(e)}, 504
+    TOKEN_FETCH_SECONDS.observe(time.perf_counter() - started, str(token_resp.status_code))
+    if token_resp.status_code != 200:
+        logger.error(f"Failed to retrieve token: {token_resp.text}")
+        return {"error": "Failed to retrieve token", "details": token_resp.text}, upstream_error_status(token_resp.status_code, 401)
+
+    token_data = token_resp.json()
+    access_token = token_data.get("access_token")
+    expires_in = token_data.get("expires_in", 3600)
+
+    logger.info("New FortiFlex access token retrieved successfully")
+    return {"access_token": access_token, "expires_in": expires_in}
+
+# Statuses that mean the upstream itself is unavailable
+UPSTREAM_UNAVAILABLE = {502, 503, 504}
+
+def upstream_error_status(status_code: int, client_error_status: int = 400) -> int:
+    """Map an upstream failure to our status: keep 429, 5xx becomes 502."""
+    if status_code == 429:
+        return 429
+    if status_code >= 500:
+        return 502
+    return client_error_status
+
+async def read_json_body(request: Request):
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            raise ValueError("Parsed JSON body is not a dictionary")
+    except Exception as e:
+        logger.error(f"Error parsing JSON body: {e}")
+        return {"error": "Invalid or missing JSON in request body", "details": str(e)}, 400
+    return body
+
+def cache_scope(request: Request):
+    """Identify whose FortiFlex data a cached response belongs to."""
+    username = request.session.get("fortiflex_username") or ""
+    api_key = request.session.get("fortiflex_api_key") or ""
+    return (
+        ":".join(cache_key(username, api_key)),
+        str(request.session.get("forticloud_account_number") or ""),
+        str(request.session.get("fortiflex_serial_number") or ""),
+    )
+
+async def send_fortiflex_request(request: Request, method: str, path: str, body: dict, stream: bool = False):
+    """Call FortiFlex with the session's token; returns the 200 response or an error tuple.
+
+    A 401 for a cached token (revoked, or rotated by another replica) drops it from the token
+    cache and retries once with a fresh one. With ``stream=True`` the successful response body
+    is left unread for the caller to consume and close.
+    """
+    url = f"{FORTIFLEX_API_BASE}{path}"
+    logger.debug(f"Proxying FortiFlex call: {method} {url} with body {body}")
+
+    for attempt in range(2):
+        token_response = await get_valid_access_token(request)
+        if isinstance(token_response, tuple):
+            return token_response
+        access_token = token_response["access_token"]
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+
+        started = time.perf_counter()
+        try:
+            response = await fortiflex_api.request(method, url, route=path, headers=headers, json=body, stream=stream)
+        except CircuitOpenError as e:
+            logger.error(f"FortiFlex {path} skipped: {e}")
+            return {"error": f"FortiFlex {path} temporarily unavailable", "details": str(e)}, 503
+        except httpx.HTTPError as e:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, path, "error")
+            logger.error(f"FortiFlex {path} unreachable: {e}")
+            return {"error": f"FortiFlex {path} failed", "details": str(e)}, 504
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, path, str(response.status_code))
+        if response.status_code == 200:
+            break
+        if stream:
+            await response.aread()
+            await response.aclose()
+        if response.status_code == 401 and attempt == 0:
+            logger.warning(f"FortiFlex {path} rejected the cached access token; fetching a new one")
+            await token_cache.reject(_session_token_key(request), access_token)
+            continue
+        details = response.text[:UPSTREAM_ERROR_DETAILS_MAX]
+        logger.error(f"FortiFlex {path} failed: {details}")
+        return {"error": f"FortiFlex {path} failed", "details": details}, upstream_error_status(response.status_code)
+    logger.info(f"FortiFlex {path} succeeded")
+    response_cache.invalidate_after(cache_scope(request), path)
+    return response
 
-        logger.info("New FortiFlex access token retrieved successfully")
-        return {"access_token": access_token}
 # Helper proxy function
 async def proxy_fortiflex_call(request: Request, method: str, path: str, body: dict = None):
     if body is None:
+        body = await read_json_body(request)
+        if isinstance(body, tuple):
+            return body
+    response = await send_fortiflex_request(request, method, path, body)
+    if isinstance(response, tuple):
+        return response
+    return fastjson.loads(response.content)
+
+async def fetch_fortiflex_raw(request: Request, path: str, body: dict):
+    """Upstream body as unparsed bytes, for routes that never look inside it."""
+    response = await send_fortiflex_request(request, "POST", path, body)
+    if isinstance(response, tuple):
+        return response
+    return RawBody(response.content, response.headers.get("content-type", "application/json"))
+
+def _wants_gzip(request: Request) -> bool:
+    return PASSTHROUGH_GZIP and choose_encoding(request.headers.get("accept-encoding"), {"gzip"}) == "gzip"
+
+def raw_json_response(request: Request, raw: RawBody) -> Response:
+    if len(raw.content) >= PASSTHROUGH_GZIP_MIN_BYTES and _wants_gzip(request):
+        return Response(
+            content=raw.gzipped(), media_type=raw.media_type,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+        )
+    return Response(content=raw.content, media_type=raw.media_type, headers={"Vary": "Accept-Encoding"})
+
+def fast_json_response(value) -> Response:
+    """Encode a parsed upstream body once with the fast encoder, skipping FastAPI's encoder pass."""
+    return FastJSONResponse(value)
+
+async def passthrough_fortiflex_call(request: Request, path: str, body: dict = None) -> Response:
+    """Stream the upstream body to the client chunk by chunk without parsing it."""
+    if body is None:
+        body = await read_json_body(request)
+        if isinstance(body, tuple):
+            return FastJSONResponse(content=body[0], status_code=body[1])
+    response = await send_fortiflex_request(request, "POST", path, body, stream=True)
+    if isinstance(response, tuple):
+        return FastJSONResponse(content=response[0], status_code=response[1])
+
+    headers = {"Vary": "Accept-Encoding"}
+    length = response.headers.get("content-length")
+    # httpx undoes any upstream content-encoding, so only a plain body keeps its length
+    identity = "content-encoding" not in response.headers
+    compress = _wants_gzip(request) and not (length and identity and int(length) < PASSTHROUGH_GZIP_MIN_BYTES)
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    elif length and identity:
+        headers["Content-Length"] = length
+
+    async def body_chunks():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits=31: gzip framing
         try:
-            body = await request.json()
-            if not isinstance(body, dict):
-                raise ValueError("Parsed JSON body is not a dictionary")
-        except Exception as e:
-            logger.error(f"Error parsing JSON body: {e}")
-            return {"error": "Invalid or missing JSON in request body", "details": str(e)}, 400
-    token_response = await get_valid_access_token(request)
-    if "error" in token_response:
-        return token_response
-    access_token = token_response["access_token"]
+            async for chunk in response.aiter_bytes():
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+            if compressor is not None:
+                yield compressor.flush()
+        finally:
+            await response.aclose()
+
+    return StreamingResponse(
+        body_chunks(),
+        media_type=response.headers.get("content-type", "application/json"),
+        headers=headers,
+        # Also releases the upstream connection if the client left before the body was read
+        background=BackgroundTask(response.aclose),
+    )
+
+# Read-through cached variant for the list endpoints; raw=True caches the unparsed bytes
+async def cached_fortiflex_call(request: Request, path: str, body: dict = None, raw: bool = False):
+    if body is None:
+        body = await read_json_body(request)
+        if isinstance(body, tuple):
+            return body
+    key = response_cache.make_key(cache_scope(request), path, body)
+    if raw:
+        fetcher = lambda: fetch_fortiflex_raw(request, path, body)
+    else:
+        fetcher = lambda: proxy_fortiflex_call(request, "POST", path, body)
+    result = await response_cache.get_or_fetch(key, ROUTE_TTLS[path], fetcher)
+    if isinstance(result, tuple) and result[1] in UPSTREAM_UNAVAILABLE:
+        # Upstream is down: an expired answer beats an error page
+        cached = response_cache.get(key, allow_expired=True)
+        if cached is not None:
+            logger.warning(f"FortiFlex {path} unavailable; serving cached response")
+            return cached
+    return result
 
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    url = f"{FORTIFLEX_API_BASE}{path}"
+async def cached_passthrough_call(request: Request, path: str, body: dict = None) -> Response:
+    """Passthrough for cached list routes: bytes are cached and served as-is.
 
-    logger.debug(f"Proxying FortiFlex call: {method} {url} with headers {headers} and body {body}")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.request(method, url, headers=headers, json=body)
-        if response.status_code != 200:
-            logger.error(f"FortiFlex {path} failed: {response.text}")
-            return {"error": f"FortiFlex {path} failed", "details": response.text}, 400
-        logger.info(f"FortiFlex {path} succeeded")
-        return response.json()
+    Setting the route's cache TTL to 0 streams every request straight from upstream instead.
+    """
+    if ROUTE_TTLS[path] <= 0:
+        return await passthrough_fortiflex_call(request, path, body)
+    result = await cached_fortiflex_call(request, path, body, raw=True)
+    if isinstance(result, tuple):
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return raw_json_response(request, result)
     
 @router.post(
     "/api/fortiflex/credentials",
@@ -131,10 +345,7 @@ async def store_fortiflex_credentials(data: FortiFlexCredentials, request: Reque
     tags=["Programs"]
 )
 async def post_fortiflex_programs_list(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/programs/list")
-    if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+    return await cached_passthrough_call(request, "/programs/list")
 
 @router.post(
     "/api/fortiflex/programs/points",
@@ -143,10 +354,7 @@ async def post_fortiflex_programs_list(request: Request):
     tags=["Programs"]
 )
 async def post_fortiflex_programs_points(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/programs/points")
-    if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+    return await passthrough_fortiflex_call(request, "/programs/points")
 
 #Configurations
 @router.post(
@@ -159,22 +367,24 @@ async def post_fortiflex_configs_list(request: Request):
     serial_number = request.session.get("fortiflex_serial_number")
     if not serial_number:
         logger.error("FortiFlex serial number not found in session")
-        return {"error": "FortiFlex serial number not found in session"}, 401
+        return FastJSONResponse(content={"error": "FortiFlex serial number not found in session"}, status_code=401)
     body = { "programSerialNumber": serial_number }
-    result = await proxy_fortiflex_call(request, "POST", "/configs/list", body)
+    result = await cached_fortiflex_call(request, "/configs/list", body)
 
     # Check if result is a tuple (error, status_code)
     if isinstance(result, tuple):
-        return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
 
     configs = result.get("configs", [])
     config_map = [
         {"id": cfg.get("id"), "type": cfg.get("productType", {}).get("name")}
         for cfg in configs if cfg.get("id") and cfg.get("productType")
     ]
-    request.session["fortiflex_config_types"] = config_map
+    # Only touch the session when the mapping changed, so it is not rewritten on every list
+    if request.session.get("fortiflex_config_types") != config_map:
+        request.session["fortiflex_config_types"] = config_map
 
-    return result
+    return fast_json_response(result)
 @router.post(
     "/api/fortiflex/configs/create",
     summary="Create a new FortiFlex configuration",
@@ -184,8 +394,8 @@ async def post_fortiflex_configs_list(request: Request):
 async def post_fortiflex_configs_create(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/configs/create")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.post(
     "/api/fortiflex/configs/update",
@@ -196,8 +406,8 @@ async def post_fortiflex_configs_create(request: Request):
 async def post_fortiflex_configs_update(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/configs/update")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.put(
     "/api/fortiflex/configs/disable",
@@ -208,8 +418,8 @@ async def post_fortiflex_configs_update(request: Request):
 async def put_fortiflex_configs_disable(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/configs/disable")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.put(
     "/api/fortiflex/configs/enable",
@@ -220,8 +430,8 @@ async def put_fortiflex_configs_disable(request: Request):
 async def put_fortiflex_configs_enable(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/configs/enable")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 # Entitlements
 @router.post(
@@ -236,14 +446,138 @@ async def post_fortiflex_entitlements_list_all(request: Request):
 
     if not serial_number or not account_id:
         logger.error("Missing required session values for FortiFlex entitlements")
-        return {"error": "Missing required session values"}, 401
+        return FastJSONResponse(content={"error": "Missing required session values"}, status_code=401)
 
     body = {
         "programSerialNumber": serial_number,
         "accountId": account_id
     }
 
-    return await proxy_fortiflex_call(request, "POST", "/entitlements/list", body)
+    return await cached_passthrough_call(request, "/entitlements/list", body)
+
+# Streaming aggregation
+async def iter_fortiflex_pages(request: Request, path: str, body: dict, items_key: str):
+    """Yield one list of items per upstream page.
+
+    Follows ``nextPageToken`` (sent back as ``pageToken``) when the upstream
+    returns one. Error tuples are yielded as-is and end the walk.
+    """
+    body = dict(body)
+    while True:
+        result = await proxy_fortiflex_call(request, "POST", path, body)
+        if isinstance(result, tuple):
+            yield result
+            return
+        yield result.get(items_key) or []
+        next_token = result.get(NEXT_PAGE_FIELD)
+        if not next_token:
+            return
+        body[PAGE_TOKEN_FIELD] = next_token
+
+async def iter_entitlement_pages(request: Request, config_id: Optional[int] = None):
+    """Walk every entitlement of the session's program one config at a time."""
+    if config_id is not None:
+        config_ids = [config_id]
+    else:
+        serial_number = request.session.get("fortiflex_serial_number")
+        if not serial_number:
+            yield {"error": "FortiFlex serial number not found in session"}, 401
+            return
+        configs = await cached_fortiflex_call(
+            request, "/configs/list", {"programSerialNumber": serial_number}
+        )
+        if isinstance(configs, tuple):
+            yield configs
+            return
+        config_ids = [cfg["id"] for cfg in configs.get("configs", []) if cfg.get("id") is not None]
+
+    for cid in config_ids:
+        async for page in iter_fortiflex_pages(request, "/entitlements/list", {"configId": cid}, "entitlements"):
+            yield page
+            if isinstance(page, tuple):
+                return
+
+def _entitlement_filter(status: Optional[str], serial_prefix: Optional[str]):
+    status = status.upper() if status else None
+    def keep(item: dict) -> bool:
+        if status and str(item.get("status", "")).upper() != status:
+            return False
+        if serial_prefix and not str(item.get("serialNumber", "")).startswith(serial_prefix):
+            return False
+        return True
+    return keep
+
+def _projector(fields: Optional[str]):
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+    if not wanted:
+        return lambda item: item
+    return lambda item: {f: item[f] for f in wanted if f in item}
+
+async def _stream_pages(pages, key: str, output: str, keep, project):
+    """Render already-primed pages as NDJSON lines or one chunked JSON document."""
+    # A program without configs yields no pages at all: stream an empty result
+    first = await anext(pages, [])
+    if isinstance(first, tuple):
+        return FastJSONResponse(content=first[0], status_code=first[1])
+
+    async def all_pages():
+        yield first
+        async for page in pages:
+            yield page
+
+    async def ndjson():
+        async for page in all_pages():
+            if isinstance(page, tuple):
+                yield json.dumps({**page[0], "status": page[1]}) + "\n"
+                return
+            lines = [fastjson.dumps(project(item)) for item in page if keep(item)]
+            if lines:
+                yield b"\n".join(lines) + b"\n"
+
+    async def chunked_json():
+        count = 0
+        yield f'{{"{key}":['
+        error = None
+        async for page in all_pages():
+            if isinstance(page, tuple):
+                error = {**page[0], "status": page[1]}
+                break
+            chunk = [fastjson.dumps(project(item)) for item in page if keep(item)]
+            if chunk:
+                yield (b"," if count else b"") + b",".join(chunk)
+                count += len(chunk)
+        tail = {"count": count}
+        if error:
+            tail["error"] = error
+        yield "]," + json.dumps(tail)[1:]
+
+    if output == "json":
+        return StreamingResponse(chunked_json(), media_type="application/json")
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.post(
+    "/api/fortiflex/entitlements/stream",
+    summary="Stream all FortiFlex entitlements",
+    description=(
+        "Walks every entitlement page server-side and streams the merged result as NDJSON "
+        "(`format=ndjson`, default) or a chunked JSON document (`format=json`). Optional "
+        "filters `status`, `configId` and `serialPrefix` and a comma-separated `fields` "
+        "projection shrink the payload."
+    ),
+    tags=["Entitlements"]
+)
+async def post_fortiflex_entitlements_stream(
+    request: Request,
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    configId: Optional[int] = None,
+    serialPrefix: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    pages = iter_entitlement_pages(request, configId)
+    return await _stream_pages(
+        pages, "entitlements", format, _entitlement_filter(status, serialPrefix), _projector(fields)
+    )
 
 @router.post(
     "/api/fortiflex/entitlements/vm/create",
@@ -254,8 +588,8 @@ async def post_fortiflex_entitlements_list_all(request: Request):
 async def post_fortiflex_entitlements_vm_create(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/vm/create")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.post(
     "/api/fortiflex/entitlements/hardware/create",
@@ -266,8 +600,8 @@ async def post_fortiflex_entitlements_vm_create(request: Request):
 async def post_fortiflex_entitlements_hardware_create(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/hardware/create")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.post(
     "/api/fortiflex/entitlements/cloud/create",
@@ -278,8 +612,8 @@ async def post_fortiflex_entitlements_hardware_create(request: Request):
 async def post_fortiflex_entitlements_cloud_create(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/cloud/create")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.post(
     "/api/fortiflex/entitlements/update",
@@ -290,8 +624,8 @@ async def post_fortiflex_entitlements_cloud_create(request: Request):
 async def post_fortiflex_entitlements_update(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/update")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.put(
     "/api/fortiflex/entitlements/stop",
@@ -302,8 +636,8 @@ async def post_fortiflex_entitlements_update(request: Request):
 async def put_fortiflex_entitlements_stop(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/stop")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.put(
     "/api/fortiflex/entitlements/reactivate",
@@ -314,8 +648,8 @@ async def put_fortiflex_entitlements_stop(request: Request):
 async def put_fortiflex_entitlements_reactivate(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/reactivate")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.post(
     "/api/fortiflex/entitlements/vm/token",
@@ -326,8 +660,8 @@ async def put_fortiflex_entitlements_reactivate(request: Request):
 async def post_fortiflex_entitlements_vm_token(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/vm/token")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 @router.post(
     "/api/fortiflex/entitlements/points",
@@ -336,10 +670,7 @@ async def post_fortiflex_entitlements_vm_token(request: Request):
     tags=["Entitlements"]
 )
 async def post_fortiflex_entitlements_points(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/entitlements/points")
-    if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+    return await passthrough_fortiflex_call(request, "/entitlements/points")
 
 @router.post(
     "/api/fortiflex/entitlements/transfer",
@@ -350,8 +681,8 @@ async def post_fortiflex_entitlements_points(request: Request):
 async def post_fortiflex_entitlements_transfer(request: Request):
     result = await proxy_fortiflex_call(request, "POST", "/entitlements/transfer")
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
 
 # Groups
 @router.post(
@@ -361,10 +692,7 @@ async def post_fortiflex_entitlements_transfer(request: Request):
     tags=["Groups"]
 )
 async def post_fortiflex_groups_list(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/groups/list")
-    if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+    return await cached_passthrough_call(request, "/groups/list")
 
 @router.post(
     "/api/fortiflex/groups/nexttoken",
@@ -373,23 +701,42 @@ async def post_fortiflex_groups_list(request: Request):
     tags=["Groups"]
 )
 async def post_fortiflex_groups_nexttoken(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/groups/nexttoken")
-    if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+    return await passthrough_fortiflex_call(request, "/groups/nexttoken")
+
+@router.post(
+    "/api/fortiflex/groups/stream",
+    summary="Stream all FortiFlex groups",
+    description=(
+        "Walks every FortiFlex groups page server-side and streams the result as NDJSON "
+        "or chunked JSON (`format=json`), with an optional `fields` projection."
+    ),
+    tags=["Groups"]
+)
+async def post_fortiflex_groups_stream(request: Request, format: str = "ndjson", fields: Optional[str] = None):
+    body = await read_json_body(request)
+    if isinstance(body, tuple):
+        return FastJSONResponse(content=body[0], status_code=body[1])
+    pages = iter_fortiflex_pages(request, "/groups/list", body, "groups")
+    return await _stream_pages(pages, "groups", format, lambda item: True, _projector(fields))
 
 # Tools
 @router.post(
     "/api/fortiflex/tools/calc",
-    summary="Calculate FortiFlex licenses",
-    description="Calculates license requirements or usage for FortiFlex.",
+    summary="Calculate FortiFlex points",
+    description="Asks FortiFlex for the points of one configuration (product type, parameters, count, dates).",
+    tags=["Tools"]
+)
+async def post_fortiflex_tools_calc(request: Request):
+    return await passthrough_fortiflex_call(request, "/tools/calc")
+
+@router.post(
+    "/api/fortiflex/tools/licenses",
+    summary="Summarize FortiFlex licenses",
+    description="Counts total and active entitlements per product type.",
     tags=["Tools"]
 )
 async def post_fortiflex_tools_licenses(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/tools/licenses")
-    if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
+    return await passthrough_fortiflex_call(request, "/tools/licenses")
 
 @router.post(
     "/api/fortiflex/tools/check-token",
@@ -398,7 +745,176 @@ async def post_fortiflex_tools_licenses(request: Request):
     tags=["Tools"]
 )
 async def post_fortiflex_tools_check_token(request: Request):
-    result = await proxy_fortiflex_call(request, "POST", "/tools/check-token")
+    return await passthrough_fortiflex_call(request, "/tools/check-token")
+
+# Estimates
+def _estimate_days(body: dict):
+    """Days between startDate and endDate (at least 1), else ``days``, else 1 like /tools/calc; or an (error, status)."""
+    try:
+        start = datetime.strptime(str(body["startDate"])[:10], "%Y-%m-%d")
+        end = datetime.strptime(str(body["endDate"])[:10], "%Y-%m-%d")
+        return float(max((end - start).days, 1))
+    except (KeyError, ValueError):
+        pass
+    if body.get("days") is None:
+        return 1.0
+    try:
+        days = float(body["days"])
+    except (TypeError, ValueError):
+        days = math.nan
+    if not math.isfinite(days) or days <= 0:
+        return {"error": "days must be a positive number"}, 400
+    return days
+
+async def _calc_points_per_day(request: Request, product_type_id: int, params: dict):
+    body = {
+        "productTypeId": product_type_id,
+        "parameters": [{"id": param, "value": value} for param, value in params.items()],
+        "count": 1,
+    }
+    result = await proxy_fortiflex_call(request, "POST", "/tools/calc", body)
+    if isinstance(result, tuple):
+        return result
+    per_day = result.get("pointsPerDay", result.get("points"))
+    if not isinstance(per_day, (int, float)):
+        details = fastjson.dumps(result)[:UPSTREAM_ERROR_DETAILS_MAX].decode("utf-8", "replace")
+        return {"error": "Unexpected FortiFlex /tools/calc response", "details": details}, 502
+    return float(per_day)
+
+async def _resolve_config_items(request: Request, items: list):
+    """Give items that only name a configId (entitlements, saved configs) its product type and parameters."""
+    if not any(isinstance(item, dict) and "productTypeId" not in item and "configId" in item for item in items):
+        return items
+    serial_number = request.session.get("fortiflex_serial_number")
+    if not serial_number:
+        logger.error("FortiFlex serial number not found in session")
+        return {"error": "FortiFlex serial number not found in session"}, 401
+    result = await cached_fortiflex_call(request, "/configs/list", {"programSerialNumber": serial_number})
+    if isinstance(result, tuple):
+        return result
+    configs = {str(cfg.get("id")): cfg for cfg in result.get("configs", []) if cfg.get("productType")}
+    resolved = []
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and "productTypeId" not in item and "configId" in item:
+            config = configs.get(str(item["configId"]))
+            if config is None:
+                return {"error": f"items[{index}]: config {item['configId']} not found"}, 404
+            item = item | {"productTypeId": config["productType"]["id"], "parameters": config.get("parameters") or []}
+        resolved.append(item)
+    return resolved
+
+@router.post(
+    "/api/fortiflex/estimate",
+    summary="Estimate FortiFlex points locally",
+    description=(
+        "Points per day and for the requested period (`startDate`/`endDate`, or `days`; default 1) for "
+        "up to FORTIFLEX_ESTIMATE_MAX_ITEMS `items`. An item is either a what-if configuration "
+        "(`productTypeId`, `parameters` [{id, value}], optional `count`) or anything carrying a `configId`, "
+        "such as the entitlements from `/entitlements/list-all`; items with a `status` other than ACTIVE "
+        "count as 0 unless `includeInactive` is true. Rates come from a few cached FortiFlex `/tools/calc` "
+        "calls per product type, so repeated estimates need no upstream calls."
+    ),
+    tags=["Tools"]
+)
+async def post_fortiflex_estimate(request: Request):
+    # NumPy adds ~130 ms to process start; load the engine on first use
+    from app.points import estimate as estimate_points
+
+    body = await read_json_body(request)
+    if isinstance(body, tuple):
+        return FastJSONResponse(content=body[0], status_code=body[1])
+    items = body.get("items")
+    if not isinstance(items, list) or not items:
+        return FastJSONResponse(content={"error": "items must be a non-empty list"}, status_code=400)
+    if len(items) > ESTIMATE_MAX_ITEMS:
+        return FastJSONResponse(content={"error": f"At most {ESTIMATE_MAX_ITEMS} items per estimate"}, status_code=400)
+    days = _estimate_days(body)
+    if isinstance(days, tuple):
+        return FastJSONResponse(content=days[0], status_code=days[1])
+    items = await _resolve_config_items(request, items)
+    if isinstance(items, tuple):
+        return FastJSONResponse(content=items[0], status_code=items[1])
+    result = await estimate_points(
+        items,
+        days,
+        lambda product_type_id, params: _calc_points_per_day(request, product_type_id, params),
+        include_inactive=bool(body.get("includeInactive")),
+    )
+    if isinstance(result, tuple):
+        return FastJSONResponse(content=result[0], status_code=result[1])
+    return fast_json_response(result)
+
+@router.get(
+    "/api/fortiflex/estimate/rates",
+    summary="Show cached FortiFlex points rates",
+    description="Rates derived so far per product type and parameter set, and when they are next refreshed.",
+    tags=["Tools"]
+)
+async def get_fortiflex_estimate_rates():
+    from app.points import points_engine
+
+    return FastJSONResponse({"rates": points_engine.status()})
+
+# Batch
+async def _run_batch_operation(request: Request, index: int, operation: BatchOperation, semaphore: asyncio.Semaphore):
+    item = {"index": index, "id": operation.id, "op": operation.op}
+    path = BATCH_OPERATIONS.get(operation.op)
+    if path is None:
+        return {**item, "status": 400, "error": f"Unsupported operation {operation.op}"}
+    try:
+        async with semaphore:
+            result = await proxy_fortiflex_call(request, "POST", path, operation.body)
+    except Exception as e:
+        # One failed item must not abort the rest of the batch
+        logger.error(f"Batch {operation.op} #{index} failed: {e}")
+        return {**item, "status": 502, "error": f"FortiFlex {path} failed", "details": str(e)}
     if isinstance(result, tuple):
-        return JSONResponse(content=result[0], status_code=result[1])
-    return result
\ No newline at end of file
+        return {**item, "status": result[1], **result[0]}
+    return {**item, "status": 200, "result": result}
+
+@router.post(
+    "/api/fortiflex/batch",
+    summary="Run a batch of FortiFlex operations",
+    description=(
+        "Fans a list of config/entitlement operations out to FortiFlex with bounded concurrency "
+        "and returns one result per item. Pass `?stream=true` (or `Accept: application/x-ndjson`) "
+        "to receive results as NDJSON lines as they complete."
+    ),
+    tags=["Batch"]
+)
+async def post_fortiflex_batch(batch: BatchRequest, request: Request, stream: bool = False):
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        return FastJSONResponse(
+            content={"error": f"Batch exceeds {BATCH_MAX_OPERATIONS} operations"}, status_code=400
+        )
+    token_response = await get_valid_access_token(request)
+    if isinstance(token_response, tuple):
+        return FastJSONResponse(content=token_response[0], status_code=token_response[1])
+
+    concurrency = min(batch.concurrency or BATCH_DEFAULT_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    wants_ndjson = stream or "application/x-ndjson" in request.headers.get("accept", "")
+
+    if not wants_ndjson:
+        results = await asyncio.gather(
+            *(_run_batch_operation(request, i, op, semaphore) for i, op in enumerate(batch.operations))
+        )
+        failed = sum(1 for r in results if r["status"] != 200)
+        return FastJSONResponse(
+            {"total": len(results), "succeeded": len(results) - failed, "failed": failed, "results": results}
+        )
+
+    async def ndjson_results():
+        tasks = [
+            asyncio.create_task(_run_batch_operation(request, i, op, semaphore))
+            for i, op in enumerate(batch.operations)
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield fastjson.dumps(await finished) + b"\n"
+        finally:
+            # Client went away: stop issuing the remaining upstream calls
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_results(), media_type="application/x-ndjson")
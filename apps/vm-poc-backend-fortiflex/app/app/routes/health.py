@@ -0,0 +1,30 @@
+from fastapi import APIRouter
+
+from vm_poc_common.fastjson import FastJSONResponse
+from app.warmup import warmup
+
+router = APIRouter()
+
+
+@router.get(
+    "/healthz",
+    summary="Liveness probe",
+    description="Answers as soon as the server is listening, also while warm-up is still running.",
+    tags=["Health"],
+)
+async def healthz():
+    return {"status": "ok"}
+
+
+@router.get(
+    "/readyz",
+    summary="Readiness probe",
+    description=(
+        "503 until the background warm-up (catalog load, SAML settings) has finished, then 200. "
+        "The body lists each warm-up step with its duration."
+    ),
+    tags=["Health"],
+)
+async def readyz():
+    status = warmup.status()
+    return FastJSONResponse(status, status_code=200 if status["ready"] else 503)
@@ -2,10 +2,21 @@ from fastapi import FastAPI, Request, APIRouter, Form
 from fastapi.responses import RedirectResponse, JSONResponse
 from fastapi.responses import Response
 from starlette.middleware.sessions import SessionMiddleware
-from onelogin.saml2.auth import OneLogin_Saml2_Auth
-from onelogin.saml2.settings import OneLogin_Saml2_Settings
+from vm_poc_common.metrics import Histogram
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import asyncio
+import heapq
 import os
+import threading
+import time
+
+if TYPE_CHECKING:
+    # python3-saml pulls in lxml and xmlsec; imported on first use (or by the
+    # lifespan warm-up) so it does not slow down process start
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
+    from onelogin.saml2.settings import OneLogin_Saml2_Settings
 
 
 saml_router = APIRouter()
@@ -13,7 +24,96 @@ saml_router = APIRouter()
 BASE_DIR = Path(__file__).resolve().parent
 SAML_FOLDER = BASE_DIR / "saml"
 
+SAML_ACS_WORKERS = int(os.getenv("SAML_ACS_WORKERS", "4"))
+SAML_REPLAY_CACHE_SIZE = int(os.getenv("SAML_REPLAY_CACHE_SIZE", "100000"))
+SAML_REPLAY_DEFAULT_TTL = int(os.getenv("SAML_REPLAY_DEFAULT_TTL", "3600"))
+
+# xmlsec signature checks are CPU-bound; keep them off the event loop
+_acs_executor = ThreadPoolExecutor(max_workers=SAML_ACS_WORKERS, thread_name_prefix="saml-acs")
+
+ACS_SECONDS = Histogram("saml_acs_processing_seconds", "SAML response validation time in the ACS pool", ["outcome"])
+
+_settings: Optional["OneLogin_Saml2_Settings"] = None
+_sp_metadata: Optional[str] = None
+
+
+def load_saml_settings(settings_data: Optional[dict] = None) -> "OneLogin_Saml2_Settings":
+    """Parse settings and certificates once and precompute the SP metadata."""
+    global _settings, _sp_metadata
+    from onelogin.saml2.settings import OneLogin_Saml2_Settings
+
+    if settings_data is None:
+        settings = OneLogin_Saml2_Settings(custom_base_path=str(SAML_FOLDER))
+    else:
+        settings = OneLogin_Saml2_Settings(settings_data)
+    metadata = settings.get_sp_metadata()
+    errors = settings.validate_metadata(metadata)
+    if errors:
+        raise ValueError(f"Invalid SP metadata: {', '.join(errors)}")
+    _settings, _sp_metadata = settings, metadata
+    return settings
+
+
+def saml_settings() -> "OneLogin_Saml2_Settings":
+    return _settings or load_saml_settings()
+
+
+class AssertionReplayCache:
+    """Bounded set of consumed assertion IDs, each kept until its NotOnOrAfter.
+
+    IdPs set different assertion lifetimes, so arrival order says nothing about
+    expiry order: a heap of (expiry, id) finds the entries to drop. When the
+    cache is full, the ids closest to expiring go first.
+    """
+
+    def __init__(self, max_entries: int = SAML_REPLAY_CACHE_SIZE, default_ttl: int = SAML_REPLAY_DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._seen: Dict[str, float] = {}
+        self._expiries: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def check_and_add(self, assertion_id: str, not_on_or_after: Optional[float] = None) -> bool:
+        """Record ``assertion_id``; returns False if it was already consumed."""
+        now = time.time()
+        expires_at = not_on_or_after or now + self.default_ttl
+        with self._lock:
+            while self._expiries:
+                expiry, oldest_id = self._expiries[0]
+                if self._seen.get(oldest_id) != expiry:
+                    # Superseded by a later insert of the same id
+                    heapq.heappop(self._expiries)
+                    continue
+                if expiry > now and len(self._seen) < self.max_entries:
+                    break
+                heapq.heappop(self._expiries)
+                del self._seen[oldest_id]
+            if assertion_id in self._seen and self._seen[assertion_id] > now:
+                return False
+            self._seen[assertion_id] = expires_at
+            heapq.heappush(self._expiries, (expires_at, assertion_id))
+            return True
+
+
+replay_cache = AssertionReplayCache()
+
+
+def _process_acs(url_data: dict) -> "OneLogin_Saml2_Auth":
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
+
+    started = time.perf_counter()
+    auth = OneLogin_Saml2_Auth(url_data, old_settings=saml_settings())
+    try:
+        auth.process_response()
+    finally:
+        outcome = "authenticated" if auth.is_authenticated() else "rejected"
+        ACS_SECONDS.observe(time.perf_counter() - started, outcome)
+    return auth
+
+
 def prepare_saml_request(request: Request):
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
+
     url_data = {
         "https": "on" if request.url.scheme == "https" else "off",
         #"http_host": request.client.host,
@@ -23,7 +123,13 @@ def prepare_saml_request(request: Request):
         "get_data": request.query_params,
         "post_data": {},
     }
-    return OneLogin_Saml2_Auth(url_data, custom_base_path=str(SAML_FOLDER))
+    return OneLogin_Saml2_Auth(url_data, old_settings=saml_settings())
+
+@saml_router.get("/saml/metadata")
+async def saml_metadata():
+    if _sp_metadata is None:
+        load_saml_settings()
+    return Response(content=_sp_metadata, media_type="application/xml")
 
 @saml_router.get("/login")
 async def saml_login(request: Request):
@@ -39,16 +145,20 @@ async def saml_acs(request: Request):
         "server_port": str(request.url.port or 443),
         "script_name": request.url.path,
         "get_data": {},
-        "post_data": form,
+        "post_data": dict(form),
     }
-    auth = OneLogin_Saml2_Auth(url_data, custom_base_path=str(SAML_FOLDER))
-    auth.process_response()
+    loop = asyncio.get_running_loop()
+    auth = await loop.run_in_executor(_acs_executor, _process_acs, url_data)
     errors = auth.get_errors()
     if errors:
         return JSONResponse(status_code=400, content={"errors": errors})
 
     if not auth.is_authenticated():
         return JSONResponse(status_code=401, content={"error": "Not authenticated"})
+
+    assertion_id = auth.get_last_assertion_id()
+    if assertion_id and not replay_cache.check_and_add(assertion_id, auth.get_last_assertion_not_on_or_after()):
+        return JSONResponse(status_code=400, content={"errors": ["replayed_assertion"]})
     
     attributes = auth.get_attributes()
     
@@ -0,0 +1,206 @@
+# app/server.py
+"""Production entry point: a pre-fork gunicorn master with uvicorn workers.
+
+    python -m app.server
+
+The master imports the app and loads the read-mostly state (catalog snapshot,
+parsed SAML settings, NumPy for the points engine) once, then forks the
+workers, which share those pages copy-on-write; ``gc.freeze`` keeps the
+collector from writing to them. Each
+worker runs uvicorn on uvloop with the httptools parser when both are
+installed, and its lifespan warm-up finds everything already loaded.
+
+Settings:
+- ``WEB_CONCURRENCY``: number of workers. Unset, the CPU limit of the
+  container (cgroup v2 ``cpu.max`` or the v1 CFS quota, and the affinity
+  mask) times ``WORKERS_PER_CORE``, capped at ``MAX_WORKERS`` - but 1 while
+  ``SESSION_BACKEND=memory``, since those sessions live in a single process.
+- ``GRACEFUL_TIMEOUT``: on SIGTERM workers stop accepting connections and
+  get this long to finish in-flight requests and run the lifespan shutdown.
+- ``MAX_REQUESTS`` / ``MAX_REQUESTS_JITTER``: recycle a worker after that
+  many requests (0, the default, never does). The replacement is forked from
+  the master and so starts warm.
+- ``PRELOAD_STATE=false`` skips the pre-fork load; every worker then warms
+  up on its own as under plain uvicorn.
+
+Without gunicorn (local development, Windows) it falls back to
+``uvicorn.run`` with the same worker count and no shared state.
+"""
+import gc
+import logging
+import math
+import os
+import time
+from importlib import import_module
+from importlib.util import find_spec
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from gunicorn.app.base import BaseApplication
+    from uvicorn_worker import UvicornWorker
+except ImportError:  # Not in the image's requirements everywhere; see serve()
+    BaseApplication = UvicornWorker = None
+
+logger = logging.getLogger(__name__)
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "5000"))
+WEB_CONCURRENCY = os.getenv("WEB_CONCURRENCY")
+WORKERS_PER_CORE = float(os.getenv("WORKERS_PER_CORE", "1"))
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "8"))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+WORKER_TIMEOUT = int(os.getenv("WORKER_TIMEOUT", "60"))
+KEEPALIVE = int(os.getenv("KEEPALIVE", "5"))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+PRELOAD_STATE = os.getenv("PRELOAD_STATE", "true").lower() == "true"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").lower()
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_limit(root: Path = CGROUP_ROOT) -> Optional[float]:
+    """CPUs allowed by the container's CFS quota, or None when unlimited."""
+    # cgroup v2: "<quota> <period>" or "max <period>"
+    cpu_max = _read(root / "cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+    # cgroup v1: quota is -1 when unlimited
+    for directory in (root / "cpu", root / "cpu,cpuacct"):
+        quota, period = _read(directory / "cpu.cfs_quota_us"), _read(directory / "cpu.cfs_period_us")
+        if quota and period and int(quota) > 0:
+            return int(quota) / int(period)
+    return None
+
+
+def available_cpus() -> float:
+    try:
+        cpus: float = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS, Windows
+        cpus = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    return min(cpus, limit) if limit else cpus
+
+
+def worker_count() -> int:
+    if WEB_CONCURRENCY:
+        return max(1, int(WEB_CONCURRENCY))
+    from app.sessions import SESSION_BACKEND
+
+    if SESSION_BACKEND == "memory":
+        logger.warning("SESSION_BACKEND=memory keeps sessions in one process; running 1 worker. "
+                       "Use SESSION_BACKEND=dynamodb (or set WEB_CONCURRENCY) for more.")
+        return 1
+    return max(1, min(MAX_WORKERS, math.ceil(available_cpus() * WORKERS_PER_CORE)))
+
+
+def _process_local_state(workers: int) -> List[str]:
+    """Features that keep state in one worker and so misbehave behind several."""
+    from app.sessions import SESSION_BACKEND
+
+    if workers <= 1:
+        return []
+    state = ["/api/azuremagic job tracking", "FortiFlex response-cache invalidation"]
+    if SESSION_BACKEND == "memory":
+        state.insert(0, "login sessions (SESSION_BACKEND=memory)")
+    return state
+
+
+def preload_state() -> None:
+    """Load the catalog snapshot and SAML settings in the master, before forking."""
+    from app.catalog import catalog
+    from app.routes.saml import load_saml_settings
+
+    steps: List[Tuple[str, Callable[[], Any]]] = [
+        ("catalog", lambda: catalog.load(force=True)),
+        ("saml", load_saml_settings),
+        # NumPy and the points engine otherwise load in each worker on first estimate
+        ("points engine", lambda: import_module("app.points")),
+    ]
+    for name, step in steps:
+        started = time.monotonic()
+        try:
+            step()
+        except Exception:
+            logger.exception("Pre-fork %s load failed; workers will warm it up themselves", name)
+            continue
+        logger.info("Pre-fork %s load took %.0f ms", name, (time.monotonic() - started) * 1000)
+    # What exists now lives as long as the master; move it out of the
+    # collector's reach so no worker's GC pass dirties the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker) -> None:
+    from app.catalog import catalog
+
+    # botocore connection pools must not be shared with the parent or siblings
+    catalog.after_fork()
+
+
+if BaseApplication is not None:
+    class Worker(UvicornWorker):
+        # "auto" picks uvloop and httptools when installed, else asyncio and h11
+        CONFIG_KWARGS = {"loop": "auto", "http": "auto", "timeout_graceful_shutdown": GRACEFUL_TIMEOUT}
+
+    class Server(BaseApplication):
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self) -> None:
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from app.main import app
+
+            if PRELOAD_STATE:
+                preload_state()
+            return app
+
+
+def serve() -> None:
+    workers = worker_count()
+    for state in _process_local_state(workers):
+        logger.warning("%s workers: %s is per process", workers, state)
+    logger.info("Starting %s worker(s) on %s:%s (uvloop %s, httptools %s)", workers, HOST, PORT,
+                "on" if find_spec("uvloop") else "off", "on" if find_spec("httptools") else "off")
+
+    if BaseApplication is None:
+        import uvicorn
+
+        logger.warning("gunicorn/uvicorn-worker not installed; workers will not share preloaded state")
+        uvicorn.run("app.main:app", host=HOST, port=PORT, workers=workers, loop="auto", http="auto",
+                    timeout_keep_alive=KEEPALIVE, timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+                    limit_max_requests=MAX_REQUESTS or None)
+        return
+
+    Server({
+        "bind": f"{HOST}:{PORT}",
+        "workers": workers,
+        "worker_class": Worker,
+        "preload_app": True,
+        "post_fork": post_fork,
+        "graceful_timeout": GRACEFUL_TIMEOUT,
+        "timeout": WORKER_TIMEOUT,
+        "keepalive": KEEPALIVE,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS_JITTER,
+        "loglevel": LOG_LEVEL,
+    }).run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=LOG_LEVEL.upper(), format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    serve()
@@ -0,0 +1,261 @@
+# app/sessions.py
+"""Server-side sessions: the cookie carries only a signed, opaque session id.
+
+Drop-in replacement for Starlette's ``SessionMiddleware``: handlers keep using
+``request.session`` as a dict, but the data lives in a pluggable store. Only
+sessions that were actually modified during a request are written back, and
+only top-level changes count: a nested mutation such as
+``session["user"]["x"] = ...`` is not seen, so reassign the top-level key.
+
+A login (``session["user"]`` set to a new value) saves the session under a
+fresh id and deletes the old one, so an id planted in the browser before
+login never becomes authenticated. Sessions that are only read still slide:
+once less than half of ``max_age`` remains, the store entry and the cookie
+are renewed.
+
+Stores:
+- ``memory`` (default): per-process LRU with TTL.
+- ``dynamodb``: table named by ``SESSION_TABLE_NAME`` with a string hash key
+  ``sid``; works against DynamoDB Local through ``AWS_ENDPOINT_URL_DYNAMODB``.
+"""
+import asyncio
+import json
+import logging
+import os
+import secrets
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Literal, Optional, Tuple
+
+import itsdangerous
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.dynamodb import dynamodb_resource_kwargs
+
+logger = logging.getLogger(__name__)
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory").lower()
+SESSION_TABLE_NAME = os.getenv("SESSION_TABLE_NAME")
+SESSION_MAX_AGE = int(os.getenv("SESSION_MAX_AGE", str(14 * 24 * 60 * 60)))
+SESSION_MEMORY_MAX_ENTRIES = int(os.getenv("SESSION_MEMORY_MAX_ENTRIES", "10000"))
+
+
+class TrackedSession(dict):
+    """dict that remembers whether it was changed, so unchanged sessions are not rewritten."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.modified = False
+
+    def __setitem__(self, key, value):
+        self.modified = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.modified = True
+        super().__delitem__(key)
+
+    def clear(self):
+        self.modified = True
+        super().clear()
+
+    def pop(self, *args):
+        self.modified = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self.modified = True
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.modified = True
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self.modified = True
+        super().update(*args, **kwargs)
+
+
+class MemorySessionStore:
+    def __init__(self, max_entries: int = SESSION_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    async def load(self, sid: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        entry = self._entries.get(sid)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        if expires_at <= time.time():
+            self._entries.pop(sid, None)
+            return None
+        self._entries.move_to_end(sid)
+        return dict(data), expires_at
+
+    async def save(self, sid: str, data: Dict[str, Any], ttl: int) -> None:
+        self._entries[sid] = (time.time() + ttl, dict(data))
+        self._entries.move_to_end(sid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def touch(self, sid: str, ttl: int) -> None:
+        entry = self._entries.get(sid)
+        if entry is not None:
+            self._entries[sid] = (time.time() + ttl, entry[1])
+
+    async def delete(self, sid: str) -> None:
+        self._entries.pop(sid, None)
+
+
+class DynamoDBSessionStore:
+    def __init__(self, table_name: str):
+        import boto3
+
+        self._table = boto3.resource("dynamodb", **dynamodb_resource_kwargs()).Table(table_name)
+
+    def _load(self, sid: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        item = self._table.get_item(Key={"sid": sid}, ConsistentRead=True).get("Item")
+        if not item or float(item.get("expires_at", 0)) <= time.time():
+            return None
+        return json.loads(item["data"]), float(item["expires_at"])
+
+    async def load(self, sid: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        return await asyncio.to_thread(self._load, sid)
+
+    async def save(self, sid: str, data: Dict[str, Any], ttl: int) -> None:
+        expires_at = int(time.time() + ttl)
+        item = {"sid": sid, "data": json.dumps(data), "expires_at": expires_at, "ttl": expires_at}
+        await asyncio.to_thread(self._table.put_item, Item=item)
+
+    def _touch(self, sid: str, ttl: int) -> None:
+        from botocore.exceptions import ClientError
+
+        expires_at = int(time.time() + ttl)
+        try:
+            # Only the expiry: a concurrent write to the data is kept
+            self._table.update_item(
+                Key={"sid": sid},
+                UpdateExpression="SET expires_at = :e, #ttl = :e",
+                ExpressionAttributeNames={"#ttl": "ttl"},
+                ExpressionAttributeValues={":e": expires_at},
+                ConditionExpression="attribute_exists(sid)",
+            )
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+
+    async def touch(self, sid: str, ttl: int) -> None:
+        await asyncio.to_thread(self._touch, sid, ttl)
+
+    async def delete(self, sid: str) -> None:
+        await asyncio.to_thread(self._table.delete_item, Key={"sid": sid})
+
+
+def build_session_store():
+    if SESSION_BACKEND == "dynamodb":
+        if not SESSION_TABLE_NAME:
+            raise RuntimeError("SESSION_BACKEND=dynamodb requires SESSION_TABLE_NAME")
+        return DynamoDBSessionStore(SESSION_TABLE_NAME)
+    return MemorySessionStore()
+
+
+class ServerSideSessionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        secret_key: str,
+        store=None,
+        session_cookie: str = "session",
+        max_age: int = SESSION_MAX_AGE,
+        path: str = "/",
+        same_site: Literal["lax", "strict", "none"] = "lax",
+        https_only: bool = False,
+    ) -> None:
+        self.app = app
+        self.signer = itsdangerous.Signer(str(secret_key), salt="session-id")
+        self.store = store if store is not None else build_session_store()
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+
+    async def _load(self, scope: Scope) -> Tuple[Optional[str], float]:
+        """The session id from the cookie and its store expiry; (None, 0) when there is none."""
+        connection = HTTPConnection(scope)
+        scope["session"] = TrackedSession()
+        cookie = connection.cookies.get(self.session_cookie)
+        if not cookie:
+            return None, 0.0
+        try:
+            sid = self.signer.unsign(cookie.encode("utf-8")).decode("utf-8")
+        except BadSignature:
+            return None, 0.0
+        try:
+            loaded = await self.store.load(sid)
+        except Exception as exc:
+            logger.warning("Session store read failed: %s", exc)
+            loaded = None
+        if loaded is None:
+            return None, 0.0
+        data, expires_at = loaded
+        scope["session"] = TrackedSession(data)
+        return sid, expires_at
+
+    def _cookie(self, value: str, max_age: Optional[int]) -> str:
+        expiry = f"Max-Age={max_age}; " if max_age else "expires=Thu, 01 Jan 1970 00:00:00 GMT; "
+        return f"{self.session_cookie}={value}; path={self.path}; {expiry}{self.security_flags}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        sid, expires_at = await self._load(scope)
+        loaded_user = scope["session"].get("user")
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                session: TrackedSession = scope["session"]
+                if session.modified or not isinstance(session, TrackedSession):
+                    user = session.get("user")
+                    await self._persist(sid, session, message, rotate=bool(user) and user != loaded_user)
+                elif sid and expires_at - time.time() < self.max_age / 2:
+                    await self._touch(sid, message)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _set_cookie(self, headers: MutableHeaders, sid: str) -> None:
+        signed = self.signer.sign(sid.encode("utf-8")).decode("utf-8")
+        headers.append("Set-Cookie", self._cookie(signed, self.max_age))
+
+    async def _touch(self, sid: str, message: Message) -> None:
+        try:
+            await self.store.touch(sid, self.max_age)
+        except Exception as exc:
+            logger.error("Session store write failed: %s", exc)
+            return
+        self._set_cookie(MutableHeaders(scope=message), sid)
+
+    async def _persist(self, sid: Optional[str], session: Dict[str, Any], message: Message,
+                       rotate: bool = False) -> None:
+        headers = MutableHeaders(scope=message)
+        try:
+            if session:
+                # A privilege change (login) never reuses an id the browser brought along
+                new_sid = secrets.token_urlsafe(32) if rotate or not sid else sid
+                await self.store.save(new_sid, dict(session), self.max_age)
+                if sid and new_sid != sid:
+                    await self.store.delete(sid)
+                self._set_cookie(headers, new_sid)
+            elif sid:
+                await self.store.delete(sid)
+                headers.append("Set-Cookie", self._cookie("null", None))
+        except Exception as exc:
+            logger.error("Session store write failed: %s", exc)
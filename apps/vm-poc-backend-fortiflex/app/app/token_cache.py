@@ -0,0 +1,189 @@
+# app/token_cache.py
+"""Process-wide FortiFlex OAuth token cache with single-flight refresh.
+
+Tokens are keyed by ``(username, sha256(api_key))`` so the raw API key never
+becomes a dictionary key or a DynamoDB attribute. Entries live until the
+``expires_in`` reported by the token endpoint; inside ``refresh_margin`` of
+expiry the cached token is still served while one background refresh runs.
+Concurrent misses for the same key share a single upstream call. A token
+FortiFlex rejects (revoked, or rotated by another replica) is dropped with
+``invalidate`` so the next lookup fetches a fresh one.
+
+Set ``FORTIFLEX_TOKEN_TABLE_NAME`` to also share tokens between replicas via a
+DynamoDB table (``cache_key`` string hash key; DynamoDB Local works through
+``AWS_ENDPOINT_URL_DYNAMODB``).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from app.dynamodb import dynamodb_resource_kwargs
+
+logger = logging.getLogger(__name__)
+
+TOKEN_REFRESH_MARGIN = float(os.getenv("FORTIFLEX_TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_TABLE_NAME = os.getenv("FORTIFLEX_TOKEN_TABLE_NAME")
+
+CacheKey = Tuple[str, str]
+# A fetcher returns the token endpoint JSON on success or the router's
+# ``(error_dict, status_code)`` tuple on failure.
+FetchResult = Union[Dict[str, Any], Tuple[Dict[str, Any], int]]
+Fetcher = Callable[[], Awaitable[FetchResult]]
+
+
+@dataclass(frozen=True)
+class CachedToken:
+    access_token: str
+    expires_at: float  # epoch seconds
+
+    def remaining(self, now: Optional[float] = None) -> float:
+        return self.expires_at - (now if now is not None else time.time())
+
+
+def cache_key(username: str, api_key: str) -> CacheKey:
+    return username, hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+class DynamoDBTokenBackend:
+    """Optional shared store so every replica reuses the same token."""
+
+    def __init__(self, table_name: str):
+        import boto3
+
+        self._table = boto3.resource("dynamodb", **dynamodb_resource_kwargs()).Table(table_name)
+
+    @staticmethod
+    def _item_key(key: CacheKey) -> str:
+        return f"{key[0]}#{key[1]}"
+
+    def get(self, key: CacheKey) -> Optional[CachedToken]:
+        item = self._table.get_item(Key={"cache_key": self._item_key(key)}).get("Item")
+        if not item:
+            return None
+        return CachedToken(item["access_token"], float(item["expires_at"]))
+
+    def put(self, key: CacheKey, token: CachedToken) -> None:
+        self._table.put_item(
+            Item={
+                "cache_key": self._item_key(key),
+                "access_token": token.access_token,
+                "expires_at": int(token.expires_at),
+                # Lets a DynamoDB TTL on "ttl" purge expired tokens
+                "ttl": int(token.expires_at),
+            }
+        )
+
+    def delete(self, key: CacheKey, access_token: Optional[str] = None) -> None:
+        kwargs: Dict[str, Any] = {}
+        if access_token is not None:
+            # Leave a token another replica already replaced alone
+            kwargs = {"ConditionExpression": "access_token = :token",
+                      "ExpressionAttributeValues": {":token": access_token}}
+        try:
+            self._table.delete_item(Key={"cache_key": self._item_key(key)}, **kwargs)
+        except self._table.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+
+class TokenCache:
+    def __init__(self, refresh_margin: float = TOKEN_REFRESH_MARGIN, backend=None):
+        self.refresh_margin = refresh_margin
+        self.backend = backend
+        self._entries: Dict[CacheKey, CachedToken] = {}
+        self._inflight: Dict[CacheKey, "asyncio.Task[FetchResult]"] = {}
+
+    def peek(self, key: CacheKey) -> Optional[CachedToken]:
+        token = self._entries.get(key)
+        if token and token.remaining() > 0:
+            return token
+        return None
+
+    def invalidate(self, key: CacheKey, access_token: Optional[str] = None) -> None:
+        """Drop the cached token; with ``access_token``, only if it is still that token."""
+        token = self._entries.get(key)
+        if token is not None and (access_token is None or token.access_token == access_token):
+            del self._entries[key]
+        if self.backend is not None:
+            try:
+                self.backend.delete(key, access_token)
+            except Exception as exc:  # backend is best-effort
+                logger.warning("Failed to delete shared FortiFlex token: %s", exc)
+
+    async def reject(self, key: CacheKey, access_token: str) -> None:
+        """``invalidate`` for a token the upstream refused, off the event loop."""
+        if self.backend is None:
+            self.invalidate(key, access_token)
+        else:
+            await asyncio.to_thread(self.invalidate, key, access_token)
+
+    async def get_token(self, key: CacheKey, fetcher: Fetcher) -> FetchResult:
+        """Return ``{"access_token", "expires_in"}`` or the fetcher's error tuple."""
+        token = self._entries.get(key)
+        if token is None and self.backend is not None:
+            token = await self._load_shared(key)
+
+        if token is not None:
+            remaining = token.remaining()
+            if remaining > self.refresh_margin:
+                return self._as_result(token)
+            if remaining > 0:
+                # Still valid: answer now and refresh ahead of expiry
+                self._refresh(key, fetcher)
+                return self._as_result(token)
+
+        return await asyncio.shield(self._refresh(key, fetcher))
+
+    def _refresh(self, key: CacheKey, fetcher: Fetcher) -> "asyncio.Task[FetchResult]":
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, fetcher))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        return task
+
+    async def _fetch(self, key: CacheKey, fetcher: Fetcher) -> FetchResult:
+        result = await fetcher()
+        if isinstance(result, tuple):
+            return result
+
+        expires_in = float(result.get("expires_in", 3600))
+        token = CachedToken(result["access_token"], time.time() + expires_in)
+        self._entries[key] = token
+        if self.backend is not None:
+            try:
+                await asyncio.to_thread(self.backend.put, key, token)
+            except Exception as exc:
+                logger.warning("Failed to store shared FortiFlex token: %s", exc)
+        return self._as_result(token)
+
+    async def _load_shared(self, key: CacheKey) -> Optional[CachedToken]:
+        try:
+            token = await asyncio.to_thread(self.backend.get, key)
+        except Exception as exc:
+            logger.warning("Failed to read shared FortiFlex token: %s", exc)
+            return None
+        if token is not None and token.remaining() > 0:
+            self._entries[key] = token
+            return token
+        return None
+
+    @staticmethod
+    def _as_result(token: CachedToken) -> Dict[str, Any]:
+        return {"access_token": token.access_token, "expires_in": max(int(token.remaining()), 0)}
+
+
+def _build_backend():
+    if not TOKEN_TABLE_NAME:
+        return None
+    try:
+        return DynamoDBTokenBackend(TOKEN_TABLE_NAME)
+    except Exception as exc:
+        logger.warning("Shared token table %s unavailable: %s", TOKEN_TABLE_NAME, exc)
+        return None
+
+
+token_cache = TokenCache(backend=_build_backend())
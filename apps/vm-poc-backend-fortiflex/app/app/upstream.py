@@ -0,0 +1,248 @@
+# app/upstream.py
+"""Resilience layer for calls to FortiCloud/FortiFlex.
+
+Wraps the shared httpx client (and the synchronous ``requests`` path in
+``app/fortiflex.py``) with per-route timeouts, idempotency-aware retries using
+exponential backoff with full jitter, ``Retry-After`` handling, a client-side
+token bucket sized to the FortiFlex quota, and a circuit breaker that fails
+fast while the upstream is down.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+from app.http_client import get_http_client
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.2"))
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "5"))
+UPSTREAM_RETRY_AFTER_MAX = float(os.getenv("UPSTREAM_RETRY_AFTER_MAX", "10"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", "30"))
+# FortiFlex allows roughly 100 API calls per minute per API user. The bucket is
+# a single one per process, shared by every session and not keyed by user, so
+# it caps the process as a whole; with several workers or replicas, divide the
+# rate between them
+FORTIFLEX_RATE_PER_SECOND = float(os.getenv("FORTIFLEX_RATE_PER_SECOND", str(100 / 60)))
+FORTIFLEX_RATE_BURST = float(os.getenv("FORTIFLEX_RATE_BURST", "20"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Read timeout per upstream path, in seconds; anything else uses DEFAULT_TIMEOUT
+ROUTE_TIMEOUTS: Dict[str, float] = {
+    "/oauth/token/": 10.0,
+    "/programs/list": 15.0,
+    "/configs/list": 20.0,
+    "/entitlements/list": 45.0,
+    "/groups/list": 20.0,
+    "/tools/check-token": 10.0,
+}
+DEFAULT_TIMEOUT = float(os.getenv("UPSTREAM_DEFAULT_TIMEOUT", "30"))
+
+# Paths that only read; safe to retry on any transient failure
+IDEMPOTENT_PATHS = {
+    "/oauth/token/",
+    "/programs/list",
+    "/programs/points",
+    "/configs/list",
+    "/entitlements/list",
+    "/entitlements/points",
+    "/groups/list",
+    "/tools/licenses",
+    "/tools/check-token",
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket usable from both async and sync callers."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take one token (possibly going into debt) and return how long to wait."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def acquire_sync(self) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open after a cool-down."""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._probe_owner: object = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self, owner: object = None) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._probing:
+                # Let exactly one trial request through
+                self._probing = True
+                self._probe_owner = owner
+                return True
+            return False
+
+    def release(self, owner: object) -> None:
+        """End ``owner``'s half-open probe without a verdict (cancelled, or an unexpected error)."""
+        with self._lock:
+            if self._probing and self._probe_owner is owner:
+                self._probing = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("Circuit %s opened after %s failures", self.name, self._failures)
+                self._opened_at = time.monotonic()
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than a (capped) Retry-After."""
+    delay = random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, UPSTREAM_RETRY_AFTER_MAX))
+    return delay
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class UpstreamClient:
+    name: str
+    breaker: CircuitBreaker
+    limiter: Optional[TokenBucket] = None
+    max_attempts: int = UPSTREAM_MAX_ATTEMPTS
+
+    async def request(self, method: str, url: str, *, route: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """Send ``method url`` with retries; raises CircuitOpenError or the last transport error.
+
+        With ``stream=True`` the body is left unread and the caller must ``aclose()`` the response.
+        """
+        idempotent = route in IDEMPOTENT_PATHS
+        kwargs.setdefault("timeout", httpx.Timeout(ROUTE_TIMEOUTS.get(route, DEFAULT_TIMEOUT), connect=5.0))
+        client = get_http_client()
+
+        for attempt in range(self.max_attempts):
+            owner = object()
+            if not self.breaker.allow(owner):
+                raise CircuitOpenError(f"{self.name} circuit is open")
+
+            last_attempt = attempt == self.max_attempts - 1
+            try:
+                if self.limiter is not None:
+                    await self.limiter.acquire()
+                if stream:
+                    response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+                else:
+                    response = await client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as exc:
+                # Never reached the upstream: safe to retry any method
+                self.breaker.record_failure()
+                if last_attempt:
+                    raise
+                logger.warning("%s %s connect failed (%s); retrying", self.name, route, exc)
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if not idempotent or last_attempt:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+            except BaseException:
+                # Cancelled (client went away) or failed outside httpx: a half-open
+                # probe must not stay claimed, or the breaker never closes again
+                self.breaker.release(owner)
+                raise
+
+            if response.status_code >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            # 429 means the request was rejected before processing, so any method may retry
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRYABLE_STATUS)
+            if not retryable or last_attempt:
+                return response
+            if stream:
+                await response.aclose()
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            logger.warning("%s %s returned %s; retrying", self.name, route, response.status_code)
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+        return response  # pragma: no cover - loop always returns or raises
+
+
+fortiflex_limiter = TokenBucket(FORTIFLEX_RATE_PER_SECOND, FORTIFLEX_RATE_BURST)
+forticloud_auth = UpstreamClient("forticloud-auth", CircuitBreaker("forticloud-auth"))
+fortiflex_api = UpstreamClient("fortiflex", CircuitBreaker("fortiflex"), limiter=fortiflex_limiter)
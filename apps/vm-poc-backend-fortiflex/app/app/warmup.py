@@ -0,0 +1,77 @@
+# app/warmup.py
+"""Background warm-up of the slow-to-load parts of the backend.
+
+The lifespan only does what is cheap (HTTP client, deploy workers) and then
+lets uvicorn start listening; ``warmup.start`` runs the expensive steps -
+importing boto3 and loading the catalog, importing python3-saml and parsing
+the SAML settings - in a task. ``/readyz`` answers 503 until every step has
+finished, so Kubernetes only routes traffic to warm pods. A step that fails
+is logged and recorded, not retried: the code it warms loads lazily on first
+use anyway, so the pod still becomes ready.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Step = Tuple[str, Callable[[], Awaitable[Any]]]
+
+
+class Warmup:
+    def __init__(self):
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.finished_at is not None
+
+    def start(self, steps: List[Step]) -> None:
+        if self._task is not None:
+            return
+        self.started_at = time.monotonic()
+        self.steps = {name: {"status": "pending"} for name, _ in steps}
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def _run(self, steps: List[Step]) -> None:
+        results = await asyncio.gather(*(self._step(name, step) for name, step in steps))
+        self.finished_at = time.monotonic()
+        logger.info(
+            "Warm-up finished in %.0f ms (%s)",
+            (self.finished_at - self.started_at) * 1000,
+            ", ".join(f"{name} {ms:.0f} ms" for name, ms in results),
+        )
+
+    async def _step(self, name: str, step: Callable[[], Awaitable[Any]]) -> Tuple[str, float]:
+        started = time.monotonic()
+        try:
+            await step()
+            self.steps[name] = {"status": "ok"}
+        except Exception as exc:
+            logger.exception("Warm-up step %s failed; it will load on first use", name)
+            self.steps[name] = {"status": "failed", "error": str(exc)}
+        elapsed = (time.monotonic() - started) * 1000
+        self.steps[name]["ms"] = round(elapsed, 1)
+        return name, elapsed
+
+    def status(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round(((self.finished_at or time.monotonic()) - self.started_at) * 1000, 1)
+        return {"ready": self.ready, "elapsed_ms": elapsed, "steps": self.steps}
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+
+warmup = Warmup()
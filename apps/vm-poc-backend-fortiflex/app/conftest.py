@@ -0,0 +1,6 @@
+# Lets ``pytest`` run from this directory (or the repo root) and import ``app``
+# the same way the image does, with WORKDIR /app.
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
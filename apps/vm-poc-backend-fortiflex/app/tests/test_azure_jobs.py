@@ -0,0 +1,126 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app import azure_jobs as azure_module
+from app import http_client
+from app.azure_jobs import AzureJobTracker
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    def instant(initial, factor, maximum):
+        while True:
+            yield 0
+
+    monkeypatch.setattr(azure_module, "backoff_delays", instant)
+    monkeypatch.setattr(azure_module, "AZURE_AUTOMATION_JOB_URL", None)
+
+
+def run_webhook(responses):
+    """Submit one job against a webhook answering with ``responses`` in order."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        outcome = responses[len(calls) - 1]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def scenario():
+        http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        tracker = AzureJobTracker()
+        try:
+            job, _ = tracker.submit("flex-token", "alice")
+            await asyncio.gather(*tracker._tasks.values())
+            return job
+        finally:
+            await http_client.close_http_client()
+
+    return asyncio.run(scenario()), len(calls)
+
+
+def accepted():
+    return httpx.Response(202, json={"JobIds": ["azure-1"]})
+
+
+def test_connect_errors_are_retried():
+    job, calls = run_webhook([httpx.ConnectError("refused"), httpx.ConnectTimeout("slow"), accepted()])
+
+    assert (job.status, job.azure_job_ids, calls) == ("submitted", ["azure-1"], 3)
+
+
+def test_throttling_is_retried():
+    job, calls = run_webhook([httpx.Response(429, headers={"Retry-After": "0"}), accepted()])
+
+    assert (job.status, calls) == ("submitted", 2)
+
+
+@pytest.mark.parametrize("outcome", [httpx.ReadTimeout("no answer"), httpx.RemoteProtocolError("dropped"),
+                                     httpx.Response(500), httpx.Response(503)])
+def test_failures_after_sending_are_not_retried(outcome):
+    job, calls = run_webhook([outcome, accepted()])
+
+    assert (job.status, calls) == ("unknown", 1)
+    assert "webhook" in job.error
+
+
+def test_client_errors_fail_without_retry():
+    job, calls = run_webhook([httpx.Response(400, text="bad payload"), accepted()])
+
+    assert (job.status, calls) == ("failed", 1)
+
+
+def test_unknown_outcome_blocks_an_immediate_resubmit():
+    tracker = AzureJobTracker()
+    job = azure_module.AzureJob(id="1", token_hash="h", user=None, status="unknown", finished_at=time.time())
+
+    assert tracker._dedupes(job)
+
+
+@pytest.mark.parametrize("reply", [httpx.Response(202, text="Accepted"), httpx.Response(200, json=["azure-1"]),
+                                   httpx.Response(202)])
+def test_accepted_call_without_job_ids_is_submitted_not_failed(reply):
+    job, calls = run_webhook([reply, accepted()])
+
+    assert (job.status, job.azure_job_ids, calls) == ("submitted", [], 1)
+
+
+@pytest.fixture
+def azuremagic_client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.routes import azuremagic
+
+    tracker = AzureJobTracker()
+    monkeypatch.setattr(azuremagic, "azure_jobs", tracker)
+    monkeypatch.setattr(tracker, "_run", lambda job, payload: asyncio.sleep(0))
+    app = FastAPI()
+    app.include_router(azuremagic.router)
+
+    @app.middleware("http")
+    async def session_from_header(request, call_next):
+        request.scope["session"] = {"user": {"name": request.headers.get("x-user")}}
+        return await call_next(request)
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("body", [b"not json", b"[1, 2]", b""])
+def test_azuremagic_rejects_bodies_that_are_not_objects(azuremagic_client, body):
+    response = azuremagic_client.post("/api/azuremagic", content=body, headers={"content-type": "application/json"})
+
+    assert response.status_code == 400
+
+
+def test_deduplicated_launch_does_not_reveal_the_other_user(azuremagic_client):
+    first = azuremagic_client.post("/api/azuremagic", json={"flexentitlementtoken": "T"}, headers={"x-user": "alice"})
+    second = azuremagic_client.post("/api/azuremagic", json={"flexentitlementtoken": "T"}, headers={"x-user": "bob"})
+
+    assert first.json()["user"] == "alice"
+    assert second.json()["id"] == first.json()["id"] and second.json()["deduplicated"]
+    assert "user" not in second.json()
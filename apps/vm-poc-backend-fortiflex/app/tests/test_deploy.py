@@ -0,0 +1,230 @@
+"""Deploy job engine against benchmarks/fake_terraform.py as TF_BINARY."""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.middleware.sessions import SessionMiddleware
+
+from app import deploy
+from app.deploy import DeployEngine
+from app.routes import deploy as deploy_routes
+
+FAKE_TERRAFORM = Path(__file__).resolve().parents[4] / "benchmarks" / "fake_terraform.py"
+
+
+@pytest.fixture
+def work(tmp_path, monkeypatch):
+    modules = tmp_path / "modules"
+    modules.mkdir()
+    (modules / "main.tf").write_text('variable "name" {}\n')
+    monkeypatch.setenv("FAKE_TF_DELAY", "0.1")
+    monkeypatch.setenv("FAKE_TF_TRACE", str(tmp_path / "trace.log"))
+    monkeypatch.setattr(deploy, "DEPLOY_POLL_SECONDS", 0.05)
+    return tmp_path
+
+
+def engine(work: Path, max_workers: int = 2) -> DeployEngine:
+    return DeployEngine(work_dir=work / "tf", modules_dir=work / "modules", binary=str(FAKE_TERRAFORM),
+                        max_workers=max_workers, plugin_cache_dir=work / "plugins")
+
+
+async def wait_for(engine: DeployEngine, job_id: str, statuses=deploy.TERMINAL, timeout: float = 20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = engine.get(job_id)
+        if job.status in statuses:
+            return job
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"job {job_id} still {engine.get(job_id).status}")
+
+
+def phases(work: Path):
+    """(run_dir, phase, start, end) per fake terraform invocation."""
+    starts, spans = {}, []
+    for line in (work / "trace.log").read_text().splitlines():
+        event, run_dir, phase, at = line.split()
+        if event == "start":
+            starts[(run_dir, phase)] = float(at)
+        else:
+            spans.append((run_dir, phase, starts.pop((run_dir, phase)), float(at)))
+    return spans
+
+
+def test_apply_runs_init_plan_apply_and_records_outputs(work):
+    async def scenario():
+        runner = engine(work)
+        await runner.start()
+        try:
+            job = await runner.submit("ws1", {"name": "vm-1"}, owner="alice")
+            done = await wait_for(runner, job.id)
+            lines = [line async for line in runner.follow(done)]
+        finally:
+            await runner.stop()
+        return done, lines
+
+    job, lines = asyncio.run(scenario())
+
+    assert job.status == "succeeded" and job.exit_code == 0
+    assert job.outputs == {"name": {"value": "vm-1", "type": "string", "sensitive": False}}
+    assert lines[0] == "queued apply for workspace ws1"
+    assert any(line.startswith("$ terraform init") for line in lines)
+    assert lines[-1] == "--- job succeeded ---"
+
+
+def test_tfvars_stay_out_of_the_record_and_are_removed_when_done(work):
+    async def scenario():
+        runner = engine(work)
+        await runner.start()
+        try:
+            job = await runner.submit("ws1", {"name": "secret-value"}, action="plan", owner="alice")
+            vars_file = runner.store.tfvars_path(job.id)
+            mode = vars_file.stat().st_mode & 0o777
+            await wait_for(runner, job.id)
+            return runner.store.record_path(job.id).read_text(), mode, vars_file.exists()
+        finally:
+            await runner.stop()
+
+    record, mode, vars_left = asyncio.run(scenario())
+
+    assert "secret-value" not in record and "tfvars" not in record
+    assert mode == 0o600
+    assert not vars_left
+
+
+def test_runs_for_one_workspace_never_overlap(work):
+    async def scenario():
+        runner = engine(work, max_workers=3)
+        await runner.start()
+        try:
+            jobs = [await runner.submit(ws, {"name": ws}, owner="alice") for ws in ("same", "same", "other")]
+            return [await wait_for(runner, job.id) for job in jobs]
+        finally:
+            await runner.stop()
+
+    jobs = asyncio.run(scenario())
+
+    assert [job.status for job in jobs] == ["succeeded"] * 3
+    same = sorted((start, end) for run_dir, _, start, end in phases(work) if run_dir.endswith("/same"))
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(same, same[1:]))
+
+
+def test_cancel_queued_and_running_jobs(work, monkeypatch):
+    monkeypatch.setenv("FAKE_TF_DELAY", "1")
+
+    async def scenario():
+        runner = engine(work, max_workers=1)
+        await runner.start()
+        try:
+            running = await runner.submit("ws1", {}, owner="alice")
+            queued = await runner.submit("ws2", {}, owner="alice")
+            await wait_for(runner, running.id, {"running"})
+            await runner.cancel(queued.id)
+            await runner.cancel(running.id)
+            return await wait_for(runner, running.id), await wait_for(runner, queued.id)
+        finally:
+            await runner.stop()
+
+    running, queued = asyncio.run(scenario())
+
+    assert (running.status, running.error) == ("cancelled", "Cancelled while running")
+    assert (queued.status, queued.error) == ("cancelled", "Cancelled before start")
+    assert queued.started_at is None
+
+
+def test_job_interrupted_by_shutdown_resumes_after_restart(work, monkeypatch):
+    monkeypatch.setenv("FAKE_TF_DELAY", "0.5")
+
+    async def scenario():
+        first = engine(work)
+        await first.start()
+        job = await first.submit("ws1", {"name": "vm-1"}, owner="alice")
+        await wait_for(first, job.id, {"running"})
+        await first.stop()
+        interrupted = first.store.load(job.id)
+
+        second = engine(work)
+        await second.start()
+        try:
+            return interrupted, await wait_for(second, job.id)
+        finally:
+            await second.stop()
+
+    interrupted, resumed = asyncio.run(scenario())
+
+    assert interrupted.status == "running"
+    assert resumed.status == "succeeded"
+    assert resumed.attempts == 2
+
+
+def test_only_one_engine_runs_jobs_and_others_hand_over(work):
+    async def scenario():
+        runner, other = engine(work), engine(work)
+        await runner.start()
+        await other.start()
+        try:
+            job = await other.submit("ws1", {"name": "vm-1"}, owner="alice")
+            lines = [line async for line in other.follow(job)]
+            done = other.get(job.id)
+            leaders = (runner.leader, other.leader)
+            await runner.stop()
+            await asyncio.sleep(0.3)
+            return leaders, other.leader, done, lines
+        finally:
+            await other.stop()
+
+    leaders, took_over, job, lines = asyncio.run(scenario())
+
+    assert leaders == (True, False)
+    assert took_over
+    assert job.status == "succeeded" and job.attempts == 1
+    assert lines[-1] == "--- job succeeded ---"
+    assert sum(1 for run_dir, phase, *_ in phases(work) if phase == "apply") == 1
+
+
+@pytest.fixture
+def client(work, monkeypatch):
+    runner = engine(work)
+    monkeypatch.setattr(deploy_routes, "deploy_engine", runner)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        await runner.start()
+        yield
+        await runner.stop()
+
+    app = FastAPI(lifespan=lifespan)
+    app.add_middleware(SessionMiddleware, secret_key="test")
+
+    @app.post("/login/{email}")
+    async def login(email: str, request: Request):
+        request.session["user"] = {"email": email, "nameid": email}
+        return {}
+
+    app.include_router(deploy_routes.router)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_deploy_routes_need_a_login(client):
+    assert client.post("/api/deploy", json={"workspace": "ws1"}).status_code == 401
+    assert client.get("/api/deploy").status_code == 401
+    assert client.get("/api/deploy/0123456789abcdef0123456789abcdef").status_code == 401
+
+
+def test_jobs_are_private_to_their_owner(client):
+    client.post("/login/alice@example.com")
+    job = client.post("/api/deploy", json={"workspace": "ws1", "action": "plan"}).json()
+    assert job["owner"] == "alice@example.com"
+
+    client.post("/login/bob@example.com")
+    assert client.get("/api/deploy").json() == {"jobs": []}
+    assert client.get(f"/api/deploy/{job['id']}").status_code == 404
+    assert client.post(f"/api/deploy/{job['id']}/cancel").status_code == 404
+    assert client.get(f"/api/deploy/{job['id']}/events").status_code == 404
+
+    client.post("/login/alice@example.com")
+    assert [row["id"] for row in client.get("/api/deploy").json()["jobs"]] == [job["id"]]
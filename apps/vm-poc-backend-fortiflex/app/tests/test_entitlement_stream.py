@@ -0,0 +1,42 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.middleware.sessions import SessionMiddleware
+
+from app.routes import fortiflex
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_configs(request, path, body=None, raw=False):
+        return {"configs": []}
+
+    monkeypatch.setattr(fortiflex, "cached_fortiflex_call", no_configs)
+    app = FastAPI()
+    app.add_middleware(SessionMiddleware, secret_key="test")
+
+    @app.post("/login")
+    async def login(request: fortiflex.Request):
+        request.session["fortiflex_serial_number"] = "ELAVMS0000000001"
+        return {}
+
+    app.include_router(fortiflex.router)
+    client = TestClient(app)
+    client.post("/login")
+    return client
+
+
+def test_program_without_configs_streams_empty_ndjson(client):
+    response = client.post("/api/fortiflex/entitlements/stream")
+
+    assert response.status_code == 200
+    assert response.text == ""
+
+
+def test_program_without_configs_streams_empty_json(client):
+    response = client.post("/api/fortiflex/entitlements/stream", params={"format": "json"})
+
+    assert response.status_code == 200
+    assert json.loads(response.text) == {"entitlements": [], "count": 0}
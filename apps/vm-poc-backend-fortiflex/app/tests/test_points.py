@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+from app.points import PointsEngine, estimate
+from app.routes.fortiflex import _estimate_days
+
+CPU, STORAGE, PACKAGE = 1, 2, 3
+PACKAGES = {"FC": 1.0, "UTP": 1.5, "ATP": 2.0}
+
+
+class StandInCalc:
+    """Plays /tools/calc for one product type, recording every configuration it prices."""
+
+    def __init__(self, price, reject=lambda params: False):
+        self.price = price
+        self.reject = reject
+        self.calls = []
+
+    async def __call__(self, product_type_id, params):
+        self.calls.append(dict(params))
+        if self.reject(params):
+            return {"error": "Invalid parameter value"}, 400
+        return round(self.price(params), 4)
+
+
+def linear(params):
+    return (2 + 0.5 * float(params[CPU]) + 0.1 * float(params.get(STORAGE, 0))) * PACKAGES[params.get(PACKAGE, "FC")]
+
+
+def tiered_cpu(params):
+    # First 4 CPUs at 1 point each, every further one at 2
+    cpus = float(params[CPU])
+    return min(cpus, 4) + 2 * max(cpus - 4, 0)
+
+
+def _items(configs):
+    return [{"productTypeId": 1, "parameters": [{"id": param, "value": value} for param, value in config.items()]}
+            for config in configs]
+
+
+def _points_per_day(configs, calc, engine, days=1):
+    result = asyncio.run(estimate(_items(configs), days, calc, engine=engine))
+    return [item["pointsPerDay"] for item in result["items"]]
+
+
+def test_linear_prices_match_the_calculator_with_few_calls():
+    configs = [{CPU: cpu, STORAGE: storage, PACKAGE: package}
+               for cpu in (1, 2, 4, 8, 16) for storage in (0, 100, 500) for package in PACKAGES]
+    calc = StandInCalc(linear)
+    engine = PointsEngine()
+
+    assert _points_per_day(configs, calc, engine) == pytest.approx([linear(config) for config in configs])
+    assert engine.status()[0]["linear"] is True
+    assert len(calc.calls) < len(configs) / 4
+
+
+@pytest.mark.parametrize("cpus", [(2, 16), (2, 6, 16), (16, 2)])
+def test_tiered_parameter_falls_back_to_exact_pricing(cpus):
+    configs = [{CPU: cpu} for cpu in cpus]
+    calc = StandInCalc(tiered_cpu)
+    engine = PointsEngine()
+
+    assert _points_per_day(configs, calc, engine) == [tiered_cpu(config) for config in configs]
+    assert engine.status()[0]["linear"] is False
+    # Later estimates with values the probes never saw are priced upstream too
+    later = [{CPU: 3}, {CPU: 9}]
+    assert _points_per_day(later, calc, engine) == [tiered_cpu(config) for config in later]
+
+
+def test_tiers_hidden_behind_an_option_parameter_are_caught():
+    def price(params):
+        return tiered_cpu(params) * PACKAGES[params[PACKAGE]]
+
+    configs = [{CPU: 2, PACKAGE: "FC"}, {CPU: 16, PACKAGE: "UTP"}]
+    calc = StandInCalc(price)
+    engine = PointsEngine()
+
+    assert _points_per_day(configs, calc, engine) == [price(config) for config in configs]
+    assert engine.status()[0]["linear"] is False
+
+
+def test_rejected_check_probe_prices_upstream():
+    # Only 1 and 2 CPUs exist, so the third value (3) is refused
+    calc = StandInCalc(linear, reject=lambda params: float(params[CPU]) > 2)
+    engine = PointsEngine()
+    configs = [{CPU: 1}, {CPU: 2}]
+
+    assert _points_per_day(configs, calc, engine) == [linear(config) for config in configs]
+    assert engine.status()[0]["linear"] is False
+
+
+def test_option_seen_later_with_zero_reference_points_prices_upstream():
+    def price(params):
+        return float(params[CPU]) * PACKAGES[params[PACKAGE]]
+
+    calc = StandInCalc(price)
+    engine = PointsEngine()
+    first = [{CPU: 0, PACKAGE: "FC"}, {CPU: 4, PACKAGE: "FC"}]
+    assert _points_per_day(first, calc, engine) == [price(config) for config in first]
+
+    later = [{CPU: 4, PACKAGE: "ATP"}]
+    assert _points_per_day(later, calc, engine) == [price(config) for config in later]
+
+
+@pytest.mark.parametrize("days", ["abc", -1, 0, "nan", [3]])
+def test_invalid_days_are_rejected(days):
+    assert _estimate_days({"days": days}) == ({"error": "days must be a positive number"}, 400)
+
+    items = [{**_items([{CPU: 1}])[0], "days": days}]
+    calc = StandInCalc(linear)
+    error, status = asyncio.run(estimate(items, 1, calc, engine=PointsEngine()))
+    assert status == 400 and "items[0].days" in error["error"]
+    assert calc.calls == []
+
+
+@pytest.mark.parametrize("count", [-1, "nan", "inf", "-inf", "abc"])
+def test_invalid_counts_are_rejected(count):
+    items = [{**_items([{CPU: 1}])[0], "count": count}]
+    calc = StandInCalc(linear)
+    error, status = asyncio.run(estimate(items, 1, calc, engine=PointsEngine()))
+    assert status == 400 and "items[0]" in error["error"]
+    assert calc.calls == []
+
+
+def test_days_default_and_dates():
+    assert _estimate_days({}) == 1.0
+    assert _estimate_days({"days": "7"}) == 7.0
+    assert _estimate_days({"startDate": "2025-01-01", "endDate": "2025-01-31", "days": "abc"}) == 30.0
@@ -0,0 +1,117 @@
+import asyncio
+import base64
+import dataclasses
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app import catalog as catalog_module
+from app.api import products
+from app.catalog import CatalogService, _make_snapshot, catalog, query_index
+
+ITEMS = [
+    {"id": "1", "cloud": "aws", "sku": "FG-VM01", "price": "0.10/hr"},
+    {"id": "2", "cloud": "AWS", "sku": "fg-vm02", "price": "0.20/hr"},
+    {"id": "3", "cloud": "Azure", "sku": "FG-VM01", "price": "0.30/hr"},
+]
+
+
+def _key_conditions(condition):
+    """Flatten ``Key(a).eq(x) & Key(b).eq(y)`` into {a: x, b: y}."""
+    expression = condition.get_expression()
+    if expression["operator"] == "AND":
+        left, right = expression["values"]
+        return {**_key_conditions(left), **_key_conditions(right)}
+    key, value = expression["values"]
+    return {key.name: value}
+
+
+class FakeIndexedTable:
+    """Stores items the way the seeder writes them, with lower-cased index keys."""
+
+    name = "products"
+
+    def __init__(self, items):
+        self.items = [{**item, "cloud_lower": item["cloud"].lower(), "sku_lower": item["sku"].lower()}
+                      for item in items]
+
+    def query(self, IndexName, KeyConditionExpression, **kwargs):
+        wanted = _key_conditions(KeyConditionExpression)
+        return {"Items": [item for item in self.items if all(item.get(k) == v for k, v in wanted.items())]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(catalog, "_snapshot", _make_snapshot(ITEMS, source="test"))
+    app = FastAPI()
+    app.include_router(products.router)
+    return TestClient(app)
+
+
+def test_index_query_is_case_insensitive_like_the_snapshot():
+    table = FakeIndexedTable(ITEMS)
+    snapshot = _make_snapshot(ITEMS, source="test")
+
+    for cloud, sku in [("AWS", None), ("aws", "FG-VM02"), (None, "fg-vm01")]:
+        from_index = query_index(table, cloud, sku)
+        assert from_index == list(products._candidates(snapshot, cloud, sku))
+        assert all("cloud_lower" not in item and "sku_lower" not in item for item in from_index)
+
+
+def test_cold_start_lookup_matches_warm_results(client, monkeypatch):
+    warm = client.get("/api/products", params={"cloud": "AWS"}).json()
+
+    table = FakeIndexedTable(ITEMS)
+    monkeypatch.setattr(catalog, "_snapshot", None)
+    monkeypatch.setattr(catalog, "load_in_background", lambda: None)
+    monkeypatch.setattr(catalog_module, "_products_table", lambda: table)
+    cold = client.get("/api/products", params={"cloud": "AWS"}).json()
+
+    assert [item["id"] for item in warm] == ["1", "2"]
+    assert cold == warm
+
+
+def test_cursor_pages_through_one_version(client):
+    first = client.get("/api/products", params={"limit": 2})
+    second = client.get("/api/products", params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]})
+
+    assert [item["id"] for item in first.json() + second.json()] == ["1", "2", "3"]
+    assert "X-Next-Cursor" not in second.headers
+
+
+def test_cursor_from_an_older_catalog_version_is_rejected(client, monkeypatch):
+    cursor = client.get("/api/products", params={"limit": 2}).headers["X-Next-Cursor"]
+    monkeypatch.setattr(catalog, "_snapshot", _make_snapshot(ITEMS[:2], source="test"))
+
+    response = client.get("/api/products", params={"limit": 2, "cursor": cursor})
+
+    assert response.status_code == 409
+
+
+def test_malformed_cursor_is_a_bad_request(client):
+    bogus = base64.urlsafe_b64encode(json.dumps({"o": -1, "v": "x"}).encode()).decode()
+    assert client.get("/api/products", params={"cursor": "%%%"}).status_code == 400
+    assert client.get("/api/products", params={"cursor": bogus}).status_code == 400
+
+
+def test_worker_start_skips_the_reload_when_the_catalog_was_checked_recently(monkeypatch):
+    scans = []
+    monkeypatch.setattr(catalog_module, "_products_table", lambda: FakeIndexedTable(ITEMS))
+    monkeypatch.setattr(catalog_module, "scan_all", lambda table: scans.append(table) or list(ITEMS))
+    service = CatalogService(refresh_seconds=60, version_id=None)
+    service.load(force=True)
+    # Content unchanged for a long time, but verified just now (e.g. by the pre-fork master)
+    service._snapshot = dataclasses.replace(service._snapshot, loaded_at=0.0)
+
+    async def start_and_stop():
+        await service.start()
+        await service.stop()
+
+    asyncio.run(start_and_stop())
+    assert len(scans) == 1
+
+    service.checked_at = 0.0
+    asyncio.run(start_and_stop())
+    assert len(scans) == 2
@@ -0,0 +1,36 @@
+import asyncio
+
+from app.response_cache import ResponseCache
+
+SCOPE = ("user@example.com", "account", "ELAVMS0000000001")
+
+
+def test_fetch_started_before_a_mutation_is_not_cached():
+    cache = ResponseCache()
+    key = cache.make_key(SCOPE, "/entitlements/list", {"configId": 1})
+
+    async def scenario():
+        release = asyncio.Event()
+        calls = []
+
+        async def fetcher():
+            calls.append(len(calls))
+            if len(calls) == 1:
+                await release.wait()
+                return {"entitlements": ["before"]}
+            return {"entitlements": ["after"]}
+
+        before = asyncio.create_task(cache.get_or_fetch(key, 30, fetcher))
+        await asyncio.sleep(0)
+        cache.invalidate_after(SCOPE, "/entitlements/stop")
+        # A read after the mutation does not join the fetch that started before it
+        after = await asyncio.wait_for(cache.get_or_fetch(key, 30, fetcher), 5)
+        release.set()
+        return await before, after, cache.get(key), len(calls)
+
+    before, after, cached, calls = asyncio.run(scenario())
+
+    assert before == {"entitlements": ["before"]}
+    assert after == {"entitlements": ["after"]}
+    assert cached == {"entitlements": ["after"]}
+    assert calls == 2
@@ -0,0 +1,39 @@
+import time
+
+from app.routes.saml import AssertionReplayCache
+
+
+def test_replayed_assertion_is_refused_until_it_expires():
+    cache = AssertionReplayCache()
+    now = time.time()
+
+    assert cache.check_and_add("a", now + 60)
+    assert not cache.check_and_add("a", now + 60)
+    assert cache.check_and_add("b", now - 1)
+    assert cache.check_and_add("b", now + 60)
+
+
+def test_long_lived_entry_does_not_shield_expired_ones():
+    cache = AssertionReplayCache()
+    now = time.time()
+    cache.check_and_add("long", now + 3600)
+    cache.check_and_add("short", now + 0.05)
+
+    time.sleep(0.1)
+    cache.check_and_add("next", now + 60)
+
+    assert "short" not in cache._seen
+    assert set(cache._seen) == {"long", "next"}
+
+
+def test_full_cache_evicts_the_soonest_expiring_id():
+    cache = AssertionReplayCache(max_entries=3)
+    now = time.time()
+    cache.check_and_add("first-long", now + 3600)
+    cache.check_and_add("soon", now + 60)
+    cache.check_and_add("later-long", now + 3600)
+
+    cache.check_and_add("new", now + 600)
+
+    assert set(cache._seen) == {"first-long", "later-long", "new"}
+    assert not cache.check_and_add("first-long", now + 3600)
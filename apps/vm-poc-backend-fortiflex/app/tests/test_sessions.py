@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.sessions import MemorySessionStore, ServerSideSessionMiddleware
+
+MAX_AGE = 600
+
+
+@pytest.fixture
+def store():
+    return MemorySessionStore()
+
+
+@pytest.fixture
+def client(store):
+    app = FastAPI()
+    app.add_middleware(ServerSideSessionMiddleware, secret_key="test", store=store, max_age=MAX_AGE)
+
+    @app.post("/visit")
+    async def visit(request: Request):
+        request.session["visits"] = request.session.get("visits", 0) + 1
+        return {}
+
+    @app.post("/login")
+    async def login(request: Request):
+        request.session["user"] = {"email": "user@example.com"}
+        return {}
+
+    @app.get("/whoami")
+    async def whoami(request: Request):
+        return {"user": request.session.get("user")}
+
+    return TestClient(app)
+
+
+def _sid(client):
+    return client.cookies["session"].rsplit(".", 1)[0]
+
+
+def test_login_rotates_the_session_id(client, store):
+    client.post("/visit")
+    planted = _sid(client)
+
+    response = client.post("/login")
+
+    assert "set-cookie" in response.headers
+    assert _sid(client) != planted
+    assert planted not in store._entries
+    assert client.get("/whoami").json()["user"] == {"email": "user@example.com"}
+
+
+def test_read_only_sessions_slide_once_half_the_lifetime_is_gone(client, store):
+    client.post("/login")
+    sid = _sid(client)
+
+    assert "set-cookie" not in client.get("/whoami").headers
+
+    # Age the entry past half its lifetime
+    store._entries[sid] = (time.time() + MAX_AGE / 2 - 1, store._entries[sid][1])
+    response = client.get("/whoami")
+
+    assert f"Max-Age={MAX_AGE}" in response.headers["set-cookie"]
+    assert store._entries[sid][0] > time.time() + MAX_AGE - 5
+    assert _sid(client) == sid
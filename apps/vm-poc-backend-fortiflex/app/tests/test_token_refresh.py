@@ -0,0 +1,69 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+from app import http_client
+from app.routes import fortiflex
+from app.token_cache import TokenCache, cache_key
+
+SESSION = {"fortiflex_username": "user", "fortiflex_api_key": "key"}
+
+
+def _run_with_upstream(monkeypatch, handler):
+    cache = TokenCache(backend=None)
+    monkeypatch.setattr(fortiflex, "token_cache", cache)
+    issued = []
+
+    async def new_token(username, api_key):
+        issued.append(f"token-{len(issued) + 1}")
+        return {"access_token": issued[-1], "expires_in": 3600}
+
+    monkeypatch.setattr(fortiflex, "get_new_fortiflex_token", new_token)
+
+    async def call():
+        http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            request = SimpleNamespace(session=dict(SESSION))
+            return await fortiflex.send_fortiflex_request(request, "POST", "/programs/list", {})
+        finally:
+            await http_client.close_http_client()
+
+    return asyncio.run(call()), cache, issued
+
+
+def test_rejected_token_is_refreshed_once(monkeypatch):
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        if request.headers["Authorization"] == "Bearer token-1":
+            return httpx.Response(401, json={"error": "invalid token"})
+        return httpx.Response(200, json={"programs": []})
+
+    response, cache, issued = _run_with_upstream(monkeypatch, handler)
+
+    assert response.status_code == 200
+    assert seen == ["Bearer token-1", "Bearer token-2"]
+    assert cache.peek(cache_key("user", "key")).access_token == "token-2"
+
+
+def test_second_401_is_returned_to_the_caller(monkeypatch):
+    response, cache, issued = _run_with_upstream(monkeypatch, lambda request: httpx.Response(401, text="nope"))
+
+    assert response == ({"error": "FortiFlex /programs/list failed", "details": "nope"}, 400)
+    assert issued == ["token-1", "token-2"]
+
+
+def test_invalidate_keeps_a_token_that_was_already_replaced():
+    cache = TokenCache(backend=None)
+    key = cache_key("user", "key")
+
+    async def fetch():
+        return {"access_token": "fresh", "expires_in": 3600}
+
+    asyncio.run(cache.get_token(key, fetch))
+    cache.invalidate(key, "stale")
+    assert cache.peek(key).access_token == "fresh"
+    cache.invalidate(key, "fresh")
+    assert cache.peek(key) is None
@@ -0,0 +1,76 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app import http_client
+from app.upstream import CircuitBreaker, CircuitOpenError, TokenBucket, UpstreamClient
+
+
+def _half_open_breaker():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    return breaker
+
+
+def _run(client: UpstreamClient, handler):
+    async def call():
+        http_client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await client.request("GET", "https://upstream.test/programs/list", route="/programs/list")
+        finally:
+            await http_client.close_http_client()
+
+    return asyncio.run(call())
+
+
+def test_only_one_half_open_probe_at_a_time():
+    breaker = _half_open_breaker()
+    probe = object()
+
+    assert breaker.allow(probe)
+    assert not breaker.allow(object())
+    breaker.release(object())  # not the probe's owner
+    assert not breaker.allow(object())
+
+
+def test_cancelled_probe_frees_the_breaker():
+    breaker = _half_open_breaker()
+
+    class SlowBucket(TokenBucket):
+        async def acquire(self):
+            await asyncio.sleep(10)
+
+    client = UpstreamClient("test", breaker, limiter=SlowBucket(1, 1), max_attempts=1)
+
+    async def cancel_probe():
+        task = asyncio.create_task(client.request("GET", "https://upstream.test/", route="/programs/list"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_probe())
+    assert breaker.allow(object())
+
+
+def test_unexpected_error_frees_the_probe_and_a_later_success_closes_it():
+    breaker = _half_open_breaker()
+    client = UpstreamClient("test", breaker, max_attempts=1)
+
+    def broken(request):
+        raise RuntimeError("bug in a transport hook")
+
+    with pytest.raises(RuntimeError):
+        _run(client, broken)
+    assert _run(client, lambda request: httpx.Response(200)).status_code == 200
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        _run(UpstreamClient("test", breaker), lambda request: httpx.Response(200))
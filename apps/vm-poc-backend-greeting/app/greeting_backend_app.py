@@ -1,14 +1,20 @@
+import os
 import random
 from fastapi import FastAPI, Query
 from pydantic import BaseModel
 from typing import Optional
 import uvicorn
 
+from vm_poc_common.fastjson import FastJSONResponse
+from vm_poc_common.metrics import install_metrics
+
 app = FastAPI(
     title="Greeting Backend",
     description="Backend service that returns personalized greeting messages with a random ID.",
     version="1.0.0",
+    default_response_class=FastJSONResponse,
 )
+install_metrics(app, "greeting-backend")
 
 # Response model for the JSON response
 class GreetingResponse(BaseModel):
@@ -32,7 +38,11 @@ async def greet(
 ):
     random_num = random.randint(10000, 99999)
     message = f"Hello there! You'll be known here as {name}{random_num}. Welcome!"
-    return GreetingResponse(message=message)
+    # Skip building and re-validating a GreetingResponse; the model only documents the shape
+    return FastJSONResponse({"message": message})
 
 if __name__ == "__main__":
-    uvicorn.run("greeting_backend_app:app", host="0.0.0.0", port=5000, reload=True)
+    # Auto-reload is for development only; it runs a single watched process
+    reload = os.getenv("RELOAD", "false").lower() == "true"
+    workers = 1 if reload else int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("greeting_backend_app:app", host="0.0.0.0", port=5000, reload=reload, workers=workers)
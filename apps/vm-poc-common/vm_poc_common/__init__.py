@@ -0,0 +1,5 @@
+"""Modules shared by the VM POC Python services.
+
+Every service image installs this package from ``apps/vm-poc-common`` (see
+the README), so there is a single copy of each module to change.
+"""
@@ -0,0 +1,100 @@
+# vm_poc_common/fastjson.py
+"""Fast JSON encoding shared by the VM POC services.
+
+Uses orjson when it is installed and the stdlib ``json`` otherwise, with the
+same compact UTF-8 output either way. ``loads`` takes raw bytes, so no
+intermediate ``str`` copy is made; ``dumps`` returns bytes ready for a
+response body.
+
+``FastJSONResponse`` is meant as the app's ``default_response_class``.
+Endpoints whose data is already trusted (built by the service itself or
+passed through from another service) can return one directly: FastAPI then
+skips response-model validation and ``jsonable_encoder`` while the
+``response_model`` still documents the schema.
+
+    app = FastAPI(default_response_class=FastJSONResponse)
+
+    @app.get("/sum", response_model=SumResponse)
+    def sum_numbers(a: float, b: float):
+        return FastJSONResponse({"a": a, "b": b, "result": a + b})
+"""
+import json
+from decimal import Decimal
+from typing import Any, Callable, Mapping, Optional, Union
+
+from starlette.background import BackgroundTask
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib fallback is just slower
+    orjson = None
+
+Encoder = Callable[[Any], bytes]
+
+
+def json_default(value: Any) -> Any:
+    # DynamoDB numbers deserialize as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    # NumPy arrays and scalars
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(value: Any, default: Callable[[Any], Any]) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=default).encode("utf-8")
+
+
+def encoder(default: Callable[[Any], Any] = json_default, option: int = 0) -> Encoder:
+    """Build an encoder with its flags and fallback bound once, for hot paths.
+
+    ``option`` takes extra ``orjson.OPT_*`` flags and is ignored without orjson.
+    """
+    if orjson is None:
+        return lambda value: _stdlib_dumps(value, default)
+
+    flags = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | option
+    orjson_dumps = orjson.dumps
+
+    def encode(value: Any) -> bytes:
+        try:
+            return orjson_dumps(value, default=default, option=flags)
+        except TypeError:
+            # e.g. integers beyond 64 bits; let the stdlib decide
+            return _stdlib_dumps(value, default)
+
+    return encode
+
+
+dumps: Encoder = encoder()
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass  # e.g. integers beyond 64 bits; let the stdlib decide
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` rendered with ``dumps`` (or a given precompiled encoder)."""
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        background: Optional[BackgroundTask] = None,
+        encode: Optional[Encoder] = None,
+    ) -> None:
+        # FastAPI reads the default status code from this signature for the OpenAPI schema
+        self._encode = encode or dumps
+        super().__init__(content, status_code, headers, media_type, background)
+
+    def render(self, content: Any) -> bytes:
+        return self._encode(content)
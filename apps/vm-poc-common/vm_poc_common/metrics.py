@@ -0,0 +1,218 @@
+# vm_poc_common/metrics.py
+"""Minimal Prometheus instrumentation shared by the VM POC services.
+
+Updates never take a lock: every thread writes to its own shard (a plain
+dict held in a ``threading.local``) and ``/metrics`` sums the shards when it
+is scraped. On the event loop thread an increment is just a dict update.
+
+    from vm_poc_common.metrics import install_metrics, Histogram
+    install_metrics(app, "fortiflex-backend")
+    UPSTREAM = Histogram("fortiflex_upstream_seconds", "FortiFlex call latency", ["path"])
+    with UPSTREAM.time("/configs/list"):
+        ...
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_shards: List[Dict[Tuple, object]] = []
+
+
+class _Shard(threading.local):
+    def __init__(self):
+        self.values: Dict[Tuple, object] = {}
+        _shards.append(self.values)  # list.append is atomic
+
+
+_local = _Shard()
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _snapshot() -> List[Dict[Tuple, object]]:
+    # dict.copy() runs without releasing the GIL, so each copy is consistent
+    return [shard.copy() for shard in list(_shards)]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labelvalues: Tuple) -> Tuple:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return (self.name, labelvalues)
+
+    def _merged(self, shards) -> Dict[Tuple, object]:
+        raise NotImplementedError
+
+    def render(self, shards) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in sorted(self._merged(shards).items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        values = _local.values
+        values[key] = values.get(key, 0) + amount
+
+    def _merged(self, shards) -> Dict[Tuple, object]:
+        merged: Dict[Tuple, float] = {}
+        for shard in shards:
+            for (name, labelvalues), value in shard.items():
+                if name == self.name:
+                    merged[labelvalues] = merged.get(labelvalues, 0) + value
+        return merged
+
+
+class Gauge(Counter):
+    """Up/down gauge; per-thread deltas are summed at scrape time."""
+
+    kind = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    @contextmanager
+    def track_inprogress(self, *labelvalues: str) -> Iterator[None]:
+        self.inc(*labelvalues)
+        try:
+            yield
+        finally:
+            self.dec(*labelvalues)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        values = _local.values
+        state = values.get(key)
+        if state is None:
+            # [count per bucket..., +Inf count, sum]
+            state = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def _merged(self, shards) -> Dict[Tuple, object]:
+        merged: Dict[Tuple, List[float]] = {}
+        for shard in shards:
+            for (name, labelvalues), state in shard.items():
+                if name != self.name:
+                    continue
+                total = merged.setdefault(labelvalues, [0] * len(state))
+                for i, value in enumerate(list(state)):
+                    total[i] += value
+        return merged
+
+    def render(self, shards) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labelvalues, state in sorted(self._merged(shards).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}")
+            labels = _labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {state[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    shards = _snapshot()
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render(shards))
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ["service", "method", "route", "status"])
+LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency", ["service", "method", "route"])
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests currently being handled", ["service", "method"])
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; labels requests with the matched route template, not the raw path."""
+
+    def __init__(self, app: ASGIApp, service: str) -> None:
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc(self.service, method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_PROGRESS.dec(self.service, method)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            LATENCY.observe(time.perf_counter() - start, self.service, method, path)
+            REQUESTS.inc(self.service, method, path, str(status))
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+def install_metrics(app, service: str) -> None:
+    """Add the request middleware and a ``GET /metrics`` route to a FastAPI app."""
+    app.add_middleware(MetricsMiddleware, service=service)
+    app.add_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
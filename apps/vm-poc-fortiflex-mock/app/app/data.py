@@ -0,0 +1,207 @@
+# app/data.py
+"""Deterministic in-memory FortiFlex dataset for the mock API.
+
+Everything is generated from ``MOCK_SEED`` so two runs with the same settings
+return the same serial numbers, tokens and points, which keeps load-test
+results comparable.
+"""
+import os
+import random
+import string
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+MOCK_SEED = int(os.getenv("MOCK_SEED", "42"))
+MOCK_PROGRAMS = int(os.getenv("MOCK_PROGRAMS", "1"))
+MOCK_CONFIGS = int(os.getenv("MOCK_CONFIGS", "20"))
+MOCK_ENTITLEMENTS = int(os.getenv("MOCK_ENTITLEMENTS", "10000"))
+MOCK_GROUPS = int(os.getenv("MOCK_GROUPS", "50"))
+MOCK_ACCOUNT_ID = int(os.getenv("MOCK_ACCOUNT_ID", "1234567"))
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Product types and their configurable parameters: id -> allowed values
+PRODUCT_TYPES: Dict[int, Dict[str, Any]] = {
+    1: {
+        "name": "FortiGate Virtual Machine - Service Bundle",
+        "serialPrefix": "FGVMMLTM",
+        "parameters": {
+            1: {"name": "CPU", "values": [1, 2, 4, 8, 16, 32, 48, 64, 96]},
+            2: {"name": "Service Package", "values": ["FC", "UTP", "ENT", "ATP"]},
+            10: {"name": "VDOM", "values": [0, 5, 10, 25, 50]},
+        },
+    },
+    2: {
+        "name": "FortiManager Virtual Machine",
+        "serialPrefix": "FMVMMLTM",
+        "parameters": {
+            30: {"name": "Devices", "values": [10, 50, 100, 500, 1000]},
+            31: {"name": "ADOM", "values": [0, 5, 10, 50]},
+        },
+    },
+    3: {
+        "name": "FortiWeb Virtual Machine - Service Bundle",
+        "serialPrefix": "FVBVMLTM",
+        "parameters": {
+            4: {"name": "CPU", "values": [1, 2, 4, 8, 16]},
+            5: {"name": "Service Package", "values": ["FWBSTD", "FWBADV"]},
+        },
+    },
+    7: {
+        "name": "FortiAnalyzer Virtual Machine",
+        "serialPrefix": "FAZVMLTM",
+        "parameters": {
+            21: {"name": "Daily Storage (GB)", "values": [5, 50, 200, 1000]},
+            22: {"name": "ADOM", "values": [0, 5, 10]},
+        },
+    },
+}
+
+# Points per day for one entitlement:
+#   (base + sum(value * per_unit[param])) * product(multiplier[param][value])
+POINTS_RATES: Dict[int, Dict[str, Any]] = {
+    1: {"base": 0.0, "per_unit": {1: 1.0, 10: 0.1},
+        "multiplier": {2: {"FC": 1.0, "UTP": 1.6, "ENT": 2.4, "ATP": 1.3}}},
+    2: {"base": 2.0, "per_unit": {30: 0.03, 31: 0.2}, "multiplier": {}},
+    3: {"base": 0.0, "per_unit": {4: 1.2}, "multiplier": {5: {"FWBSTD": 1.0, "FWBADV": 1.5}}},
+    7: {"base": 1.0, "per_unit": {21: 0.01, 22: 0.2}, "multiplier": {}},
+}
+
+ENTITLEMENT_STATUSES = ["ACTIVE"] * 7 + ["STOPPED", "PENDING", "EXPIRED"]
+
+
+def points_per_day(product_type_id: int, parameters: List[Dict[str, Any]]) -> float:
+    rates = POINTS_RATES.get(product_type_id)
+    if rates is None:
+        raise KeyError(product_type_id)
+    values = {int(p["id"]): p["value"] for p in parameters}
+    points = rates["base"]
+    for param_id, per_unit in rates["per_unit"].items():
+        points += float(values.get(param_id, 0) or 0) * per_unit
+    for param_id, factors in rates["multiplier"].items():
+        points *= factors.get(values.get(param_id), 1.0)
+    return round(points, 4)
+
+
+@dataclass
+class Store:
+    programs: List[Dict[str, Any]] = field(default_factory=list)
+    configs: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    entitlements: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    folders: List[str] = field(default_factory=list)
+    rng: random.Random = field(default_factory=random.Random)
+    next_config_id: int = 1
+    next_serial: int = 1
+
+    def new_token(self) -> str:
+        return "".join(self.rng.choices(string.hexdigits.upper()[:16], k=20))
+
+    def new_serial(self, product_type_id: int) -> str:
+        prefix = PRODUCT_TYPES[product_type_id]["serialPrefix"]
+        serial = f"{prefix}{self.next_serial:08d}"
+        self.next_serial += 1
+        return serial
+
+    def add_config(self, program_serial: str, name: str, product_type_id: int,
+                   parameters: List[Dict[str, Any]], status: str = "ACTIVE") -> Dict[str, Any]:
+        product = PRODUCT_TYPES[product_type_id]
+        config = {
+            "id": self.next_config_id,
+            "programSerialNumber": program_serial,
+            "accountId": MOCK_ACCOUNT_ID,
+            "name": name,
+            "status": status,
+            "productType": {"id": product_type_id, "name": product["name"]},
+            "parameters": [
+                {"id": int(p["id"]), "name": product["parameters"].get(int(p["id"]), {}).get("name", ""),
+                 "value": str(p["value"])}
+                for p in parameters
+            ],
+        }
+        self.configs[config["id"]] = config
+        self.next_config_id += 1
+        return config
+
+    def add_entitlement(self, config: Dict[str, Any], start: datetime, end: datetime,
+                        description: str = "", folder_path: Optional[str] = None,
+                        status: str = "ACTIVE", serial: Optional[str] = None) -> Dict[str, Any]:
+        product_type_id = config["productType"]["id"]
+        entitlement = {
+            "serialNumber": serial or self.new_serial(product_type_id),
+            "accountId": config["accountId"],
+            "configId": config["id"],
+            "description": description,
+            "startDate": start.strftime(DATE_FORMAT),
+            "endDate": end.strftime(DATE_FORMAT),
+            "status": status,
+            "token": self.new_token(),
+            "tokenStatus": "NOTUSED",
+            "folderPath": folder_path or "My Assets",
+        }
+        self.entitlements[entitlement["serialNumber"]] = entitlement
+        return entitlement
+
+    def config_points_per_day(self, config: Dict[str, Any]) -> float:
+        parameters = [{"id": p["id"], "value": _typed(p["value"])} for p in config["parameters"]]
+        return points_per_day(config["productType"]["id"], parameters)
+
+    def groups(self, account_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        counts = {folder: [0, 0] for folder in self.folders}
+        for entitlement in self.entitlements.values():
+            if account_id and entitlement["accountId"] != account_id:
+                continue
+            bucket = counts.setdefault(entitlement["folderPath"], [0, 0])
+            bucket[0 if entitlement["tokenStatus"] == "NOTUSED" else 1] += 1
+        return [
+            {"folderPath": folder, "availableTokens": available, "usedTokens": used}
+            for folder, (available, used) in counts.items()
+        ]
+
+
+def _typed(value: str) -> Any:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def generate(seed: int = MOCK_SEED, programs: int = MOCK_PROGRAMS, configs: int = MOCK_CONFIGS,
+             entitlements: int = MOCK_ENTITLEMENTS, groups: int = MOCK_GROUPS) -> Store:
+    rng = random.Random(seed)
+    store = Store(rng=rng)
+    today = datetime(2025, 1, 1)
+
+    for i in range(max(programs, 1)):
+        store.programs.append({
+            "serialNumber": f"ELAVMS{i + 1:010d}",
+            "accountId": MOCK_ACCOUNT_ID,
+            "startDate": (today - timedelta(days=365)).strftime(DATE_FORMAT),
+            "endDate": (today + timedelta(days=730)).strftime(DATE_FORMAT),
+            "hasSupportCoverage": True,
+        })
+    store.folders = ["My Assets"] + [f"My Assets/group-{i:03d}" for i in range(1, max(groups, 1))]
+
+    product_ids = sorted(PRODUCT_TYPES)
+    for i in range(max(configs, 1)):
+        program = store.programs[i % len(store.programs)]
+        product_type_id = product_ids[i % len(product_ids)]
+        parameters = [
+            {"id": param_id, "value": rng.choice(spec["values"])}
+            for param_id, spec in PRODUCT_TYPES[product_type_id]["parameters"].items()
+        ]
+        store.add_config(program["serialNumber"], f"config-{i + 1:03d}", product_type_id, parameters)
+
+    config_list = list(store.configs.values())
+    for i in range(entitlements):
+        config = config_list[i % len(config_list)]
+        start = today - timedelta(days=rng.randint(0, 300))
+        entitlement = store.add_entitlement(
+            config, start, start + timedelta(days=rng.choice([30, 90, 365])),
+            description=f"vm-{i + 1:05d}",
+            folder_path=rng.choice(store.folders),
+            status=rng.choice(ENTITLEMENT_STATUSES),
+        )
+        if rng.random() < 0.6:
+            entitlement["tokenStatus"] = "USED"
+    return store
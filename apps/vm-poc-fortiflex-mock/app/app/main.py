@@ -0,0 +1,511 @@
+# app/main.py
+"""Local stand-in for the FortiCloud OAuth and FortiFlex v2 APIs.
+
+Serves the endpoints proxied by the fortiflex backend's ``routes/fortiflex.py``
+from a generated in-memory dataset, with injectable latency, errors and 429s.
+Point the backend at it with::
+
+    FORTICLOUD_AUTH_BASE=http://fortiflex-mock:5000/api/v1
+    FORTIFLEX_API_BASE=http://fortiflex-mock:5000/ES/api/fortiflex/v2
+
+It also stands in for the Azure Automation webhook and job status API used by
+``/api/azuremagic``::
+
+    AZURE_WEBHOOK_URL=http://fortiflex-mock:5000/azure/webhooks
+    AZURE_AUTOMATION_JOB_URL=http://fortiflex-mock:5000/azure/jobs/{job_id}
+
+Fault injection and pagination are configured with ``MOCK_*`` environment
+variables and can be changed at runtime through ``GET/POST /mock/config``.
+"""
+import asyncio
+import base64
+import math
+import os
+import random
+import secrets
+import time
+from dataclasses import asdict, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Body, FastAPI, Form, Request
+from fastapi.responses import JSONResponse
+
+from app.data import DATE_FORMAT, PRODUCT_TYPES, generate, points_per_day
+
+AUTH_PREFIX = "/api/v1"
+FLEX_PREFIX = "/ES/api/fortiflex/v2"
+
+
+@dataclass
+class FaultConfig:
+    latency_ms: float = float(os.getenv("MOCK_LATENCY_MS", "0"))
+    # Log-normal spread around latency_ms; 0 gives a fixed delay
+    latency_sigma: float = float(os.getenv("MOCK_LATENCY_SIGMA", "0.5"))
+    latency_max_ms: float = float(os.getenv("MOCK_LATENCY_MAX_MS", "10000"))
+    error_rate: float = float(os.getenv("MOCK_ERROR_RATE", "0"))
+    throttle_rate: float = float(os.getenv("MOCK_THROTTLE_RATE", "0"))
+    # Per-token quota like the real API's ~100 calls/minute; 0 disables it
+    rate_limit_per_minute: int = int(os.getenv("MOCK_RATE_LIMIT_PER_MINUTE", "0"))
+    retry_after: int = int(os.getenv("MOCK_RETRY_AFTER", "1"))
+    # Items per entitlements/groups page; 0 returns everything in one response
+    page_size: int = int(os.getenv("MOCK_PAGE_SIZE", "0"))
+    token_ttl: int = int(os.getenv("MOCK_TOKEN_TTL", "3600"))
+    # Azure Automation runs stay "Running" this long, then complete (or fail at azure_fail_rate)
+    azure_job_seconds: float = float(os.getenv("MOCK_AZURE_JOB_SECONDS", "10"))
+    azure_fail_rate: float = float(os.getenv("MOCK_AZURE_FAIL_RATE", "0"))
+
+    def delay(self) -> float:
+        if self.latency_ms <= 0:
+            return 0.0
+        median = self.latency_ms / 1000
+        value = median * math.exp(random.gauss(0, self.latency_sigma)) if self.latency_sigma > 0 else median
+        return min(value, self.latency_max_ms / 1000)
+
+
+faults = FaultConfig()
+store = generate()
+tokens: Dict[str, float] = {}
+_windows: Dict[str, Tuple[int, int]] = {}
+azure_runs: Dict[str, Dict[str, Any]] = {}
+
+app = FastAPI(title="FortiFlex Mock API")
+auth_router = APIRouter(prefix=AUTH_PREFIX)
+flex_router = APIRouter(prefix=FLEX_PREFIX)
+azure_router = APIRouter(prefix="/azure")
+
+
+def ok(**payload) -> Dict[str, Any]:
+    return {"status": 0, "message": "Request processed successfully", **payload}
+
+
+def fail(message: str, status_code: int = 400, **headers) -> JSONResponse:
+    return JSONResponse({"status": -1, "message": message, "error": message}, status_code=status_code,
+                        headers=headers or None)
+
+
+def _over_quota(key: str) -> bool:
+    limit = faults.rate_limit_per_minute
+    if limit <= 0:
+        return False
+    window = int(time.time() // 60)
+    start, count = _windows.get(key, (window, 0))
+    if start != window:
+        start, count = window, 0
+    _windows[key] = (start, count + 1)
+    return count + 1 > limit
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    path = request.url.path
+    if not (path.startswith(AUTH_PREFIX) or path.startswith(FLEX_PREFIX)):
+        return await call_next(request)
+
+    delay = faults.delay()
+    if delay:
+        await asyncio.sleep(delay)
+    if path.startswith(FLEX_PREFIX):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if tokens.get(token, 0) <= time.time():
+            return fail("Invalid or expired access token", 401)
+        if _over_quota(token) or random.random() < faults.throttle_rate:
+            return fail("Too many requests", 429, **{"Retry-After": str(faults.retry_after)})
+    if random.random() < faults.error_rate:
+        return fail("Internal server error", 500)
+    return await call_next(request)
+
+
+def _page(items: List[Dict[str, Any]], body: Dict[str, Any], key: str) -> Dict[str, Any]:
+    if faults.page_size <= 0:
+        return ok(**{key: items})
+    try:
+        offset = int(base64.urlsafe_b64decode(body.get("pageToken") or "MA==").decode())
+    except ValueError:
+        offset = 0
+    page = items[offset:offset + faults.page_size]
+    payload = ok(**{key: page})
+    if offset + faults.page_size < len(items):
+        payload["nextPageToken"] = base64.urlsafe_b64encode(str(offset + faults.page_size).encode()).decode()
+    return payload
+
+
+def _days(body: Dict[str, Any], default: int = 30) -> int:
+    try:
+        start = datetime.strptime(body["startDate"][:10], "%Y-%m-%d")
+        end = datetime.strptime(body["endDate"][:10], "%Y-%m-%d")
+        return max((end - start).days, 1)
+    except (KeyError, TypeError, ValueError):
+        return int(body.get("days") or default)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def _end_date(body: Dict[str, Any]) -> datetime:
+    try:
+        return datetime.strptime(str(body["endDate"])[:19], DATE_FORMAT)
+    except (KeyError, ValueError):
+        return datetime(2025, 1, 1) + timedelta(days=365)
+
+
+def _config_or_error(config_id: Any):
+    config = store.configs.get(int(config_id)) if str(config_id).isdigit() else None
+    if config is None:
+        return None, fail(f"Config {config_id} not found", 404)
+    return config, None
+
+
+def _entitlement_or_error(serial: Any):
+    entitlement = store.entitlements.get(str(serial))
+    if entitlement is None:
+        return None, fail(f"Entitlement {serial} not found", 404)
+    return entitlement, None
+
+
+# ---------------------------------------------------------------- auth
+@auth_router.post("/oauth/token/")
+async def oauth_token(
+    grant_type: str = Form(...), client_id: str = Form(...),
+    username: str = Form(...), password: str = Form(...),
+):
+    if grant_type != "password" or client_id != "flexvm" or not username or not password:
+        return JSONResponse({"error": "invalid_grant", "status": "failed"}, status_code=401)
+    access_token = secrets.token_urlsafe(24)
+    tokens[access_token] = time.time() + faults.token_ttl
+    return {
+        "access_token": access_token,
+        "expires_in": faults.token_ttl,
+        "token_type": "Bearer",
+        "scope": "read write",
+        "refresh_token": secrets.token_urlsafe(24),
+        "message": "successfully authenticated",
+        "status": "success",
+    }
+
+
+# ---------------------------------------------------------------- programs
+@flex_router.post("/programs/list")
+async def programs_list():
+    return ok(programs=store.programs)
+
+
+@flex_router.post("/programs/points")
+async def programs_points(body: Dict[str, Any] = Body(default_factory=dict)):
+    days = _days(body)
+    serial = body.get("programSerialNumber")
+    programs = [p for p in store.programs if not serial or p["serialNumber"] == serial]
+    results = []
+    for program in programs:
+        used = sum(
+            store.config_points_per_day(store.configs[e["configId"]])
+            for e in store.entitlements.values()
+            if e["status"] == "ACTIVE" and store.configs[e["configId"]]["programSerialNumber"] == program["serialNumber"]
+        ) * days
+        results.append({"serialNumber": program["serialNumber"], "availablePoints": 5_000_000 - round(used, 2),
+                        "usedPoints": round(used, 2)})
+    return ok(programs=results)
+
+
+# ---------------------------------------------------------------- configs
+@flex_router.post("/configs/list")
+async def configs_list(body: Dict[str, Any] = Body(default_factory=dict)):
+    serial = body.get("programSerialNumber")
+    configs = [c for c in store.configs.values() if not serial or c["programSerialNumber"] == serial]
+    return ok(configs=configs)
+
+
+@flex_router.post("/configs/create")
+async def configs_create(body: Dict[str, Any] = Body(...)):
+    product_type_id = body.get("productTypeId")
+    if product_type_id not in PRODUCT_TYPES:
+        return fail(f"Unknown productTypeId {product_type_id}")
+    if not body.get("programSerialNumber") or not body.get("name"):
+        return fail("programSerialNumber and name are required")
+    config = store.add_config(body["programSerialNumber"], body["name"], product_type_id, body.get("parameters") or [])
+    return ok(configs=config)
+
+
+@flex_router.post("/configs/update")
+async def configs_update(body: Dict[str, Any] = Body(...)):
+    config, error = _config_or_error(body.get("id"))
+    if error:
+        return error
+    if body.get("name"):
+        config["name"] = body["name"]
+    if body.get("parameters"):
+        updated = {int(p["id"]): str(p["value"]) for p in body["parameters"]}
+        for param in config["parameters"]:
+            param["value"] = updated.get(param["id"], param["value"])
+    return ok(configs=config)
+
+
+async def _set_config_status(body: Dict[str, Any], status: str):
+    config, error = _config_or_error(body.get("id"))
+    if error:
+        return error
+    config["status"] = status
+    return ok(configs=config)
+
+
+@flex_router.post("/configs/disable")
+async def configs_disable(body: Dict[str, Any] = Body(...)):
+    return await _set_config_status(body, "DISABLED")
+
+
+@flex_router.post("/configs/enable")
+async def configs_enable(body: Dict[str, Any] = Body(...)):
+    return await _set_config_status(body, "ACTIVE")
+
+
+# ---------------------------------------------------------------- entitlements
+@flex_router.post("/entitlements/list")
+async def entitlements_list(body: Dict[str, Any] = Body(default_factory=dict)):
+    config_id = body.get("configId")
+    serial = body.get("programSerialNumber")
+    account_id = body.get("accountId")
+    if config_id is None and not serial:
+        return fail("configId or programSerialNumber is required")
+    program_configs = {c["id"] for c in store.configs.values() if c["programSerialNumber"] == serial}
+    items = [
+        e for e in store.entitlements.values()
+        if (config_id is None or e["configId"] == int(config_id))
+        and (not serial or e["configId"] in program_configs)
+        and (not account_id or str(e["accountId"]) == str(account_id))
+    ]
+    return _page(items, body, "entitlements")
+
+
+@flex_router.post("/entitlements/vm/create")
+async def entitlements_vm_create(body: Dict[str, Any] = Body(...)):
+    config, error = _config_or_error(body.get("configId"))
+    if error:
+        return error
+    count = int(body.get("count") or 1)
+    if not 1 <= count <= 1000:
+        return fail("count must be between 1 and 1000")
+    start = _now()
+    created = [
+        store.add_entitlement(config, start, _end_date(body), body.get("description") or "", body.get("folderPath"))
+        for _ in range(count)
+    ]
+    return ok(entitlements=created)
+
+
+@flex_router.post("/entitlements/hardware/create")
+async def entitlements_hardware_create(body: Dict[str, Any] = Body(...)):
+    config, error = _config_or_error(body.get("configId"))
+    if error:
+        return error
+    serials = body.get("serialNumbers") or []
+    if not serials:
+        return fail("serialNumbers is required")
+    start = _now()
+    created = [store.add_entitlement(config, start, _end_date(body), serial=str(s)) for s in serials]
+    return ok(entitlements=created)
+
+
+@flex_router.post("/entitlements/cloud/create")
+async def entitlements_cloud_create(body: Dict[str, Any] = Body(...)):
+    config, error = _config_or_error(body.get("configId"))
+    if error:
+        return error
+    start = _now()
+    return ok(entitlements=[store.add_entitlement(config, start, _end_date(body))])
+
+
+@flex_router.post("/entitlements/update")
+async def entitlements_update(body: Dict[str, Any] = Body(...)):
+    entitlement, error = _entitlement_or_error(body.get("serialNumber"))
+    if error:
+        return error
+    if body.get("configId") is not None:
+        config, error = _config_or_error(body["configId"])
+        if error:
+            return error
+        entitlement["configId"] = config["id"]
+    if body.get("description") is not None:
+        entitlement["description"] = body["description"]
+    if body.get("endDate"):
+        entitlement["endDate"] = _end_date(body).strftime(DATE_FORMAT)
+    return ok(entitlements=[entitlement])
+
+
+async def _set_entitlement_status(body: Dict[str, Any], status: str):
+    entitlement, error = _entitlement_or_error(body.get("serialNumber"))
+    if error:
+        return error
+    entitlement["status"] = status
+    return ok(entitlements=[entitlement])
+
+
+@flex_router.post("/entitlements/stop")
+async def entitlements_stop(body: Dict[str, Any] = Body(...)):
+    return await _set_entitlement_status(body, "STOPPED")
+
+
+@flex_router.post("/entitlements/reactivate")
+async def entitlements_reactivate(body: Dict[str, Any] = Body(...)):
+    return await _set_entitlement_status(body, "ACTIVE")
+
+
+@flex_router.post("/entitlements/vm/token")
+async def entitlements_vm_token(body: Dict[str, Any] = Body(...)):
+    entitlement, error = _entitlement_or_error(body.get("serialNumber"))
+    if error:
+        return error
+    entitlement["token"] = store.new_token()
+    entitlement["tokenStatus"] = "NOTUSED"
+    return ok(entitlements=[entitlement])
+
+
+@flex_router.post("/entitlements/points")
+async def entitlements_points(body: Dict[str, Any] = Body(default_factory=dict)):
+    days = _days(body)
+    config_id = body.get("configId")
+    items = [
+        {"serialNumber": e["serialNumber"],
+         "points": round(store.config_points_per_day(store.configs[e["configId"]]) * days, 2)}
+        for e in store.entitlements.values()
+        if e["status"] == "ACTIVE" and (config_id is None or e["configId"] == int(config_id))
+    ]
+    return ok(entitlements=items)
+
+
+@flex_router.post("/entitlements/transfer")
+async def entitlements_transfer(body: Dict[str, Any] = Body(...)):
+    account_id = body.get("accountId")
+    serials = body.get("serialNumbers") or []
+    if not account_id or not serials:
+        return fail("accountId and serialNumbers are required")
+    moved = []
+    for serial in serials:
+        entitlement, error = _entitlement_or_error(serial)
+        if error:
+            return error
+        entitlement["accountId"] = int(account_id)
+        moved.append(entitlement)
+    return ok(entitlements=moved)
+
+
+# ---------------------------------------------------------------- groups
+@flex_router.post("/groups/list")
+async def groups_list(body: Dict[str, Any] = Body(default_factory=dict)):
+    account_id = body.get("accountId")
+    return _page(store.groups(int(account_id) if account_id else None), body, "groups")
+
+
+@flex_router.post("/groups/nexttoken")
+async def groups_nexttoken(body: Dict[str, Any] = Body(default_factory=dict)):
+    folder = body.get("folderPath")
+    config_id = body.get("configId")
+    for entitlement in store.entitlements.values():
+        if entitlement["tokenStatus"] != "NOTUSED" or entitlement["status"] != "ACTIVE":
+            continue
+        if folder and entitlement["folderPath"] != folder:
+            continue
+        if config_id is not None and entitlement["configId"] != int(config_id):
+            continue
+        entitlement["tokenStatus"] = "USED"
+        return ok(entitlements=[entitlement])
+    return fail("No available token in group", 404)
+
+
+# ---------------------------------------------------------------- tools
+@flex_router.post("/tools/calc")
+async def tools_calc(body: Dict[str, Any] = Body(...)):
+    try:
+        per_day = points_per_day(int(body["productTypeId"]), body.get("parameters") or [])
+    except (KeyError, TypeError, ValueError):
+        return fail("productTypeId with known parameters is required")
+    count = int(body.get("count") or 1)
+    return ok(points=round(per_day * count * _days(body, 1), 4), pointsPerDay=per_day)
+
+
+@flex_router.post("/tools/licenses")
+async def tools_licenses(body: Dict[str, Any] = Body(default_factory=dict)):
+    serial = body.get("programSerialNumber")
+    summary: Dict[int, Dict[str, Any]] = {}
+    for entitlement in store.entitlements.values():
+        config = store.configs[entitlement["configId"]]
+        if serial and config["programSerialNumber"] != serial:
+            continue
+        product = config["productType"]
+        row = summary.setdefault(product["id"], {"productType": product, "total": 0, "active": 0})
+        row["total"] += 1
+        row["active"] += entitlement["status"] == "ACTIVE"
+    return ok(licenses=list(summary.values()))
+
+
+@flex_router.post("/tools/check-token")
+async def tools_check_token(body: Dict[str, Any] = Body(...)):
+    token = body.get("token")
+    for entitlement in store.entitlements.values():
+        if entitlement["token"] == token:
+            return ok(serialNumber=entitlement["serialNumber"], tokenStatus=entitlement["tokenStatus"],
+                      entitlementStatus=entitlement["status"])
+    return fail("Token not found", 404)
+
+
+# ---------------------------------------------------------------- azure automation
+@azure_router.post("/webhooks", status_code=202)
+async def azure_webhook(body: Dict[str, Any] = Body(default_factory=dict)):
+    job_id = secrets.token_hex(16)
+    azure_runs[job_id] = {
+        "started": time.time(),
+        "fails": random.random() < faults.azure_fail_rate,
+        "parameters": body,
+    }
+    return {"JobIds": [job_id]}
+
+
+@azure_router.get("/jobs/{job_id}")
+async def azure_job(job_id: str):
+    run = azure_runs.get(job_id)
+    if run is None:
+        return JSONResponse({"error": {"code": "NotFound", "message": f"Job {job_id} not found"}}, status_code=404)
+    elapsed = time.time() - run["started"]
+    if elapsed < min(1.0, faults.azure_job_seconds):
+        state = "New"
+    elif elapsed < faults.azure_job_seconds:
+        state = "Running"
+    else:
+        state = "Failed" if run["fails"] else "Completed"
+    return {"name": job_id, "properties": {"jobId": job_id, "status": state, "runbook": {"name": "azuremagic"}}}
+
+
+# ---------------------------------------------------------------- mock control
+@app.get("/healthz")
+def health_check() -> dict:
+    return {"status": "ok", "entitlements": len(store.entitlements), "configs": len(store.configs)}
+
+
+@app.get("/mock/config")
+def get_mock_config() -> dict:
+    return asdict(faults)
+
+
+@app.post("/mock/config")
+def set_mock_config(changes: Dict[str, Any] = Body(...)) -> dict:
+    """Update fault injection settings, e.g. ``{"latency_ms": 200, "error_rate": 0.05}``."""
+    known = {f.name for f in fields(FaultConfig)}
+    for name, value in changes.items():
+        if name in known:
+            setattr(faults, name, type(getattr(faults, name))(value))
+    return asdict(faults)
+
+
+@app.post("/mock/reset")
+def reset_mock_data(sizes: Optional[Dict[str, int]] = Body(default=None)) -> dict:
+    """Regenerate the dataset, optionally with new sizes (programs/configs/entitlements/groups/seed)."""
+    global store
+    store = generate(**(sizes or {}))
+    _windows.clear()
+    azure_runs.clear()
+    return health_check()
+
+
+app.include_router(auth_router)
+app.include_router(flex_router)
+app.include_router(azure_router)
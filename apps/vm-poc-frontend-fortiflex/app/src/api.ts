@@ -7,4 +7,26 @@ export async function deploy(payload: any) {
   });
   if (!r.ok) throw new Error(await r.text());
   return r.json();
-}
\ No newline at end of file
+}
+export async function getDeployJob(jobId: string) {
+  const r = await fetch(`/api/deploy/${jobId}`);
+  if (!r.ok) throw new Error(await r.text());
+  return r.json();
+}
+
+export async function cancelDeploy(jobId: string) {
+  const r = await fetch(`/api/deploy/${jobId}/cancel`, {method: "POST"});
+  if (!r.ok) throw new Error(await r.text());
+  return r.json();
+}
+
+// Streams Terraform output for a job returned by deploy(); returns a function that stops following.
+export function followDeploy(job: any, onLine: (line: string) => void, onDone?: (job: any) => void) {
+  const source = new EventSource(job.events_url);
+  source.addEventListener("log", (e) => onLine(JSON.parse((e as MessageEvent).data)));
+  source.addEventListener("status", (e) => {
+    source.close();
+    onDone?.(JSON.parse((e as MessageEvent).data));
+  });
+  return () => source.close();
+}
@@ -1,8 +1,44 @@
+const PRODUCTS_CACHE_KEY = "products-cache-v1";
+
+// Last catalog we received plus its validators, so revisits can revalidate
+// with a 304 instead of downloading the whole payload again.
+function readCachedProducts() {
+  try {
+    const raw = window.localStorage.getItem(PRODUCTS_CACHE_KEY);
+    return raw ? JSON.parse(raw) : null;
+  } catch {
+    return null;
+  }
+}
+
+function writeCachedProducts(entry) {
+  try {
+    window.localStorage.setItem(PRODUCTS_CACHE_KEY, JSON.stringify(entry));
+  } catch {
+    // Storage full or disabled; the next visit simply refetches.
+  }
+}
+
 export async function fetchProducts() {
   console.log("Fetching products from API...");
+  const cached = readCachedProducts();
+  const headers = {};
+  if (cached?.etag) headers["If-None-Match"] = cached.etag;
+  if (cached?.lastModified) headers["If-Modified-Since"] = cached.lastModified;
+
   // TO DO Adjust the URL to match your backend API endpoint
-  const response = await fetch(`/api/products`);
+  const response = await fetch(`/api/products`, { headers });
+  if (response.status === 304 && cached) {
+    console.log("Products not modified; using cached catalog");
+    return cached.products;
+  }
   console.log("Fetched static products:", response);
   if (!response.ok) throw new Error("Failed to fetch products");
-  return response.json();
+  const products = await response.json();
+  writeCachedProducts({
+    etag: response.headers.get("ETag"),
+    lastModified: response.headers.get("Last-Modified"),
+    products,
+  });
+  return products;
 }
@@ -117,9 +117,24 @@ export default function FortiFlexEntitlementCard({ entitlement }) {
                       body: JSON.stringify({ flexentitlementtoken: entitlement.token }),
                     });
                     if (!res.ok) throw new Error("Failed to launch Azure VM");
-                    toast.success("Azure VM launched successfully!");
+                    const job = await res.json();
+                    toast.info(job.deduplicated ? "Azure VM launch already in progress." : "Azure VM launch submitted.");
                     setAzureModalOpen(false);
-                    setTimeout(() => window.location.reload(), 1500);
+                    const events = new EventSource(job.events_url);
+                    events.addEventListener("status", (e) => {
+                      const update = JSON.parse(e.data);
+                      if (update.status === "completed" || update.status === "submitted") {
+                        events.close();
+                        toast.success("Azure VM launched successfully!");
+                        setTimeout(() => window.location.reload(), 1500);
+                      } else if (update.status === "failed") {
+                        events.close();
+                        toast.error(`Azure VM launch failed: ${update.error}`);
+                      } else if (update.status === "unknown") {
+                        events.close();
+                        toast.warning(`Azure VM launch may or may not have started: ${update.error}`);
+                      }
+                    });
                   } catch (error) {
                     console.error("Azure VM launch failed:", error);
                     toast.error("Failed to launch Azure VM.");
@@ -1,25 +1,158 @@
+import asyncio
 import os
-import requests
-from typing import Optional
-from fastapi import FastAPI, Request, Form, Query
-from fastapi.responses import HTMLResponse
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request, Form, Query
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
 import uvicorn
 
-app = FastAPI(
-    title="Microservice Documentation Hub",
-    description="Frontend that aggregates API documentation for multiple microservices.",
-    version="1.0.0",
-)
+from vm_poc_common import fastjson
+from vm_poc_common.fastjson import FastJSONResponse
+from vm_poc_common.metrics import Histogram, install_metrics
 
 # -------------------------------
 # Backend URLs
 # -------------------------------
 GREETING_BACKEND_URL = os.environ.get("GREETING_BACKEND_URL", "http://greeting-backend:5000/greet")
 MATH_BACKEND_URL = os.environ.get("MATH_BACKEND_URL", "http://math-backend:5000/sum")
+MATH_BATCH_BACKEND_URL = os.environ.get("MATH_BATCH_BACKEND_URL", MATH_BACKEND_URL.rstrip("/") + "/batch")
 ANALYTICS_BACKEND_URL = os.environ.get("ANALYTICS_BACKEND_URL", "http://analytics-backend:5000/events")
 
+# -------------------------------
+# Shared async HTTP client
+# -------------------------------
+HTTP_MAX_CONNECTIONS = int(os.environ.get("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+BACKEND_SECONDS = Histogram("gateway_backend_request_seconds", "Latency of calls to downstream services", ["backend", "status"])
+
+
+def http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+    return _client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_client()
+    try:
+        yield
+    finally:
+        if _client is not None:
+            await _client.aclose()
+
+
+class Backend:
+    """One downstream service with its own timeout and in-flight request limit."""
+
+    def __init__(self, name: str, url: str, timeout: float, max_concurrency: int):
+        self.name = name
+        self.url = url
+        self.timeout = httpx.Timeout(timeout, connect=min(timeout, 2.0))
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        async with self.semaphore:
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = await http_client().get(self.url, params=params, timeout=self.timeout)
+                status = str(response.status_code)
+                response.raise_for_status()
+                return fastjson.loads(response.content)
+            except httpx.TimeoutException:
+                status = "timeout"
+                raise HTTPException(status_code=504, detail=f"{self.name} backend timed out")
+            except httpx.HTTPStatusError as exc:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"{self.name} backend returned {exc.response.status_code}",
+                )
+            except httpx.HTTPError as exc:
+                raise HTTPException(status_code=502, detail=f"{self.name} backend unreachable: {exc}")
+            except ValueError:
+                # An HTML error page or empty body from a proxy in between
+                status = "invalid"
+                raise HTTPException(status_code=502, detail=f"{self.name} backend returned a non-JSON response")
+            finally:
+                BACKEND_SECONDS.observe(time.perf_counter() - started, self.name, status)
+
+    async def proxy_post(self, url: str, request: Request, timeout: httpx.Timeout) -> StreamingResponse:
+        """Forward the request body to ``url`` and stream the reply back without parsing either side."""
+        headers = {"content-type": request.headers.get("content-type", "application/json")}
+        client = http_client()
+        async with self.semaphore:
+            started = time.perf_counter()
+            status = "error"
+            try:
+                upstream = await client.send(
+                    client.build_request("POST", url, content=request.stream(), headers=headers, timeout=timeout),
+                    stream=True,
+                )
+                status = str(upstream.status_code)
+            except httpx.TimeoutException:
+                status = "timeout"
+                raise HTTPException(status_code=504, detail=f"{self.name} backend timed out")
+            except httpx.HTTPError as exc:
+                raise HTTPException(status_code=502, detail=f"{self.name} backend unreachable: {exc}")
+            finally:
+                BACKEND_SECONDS.observe(time.perf_counter() - started, self.name, status)
+        if upstream.status_code >= 500:
+            await upstream.aclose()
+            raise HTTPException(status_code=502, detail=f"{self.name} backend returned {upstream.status_code}")
+        # Client errors (bad shape, too large) pass through unchanged
+        response_headers = {}
+        if "content-encoding" in upstream.headers:
+            response_headers["content-encoding"] = upstream.headers["content-encoding"]
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            media_type=upstream.headers.get("content-type"),
+            headers=response_headers,
+            background=BackgroundTask(upstream.aclose),
+        )
+
+
+def _backend(name: str, url: str, default_timeout: str) -> Backend:
+    prefix = name.upper()
+    return Backend(
+        name,
+        url,
+        timeout=float(os.environ.get(f"{prefix}_TIMEOUT", default_timeout)),
+        max_concurrency=int(os.environ.get(f"{prefix}_MAX_CONCURRENCY", "64")),
+    )
+
+
+greeting_backend = _backend("greeting", GREETING_BACKEND_URL, "2.0")
+math_backend = _backend("math", MATH_BACKEND_URL, "2.0")
+# Large batches take longer than a single /sum call
+MATH_BATCH_TIMEOUT = httpx.Timeout(float(os.environ.get("MATH_BATCH_TIMEOUT", "30")), connect=2.0)
+analytics_backend = _backend("analytics", ANALYTICS_BACKEND_URL, "3.0")
+
+app = FastAPI(
+    title="Microservice Documentation Hub",
+    description="Frontend that aggregates API documentation for multiple microservices.",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
+install_metrics(app, "frontend-gateway")
+
 # -------------------------------
 # Template setup for frontend UI
 # -------------------------------
@@ -34,8 +167,8 @@ async def get_index(request: Request):
 
 @app.post("/", response_class=HTMLResponse)
 async def post_index(request: Request, name: str = Form(...)):
-    response = requests.get(GREETING_BACKEND_URL, params={"name": name})
-    message = response.json().get("message")
+    data = await greeting_backend.get({"name": name})
+    message = data.get("message")
     return templates.TemplateResponse("index.html", {"request": request, "message": message})
 
 # -------------------------------
@@ -63,8 +196,8 @@ class SumResponse(BaseModel):
 async def greet_proxy(
     name: str = Query(..., title="Name", description="Name of the user to greet", example="Alice")
 ):
-    response = requests.get(GREETING_BACKEND_URL, params={"name": name})
-    return response.json()
+    # The backend already validated its reply; the model here only documents it
+    return FastJSONResponse(await greeting_backend.get({"name": name}))
 
 # -------------------------------
 # Microservice: Math Backend
@@ -81,9 +214,21 @@ async def sum_proxy(
     a: float = Query(..., title="a", description="First number", example=1.5),
     b: float = Query(..., title="b", description="Second number", example=2.75),
 ):
-    response = requests.get(MATH_BACKEND_URL, params={"a": a, "b": b})
-    response.raise_for_status()
-    return response.json()
+    return FastJSONResponse(await math_backend.get({"a": a, "b": b}))
+
+@app.post(
+    "/sum/batch",
+    tags=["Math Backend"],
+    summary="Add many pairs of numbers",
+    description=(
+        "Proxies the request to the Math Backend `/sum/batch` endpoint, streaming the body in both "
+        "directions. Send `{\"a\": [...], \"b\": [...]}` as JSON, or interleaved little-endian float64 "
+        "pairs with `Content-Type: application/octet-stream`. One call replaces thousands of `/sum` calls."
+    ),
+    response_description="`{\"count\": n, \"result\": [...]}` for JSON, raw float64 results for binary input.",
+)
+async def sum_batch_proxy(request: Request):
+    return await math_backend.proxy_post(MATH_BATCH_BACKEND_URL, request, MATH_BATCH_TIMEOUT)
 
 # -------------------------------
 # Example: Future Analytics Service
@@ -102,9 +247,50 @@ class EventResponse(BaseModel):
 )
 async def list_events():
     # Example proxy; could be a real backend call
-    # response = requests.get(ANALYTICS_BACKEND_URL)
-    # return response.json()
+    # return await analytics_backend.get()
     return {"status": "success", "details": "Example event log"}
 
+# -------------------------------
+# Fan-out: all backends at once
+# -------------------------------
+class FanoutResponse(BaseModel):
+    results: Dict[str, Any]
+    errors: Dict[str, str]
+
+@app.get(
+    "/fanout",
+    tags=["Gateway"],
+    summary="Call every backend concurrently",
+    description=(
+        "Calls the Greeting, Math and Analytics backends concurrently and merges their responses. "
+        "A failing backend is reported under `errors` without failing the whole request."
+    ),
+    response_model=FanoutResponse,
+)
+async def fanout(
+    name: str = Query("Stranger", description="Name passed to the Greeting Backend"),
+    a: float = Query(1.5, description="First number for the Math Backend"),
+    b: float = Query(2.75, description="Second number for the Math Backend"),
+):
+    calls = {
+        "greeting": greeting_backend.get({"name": name}),
+        "math": math_backend.get({"a": a, "b": b}),
+        "analytics": analytics_backend.get(),
+    }
+    outcomes = await asyncio.gather(*calls.values(), return_exceptions=True)
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for service, outcome in zip(calls, outcomes):
+        if isinstance(outcome, HTTPException):
+            errors[service] = outcome.detail
+        elif isinstance(outcome, Exception):
+            errors[service] = str(outcome)
+        else:
+            results[service] = outcome
+    return FastJSONResponse({"results": results, "errors": errors})
+
 if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=5000, reload=True)
+    # Auto-reload is for development only; it runs a single watched process
+    reload = os.getenv("RELOAD", "false").lower() == "true"
+    workers = 1 if reload else int(os.getenv("WEB_CONCURRENCY", "1"))
+    uvicorn.run("app:app", host="0.0.0.0", port=5000, reload=reload, workers=workers)
@@ -58,6 +58,32 @@ resource "aws_dynamodb_table" "products" {
     type = "S"
   }
 
+  attribute {
+    name = "cloud_lower"
+    type = "S"
+  }
+
+  attribute {
+    name = "sku_lower"
+    type = "S"
+  }
+
+  # Cloud/SKU lookups use Query on these instead of a full Scan. The keys are
+  # lower-cased copies of cloud/sku written by dynamodb/seed_products.py, so
+  # lookups are case-insensitive like the API
+  global_secondary_index {
+    name            = "cloud-sku-lower-index"
+    hash_key        = "cloud_lower"
+    range_key       = "sku_lower"
+    projection_type = "ALL"
+  }
+
+  global_secondary_index {
+    name            = "sku-lower-index"
+    hash_key        = "sku_lower"
+    projection_type = "ALL"
+  }
+
   tags = {
     Service     = "vm-poc-products"
     Environment = "poc"
@@ -91,7 +117,10 @@ data "aws_iam_policy_document" "dynamodb_read" {
       "dynamodb:Query",
       "dynamodb:Scan"
     ]
-    resources = [aws_dynamodb_table.products.arn]
+    resources = [
+      aws_dynamodb_table.products.arn,
+      "${aws_dynamodb_table.products.arn}/index/*"
+    ]
   }
 }
 
@@ -0,0 +1 @@
+"""Load-test and micro-benchmark helpers for the vending-machine services."""
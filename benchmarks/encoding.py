@@ -0,0 +1,132 @@
+"""Response encoding cost before and after the shared ``fastjson`` layer.
+
+For each hot endpoint the "before" case runs what FastAPI did for it
+previously: response-model validation (or ``jsonable_encoder`` when there is
+no model) and ``JSONResponse`` rendering with the stdlib encoder. The "after"
+case runs what the endpoint does now: a ``FastJSONResponse`` returned
+directly, rendered with orjson. Reported per operation: time, and the peak
+memory allocated while encoding (from ``tracemalloc``).
+
+    python -m benchmarks.encoding
+    python -m benchmarks.encoding --filter products --json
+"""
+import argparse
+import json
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.micro import FORTIFLEX_APP_DIR, measure, synthetic_catalog, synthetic_entitlements
+
+
+def _complete(coro) -> Any:
+    """Run a coroutine that never suspends without the cost of an event loop."""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended")
+
+
+def peak_bytes(fn: Callable[[], Any]) -> int:
+    fn()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+def cases() -> Dict[str, Tuple[Callable[[], Any], Callable[[], Any]]]:
+    """Endpoint -> (before, after) encoders; both return the response body bytes."""
+    sys.path.insert(0, str(FORTIFLEX_APP_DIR))
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_model_field
+    from pydantic import BaseModel
+
+    from vm_poc_common import fastjson
+    from vm_poc_common.fastjson import FastJSONResponse
+
+    # Same shapes as the response models in the math and greeting services
+    class SumResponse(BaseModel):
+        a: float
+        b: float
+        result: float
+
+    class GreetingResponse(BaseModel):
+        message: str
+
+    def fastapi_before(model, content: Any) -> Callable[[], bytes]:
+        field = create_model_field(name="Response", type_=model, mode="serialization") if model else None
+        return lambda: JSONResponse(_complete(serialize_response(field=field, response_content=content))).body
+
+    catalog = synthetic_catalog(2_000)
+    total = {"a": 1.5, "b": 2.75, "result": 4.25}
+    message = "Hello there! You'll be known here as Alice12345. Welcome!"
+    entitlements = json.dumps(synthetic_entitlements(10_000)).encode("utf-8")
+
+    return {
+        # /api/products infers List[Dict[str, Any]] from its return annotation
+        "/api/products filtered 2k": (
+            fastapi_before(List[Dict[str, Any]], catalog),
+            lambda: FastJSONResponse(catalog).body,
+        ),
+        "/sum": (fastapi_before(SumResponse, total), lambda: FastJSONResponse(dict(total)).body),
+        "/greet": (
+            fastapi_before(GreetingResponse, GreetingResponse(message=message)),
+            lambda: FastJSONResponse({"message": message}).body,
+        ),
+        # Parsed upstream body re-encoded (configs/list and the write routes)
+        "entitlements list 10k": (
+            lambda: JSONResponse(jsonable_encoder(json.loads(entitlements))).body,
+            lambda: FastJSONResponse(fastjson.loads(entitlements)).body,
+        ),
+    }
+
+
+def run(filter_text: str = "", min_time: float = 0.5) -> List[Dict[str, Any]]:
+    rows = []
+    for endpoint, (before, after) in cases().items():
+        if filter_text and filter_text not in endpoint:
+            continue
+        if json.loads(before()) != json.loads(after()):
+            raise RuntimeError(f"{endpoint}: before and after bodies differ")
+        timings = {}
+        for variant, fn in (("before", before), ("after", after)):
+            row = measure(f"encode {endpoint} [{variant}]", fn, min_time)
+            row["peak_bytes"] = peak_bytes(fn)
+            timings[variant] = row["ns_per_op"]
+            rows.append(row)
+            print(f"{row['name']}: {row['ns_per_op']} ns/op, {row['peak_bytes']} B peak", file=sys.stderr)
+        rows[-1]["speedup"] = round(timings["before"] / timings["after"], 2) if timings["after"] else None
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    width = max((len(r["name"]) for r in rows), default=4)
+    lines = [f"{'name'.ljust(width)}  {'ns/op':>14}  {'peak KiB':>10}  {'speedup':>8}"]
+    for row in rows:
+        speedup = f"{row['speedup']:.2f}x" if row.get("speedup") else ""
+        lines.append(f"{row['name'].ljust(width)}  {row['ns_per_op']:>14,.1f}  "
+                     f"{row['peak_bytes'] / 1024:>10,.1f}  {speedup:>8}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="Only run endpoints whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend per case")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    rows = run(args.filter, args.min_time)
+    print(json.dumps(rows, indent=2) if args.json else format_rows(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""Stand-in ``terraform`` binary for exercising the deploy job engine.
+
+Understands ``-chdir=DIR`` and the ``init``/``plan``/``apply``/``output``
+subcommands the engine runs, prints Terraform-like progress lines with a
+delay, and keeps a tiny state file in the run directory. Point the backend at
+it with ``TF_BINARY=benchmarks/fake_terraform.py``.
+
+Environment:
+    FAKE_TF_DELAY       seconds per phase (default 0.2)
+    FAKE_TF_FAIL        phase that should exit 1 (init, plan or apply)
+    FAKE_TF_TRACE       file that gets "start/end <dir> <phase> <time>" lines
+    TF_PLUGIN_CACHE_DIR provider "downloads" land here; init is 5x slower when
+                        the cache is empty
+"""
+import json
+import os
+import signal
+import sys
+import time
+from pathlib import Path
+
+
+def trace(event: str, run_dir: Path, phase: str) -> None:
+    path = os.getenv("FAKE_TF_TRACE")
+    if path:
+        with open(path, "a", encoding="utf-8") as handle:
+            handle.write(f"{event} {run_dir} {phase} {time.time():.6f}\n")
+
+
+def main(argv) -> int:
+    signal.signal(signal.SIGINT, lambda *_: sys.exit(130))
+    run_dir = Path.cwd()
+    args = list(argv)
+    if args and args[0].startswith("-chdir="):
+        run_dir = Path(args.pop(0).split("=", 1)[1])
+    if not args:
+        print("Usage: terraform [-chdir=DIR] <command>", file=sys.stderr)
+        return 1
+    phase, options = args[0], args[1:]
+    delay = float(os.getenv("FAKE_TF_DELAY", "0.2"))
+    state_file = run_dir / "terraform.tfstate"
+
+    if phase == "output":
+        state = json.loads(state_file.read_text()) if state_file.exists() else {}
+        print(json.dumps({name: {"value": value, "type": "string", "sensitive": False}
+                          for name, value in state.get("outputs", {}).items()}))
+        return 0
+
+    trace("start", run_dir, phase)
+    try:
+        if phase == "init":
+            cache = Path(os.getenv("TF_PLUGIN_CACHE_DIR", run_dir / ".terraform" / "providers"))
+            provider = cache / "registry.terraform.io" / "hashicorp" / "aws" / "5.0.0"
+            print("Initializing the backend...")
+            if provider.exists():
+                print("- Using hashicorp/aws v5.0.0 from the shared cache directory")
+                time.sleep(delay)
+            else:
+                print("- Installing hashicorp/aws v5.0.0...")
+                time.sleep(delay * 5)
+                provider.mkdir(parents=True, exist_ok=True)
+            (run_dir / ".terraform").mkdir(exist_ok=True)
+            print("Terraform has been successfully initialized!")
+        elif phase == "plan":
+            if not (run_dir / ".terraform").exists():
+                print("Error: Backend initialization required, please run \"terraform init\"")
+                return 1
+            var_file = next((o.split("=", 1)[1] for o in options if o.startswith("-var-file=")), None)
+            tfvars = json.loads(Path(var_file).read_text()) if var_file else {}
+            out = next((o.split("=", 1)[1] for o in options if o.startswith("-out=")), None)
+            time.sleep(delay)
+            destroy = "-destroy" in options
+            print(f"Plan: {0 if destroy else 1} to add, 0 to change, {1 if destroy else 0} to destroy.")
+            if out:
+                (run_dir / out).write_text(json.dumps({"tfvars": tfvars, "destroy": destroy}))
+        elif phase == "apply":
+            plan_file = next((o for o in options if not o.startswith("-")), None)
+            plan = json.loads((run_dir / plan_file).read_text()) if plan_file else {"tfvars": {}, "destroy": False}
+            for step in range(3):
+                print(f"aws_instance.vm: Still creating... [{step * 10}s elapsed]")
+                time.sleep(delay / 3)
+            outputs = {} if plan["destroy"] else {k: str(v) for k, v in plan["tfvars"].items()}
+            state_file.write_text(json.dumps({"outputs": outputs}))
+            print("Apply complete! Resources: 1 added, 0 changed, 0 destroyed.")
+        else:
+            print(f"fake terraform: unsupported command {phase}", file=sys.stderr)
+            return 1
+        if os.getenv("FAKE_TF_FAIL") == phase:
+            print(f"Error: simulated {phase} failure")
+            return 1
+        return 0
+    finally:
+        trace("end", run_dir, phase)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
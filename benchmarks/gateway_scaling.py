@@ -0,0 +1,68 @@
+"""Show gateway throughput scaling with client concurrency.
+
+With ``--spawn`` a latency stub plays the greeting/math/analytics backends
+and the gateway in ``apps/vm-poc-frontend/app`` is started against it. A
+non-blocking gateway's req/s grows roughly linearly with concurrency
+(bounded by ``concurrency / backend latency``); a gateway that blocks its
+event loop stays flat at ``1 / latency``.
+
+    python -m benchmarks.gateway_scaling --spawn --backend-latency 0.05
+    python -m benchmarks.gateway_scaling --gateway-url http://localhost:5000
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+
+from benchmarks.loadgen import format_table, run_load
+from benchmarks.services import APPS_DIR, free_port, spawn, uvicorn_args
+
+
+async def sweep(gateway_url: str, paths, levels, duration: float):
+    rows = []
+    for path in paths:
+        for concurrency in levels:
+            result = await run_load(path, f"{gateway_url}{path}", concurrency, duration)
+            rows.append(result.summary())
+            print(format_table(rows[-1:]).splitlines()[-1], file=sys.stderr)
+    return rows
+
+
+@contextlib.contextmanager
+def local_stack(latency: float):
+    stub_port, gateway_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    stub = [sys.executable, "-m", "benchmarks.latency_stub", "--port", str(stub_port), "--latency", str(latency)]
+    gateway_dir = APPS_DIR / "vm-poc-frontend" / "app"
+    env = {
+        "GREETING_BACKEND_URL": f"{stub_url}/greet",
+        "MATH_BACKEND_URL": f"{stub_url}/sum",
+        "ANALYTICS_BACKEND_URL": f"{stub_url}/events",
+    }
+    with spawn(stub, stub_port), spawn(uvicorn_args("app:app", gateway_port, gateway_dir), gateway_port, cwd=gateway_dir, env=env):
+        yield f"http://127.0.0.1:{gateway_port}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gateway-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--spawn", action="store_true", help="Start a latency stub and the gateway locally")
+    parser.add_argument("--backend-latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--paths", default="/greet?name=bench,/sum?a=1&b=2,/fanout")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    paths = args.paths.split(",")
+    stack = local_stack(args.backend_latency) if args.spawn else contextlib.nullcontext(args.gateway_url)
+    with stack as gateway_url:
+        rows = asyncio.run(sweep(gateway_url, paths, levels, args.duration))
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
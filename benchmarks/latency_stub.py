@@ -0,0 +1,71 @@
+"""Minimal keep-alive HTTP stub standing in for the greeting/math/analytics backends.
+
+Every response is delayed by ``--latency`` seconds so gateway tests measure
+how well concurrent requests overlap rather than backend CPU time.
+"""
+import argparse
+import asyncio
+import json
+from urllib.parse import parse_qs, urlsplit
+
+
+def _body_for(path: str, query: dict) -> dict:
+    if path.endswith("/greet"):
+        return {"message": f"Hello there! You'll be known here as {query.get('name', ['Stranger'])[0]}12345."}
+    if path.endswith("/sum"):
+        a = float(query.get("a", ["0"])[0])
+        b = float(query.get("b", ["0"])[0])
+        return {"a": a, "b": b, "result": a + b}
+    return {"status": "success", "details": "stub"}
+
+
+async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, latency: float) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            length = 0
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value.strip())
+            if length:
+                await reader.readexactly(length)
+            target = request_line.split()[1].decode("latin-1")
+            parts = urlsplit(target)
+            body = json.dumps(_body_for(parts.path, parse_qs(parts.query))).encode("utf-8")
+            if latency > 0:
+                await asyncio.sleep(latency)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+                + body
+            )
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host: str, port: int, latency: float) -> None:
+    server = await asyncio.start_server(lambda r, w: _handle(r, w, latency), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5601)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every response")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Closed-loop async HTTP load generator.
+
+``concurrency`` workers each send requests back-to-back for ``duration``
+seconds over one pooled httpx client; latencies are recorded per request.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+@dataclass
+class LoadResult:
+    name: str
+    concurrency: int
+    elapsed: float
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    @property
+    def throughput(self) -> float:
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+        return {
+            "name": self.name,
+            "concurrency": self.concurrency,
+            "requests": self.requests,
+            "errors": self.errors,
+            "elapsed_s": round(self.elapsed, 3),
+            "rps": round(self.throughput, 1),
+            "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+        }
+
+
+RequestFactory = Callable[[int], Dict[str, Any]]
+
+
+async def run_load(
+    name: str,
+    url: str,
+    concurrency: int,
+    duration: float,
+    method: str = "GET",
+    request_kwargs: Optional[RequestFactory] = None,
+    ok_statuses=range(200, 400),
+    warmup: float = 0.5,
+) -> LoadResult:
+    """Drive ``url`` with ``concurrency`` workers; ``request_kwargs(i)`` varies each request."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    result = LoadResult(name=name, concurrency=concurrency, elapsed=0.0)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        counter = 0
+
+        async def worker(deadline: float, record: bool) -> None:
+            nonlocal counter
+            while time.perf_counter() < deadline:
+                counter += 1
+                kwargs = request_kwargs(counter) if request_kwargs else {}
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, url, **kwargs)
+                    await response.aread()
+                except httpx.HTTPError:
+                    if record:
+                        result.errors += 1
+                    continue
+                if not record:
+                    continue
+                result.statuses[response.status_code] = result.statuses.get(response.status_code, 0) + 1
+                if response.status_code in ok_statuses:
+                    result.latencies.append(time.perf_counter() - start)
+                else:
+                    result.errors += 1
+
+        if warmup > 0:
+            deadline = time.perf_counter() + warmup
+            await asyncio.gather(*(worker(deadline, False) for _ in range(concurrency)))
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker(deadline, True) for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+    return result
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    columns = ["name", "concurrency", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms"]
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    lines = ["  ".join(c.ljust(widths[c]) for c in columns)]
+    for row in rows:
+        lines.append("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
+    return "\n".join(lines)
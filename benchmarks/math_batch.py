@@ -0,0 +1,121 @@
+"""Compare element throughput of ``GET /sum`` with ``POST /sum/batch``.
+
+Starts the math backend, and the frontend gateway pointed at it, then
+measures elements summed per second for: single-pair ``GET /sum`` under
+concurrency, JSON batches and binary (little-endian float64) batches, both
+directly and through the gateway's ``/sum/batch`` proxy.
+
+    python -m benchmarks.math_batch
+    python -m benchmarks.math_batch --json-sizes 1000,100000 --binary-sizes 1000000 --json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.loadgen import run_load
+from benchmarks.services import APPS_DIR, free_port, spawn, uvicorn_args
+
+MATH_APP_DIR = APPS_DIR / "vm-poc-backend-math" / "app"
+GATEWAY_APP_DIR = APPS_DIR / "vm-poc-frontend" / "app"
+
+
+@contextlib.contextmanager
+def math_stack() -> Iterator[Tuple[str, str]]:
+    """Yield ``(math_url, gateway_url)`` for a math backend and a gateway in front of it."""
+    math_port, gateway_port = free_port(), free_port()
+    math_url = f"http://127.0.0.1:{math_port}"
+    env = {"MATH_BACKEND_URL": f"{math_url}/sum", "MATH_BATCH_TIMEOUT": "120"}
+    with spawn(uvicorn_args("app:app", math_port, MATH_APP_DIR), math_port, cwd=MATH_APP_DIR), \
+            spawn(uvicorn_args("app:app", gateway_port, GATEWAY_APP_DIR), gateway_port, cwd=GATEWAY_APP_DIR, env=env):
+        yield math_url, f"http://127.0.0.1:{gateway_port}"
+
+
+def _time_batches(url: str, size: int, binary: bool, min_time: float) -> Dict[str, Any]:
+    rng = np.random.default_rng(size)
+    a, b = rng.random(size), rng.random(size)
+    if binary:
+        body = np.column_stack((a, b)).astype("<f8").tobytes()
+        request = {"content": body, "headers": {"content-type": "application/octet-stream"}}
+    else:
+        request = {"content": json.dumps({"a": a.tolist(), "b": b.tolist()}).encode(),
+                   "headers": {"content-type": "application/json"}}
+    expected = a + b
+
+    timings = []
+    with httpx.Client(timeout=120.0) as client:
+        client.post(url, **request).raise_for_status()  # warm up the connection and allocator
+        started = time.perf_counter()
+        while not timings or time.perf_counter() - started < min_time:
+            t0 = time.perf_counter()
+            response = client.post(url, **request)
+            timings.append(time.perf_counter() - t0)
+            response.raise_for_status()
+    result = np.frombuffer(response.content, dtype="<f8") if binary else np.asarray(response.json()["result"])
+    if not np.allclose(result, expected):
+        raise RuntimeError(f"Wrong results from {url} for {size} elements")
+
+    seconds = sorted(timings)[len(timings) // 2]
+    return {"elements": size, "requests": len(timings), "seconds": round(seconds, 4),
+            "elements_per_s": round(size / seconds, 1)}
+
+
+def run(json_sizes: List[int], binary_sizes: List[int], concurrency: List[int],
+        duration: float, min_time: float) -> List[Dict[str, Any]]:
+    rows = []
+    with math_stack() as (math_url, gateway_url):
+        for target, base_url in (("math", math_url), ("gateway", gateway_url)):
+            for level in concurrency:
+                result = asyncio.run(run_load(f"{target} GET /sum", f"{base_url}/sum?a=1.5&b=2.75", level, duration))
+                summary = result.summary()
+                rows.append({"name": summary["name"], "concurrency": level, "elements": 1,
+                             "seconds": round(1 / summary["rps"], 6) if summary["rps"] else None,
+                             "elements_per_s": summary["rps"]})
+                print(_format_row(rows[-1]), file=sys.stderr)
+            for binary, sizes in ((False, json_sizes), (True, binary_sizes)):
+                kind = "binary" if binary else "json"
+                for size in sizes:
+                    row = _time_batches(f"{base_url}/sum/batch", size, binary, min_time)
+                    rows.append({"name": f"{target} POST /sum/batch {kind} {size:,}", **row})
+                    print(_format_row(rows[-1]), file=sys.stderr)
+    return rows
+
+
+def _format_row(row: Dict[str, Any]) -> str:
+    name = row["name"] + (f" @{row['concurrency']}" if row.get("concurrency") else "")
+    return f"{name:<48} {row['elements_per_s']:>16,.0f} elements/s"
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    return "\n".join([f"{'case':<48} {'throughput':>27}"] + [_format_row(row) for row in rows])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--json-sizes", default="1000,100000,1000000")
+    parser.add_argument("--binary-sizes", default="1000000,10000000")
+    parser.add_argument("--concurrency", default="1,16")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per GET /sum load level")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Seconds of repeated requests per batch case")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    rows = run(
+        [int(size) for size in args.json_sizes.split(",") if size],
+        [int(size) for size in args.binary_sizes.split(",") if size],
+        [int(level) for level in args.concurrency.split(",")],
+        args.duration,
+        args.min_time,
+    )
+    print(json.dumps(rows, indent=2) if args.json else format_rows(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""In-process micro-benchmarks for the fortiflex backend's hot helpers.
+
+Covers response serialization (catalog representations, large FortiFlex
+payloads, response-cache sizing) and the token path (cache key hashing and a
+warm ``TokenCache`` hit). Each case is timed over ``--min-time`` seconds and
+reported as ns/op and ops/s.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter token --json
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks.services import APPS_DIR
+
+FORTIFLEX_APP_DIR = APPS_DIR / "vm-poc-backend-fortiflex" / "app"
+
+
+def synthetic_entitlements(count: int) -> Dict[str, Any]:
+    """A FortiFlex ``/entitlements/list`` body shaped like the real one."""
+    return {
+        "status": 0,
+        "message": "Request processed successfully",
+        "entitlements": [
+            {
+                "serialNumber": f"FGVMMLTM{i:08d}",
+                "accountId": 1234567,
+                "configId": i % 20 + 1,
+                "description": f"vm-{i:05d}",
+                "startDate": "2025-01-01T00:00:00",
+                "endDate": "2026-01-01T00:00:00",
+                "status": "ACTIVE" if i % 10 else "STOPPED",
+                "token": f"{i:020X}",
+                "tokenStatus": "USED" if i % 3 else "NOTUSED",
+                "folderPath": f"My Assets/group-{i % 50:03d}",
+            }
+            for i in range(count)
+        ],
+    }
+
+
+def synthetic_catalog(count: int) -> List[Dict[str, Any]]:
+    return [
+        {"id": f"prod-{i:05d}", "name": f"FortiGate-VM {i}", "cloud": ("aws", "azure", "gcp")[i % 3],
+         "sku": f"FG-VM{i % 16:02d}", "price": i % 500 + 0.99, "description": "Next-generation firewall " * 4}
+        for i in range(count)
+    ]
+
+
+def measure(name: str, fn: Callable[[], Any], min_time: float) -> Dict[str, Any]:
+    fn()  # warm caches and lazy imports
+    loops, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed < min_time / 10 else 1 + int(min_time / max(elapsed, 1e-9))
+    ns_per_op = elapsed / loops * 1e9
+    return {"name": name, "ops": loops, "ns_per_op": round(ns_per_op, 1),
+            "ops_per_s": round(1e9 / ns_per_op, 1) if ns_per_op else 0.0}
+
+
+def cases() -> Dict[str, Callable[[], Any]]:
+    sys.path.insert(0, str(FORTIFLEX_APP_DIR))
+    from app.http_cache import dump_json, encode_representations
+    from vm_poc_common.metrics import Histogram
+    from app.response_cache import ResponseCache
+    from app.token_cache import CachedToken, TokenCache, cache_key
+
+    entitlements = synthetic_entitlements(10_000)
+    catalog = synthetic_catalog(2_000)
+    response_cache = ResponseCache(max_bytes=256 * 1024 * 1024)
+    scope = ("user", "1234567", "ELAVMS0000000001")
+
+    token_cache = TokenCache()
+    key = cache_key("api-user", "api-key")
+    token_cache._entries[key] = CachedToken("token", time.time() + 3600)
+    loop = asyncio.new_event_loop()
+
+    async def no_fetch():
+        raise AssertionError("warm token cache should not fetch")
+
+    histogram = Histogram("micro_benchmark_seconds", "micro-benchmark observations", ["path"])
+
+    return {
+        "serialize/entitlements-10k-json": lambda: json.dumps(entitlements),
+        "serialize/catalog-2k-dump_json": lambda: dump_json(catalog),
+        "serialize/catalog-2k-representations": lambda: encode_representations(catalog, "v1", 0.0),
+        "serialize/response-cache-put-10k": lambda: response_cache.put(
+            response_cache.make_key(scope, "/entitlements/list", {"configId": 1}), entitlements, 60
+        ),
+        "token/cache-key": lambda: cache_key("api-user", "api-key"),
+        "token/warm-hit": lambda: loop.run_until_complete(token_cache.get_token(key, no_fetch)),
+        "metrics/histogram-observe": lambda: histogram.observe(0.012, "/configs/list"),
+    }
+
+
+def run(filter_text: str = "", min_time: float = 0.5) -> List[Dict[str, Any]]:
+    rows = []
+    for name, fn in cases().items():
+        if filter_text and filter_text not in name:
+            continue
+        rows.append(measure(name, fn, min_time))
+        print(f"{name}: {rows[-1]['ns_per_op']} ns/op", file=sys.stderr)
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    width = max((len(r["name"]) for r in rows), default=4)
+    lines = [f"{'name'.ljust(width)}  {'ns/op':>14}  {'ops/s':>14}"]
+    for row in rows:
+        lines.append(f"{row['name'].ljust(width)}  {row['ns_per_op']:>14,.1f}  {row['ops_per_s']:>14,.1f}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to spend per case")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    rows = run(args.filter, args.min_time)
+    print(json.dumps(rows, indent=2) if args.json else format_rows(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
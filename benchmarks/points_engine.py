@@ -0,0 +1,176 @@
+"""Check the local points engine against FortiFlex's calculator, and time both.
+
+Starts the FortiFlex mock (``apps/vm-poc-fortiflex-mock``) as the stand-in
+upstream and the fortiflex backend in front of it, then prices the same work
+two ways:
+
+- every entitlement of the mock program: ``POST /api/fortiflex/estimate``
+  with the entitlements as listed, against ``/entitlements/points``;
+- ``--what-ifs`` configurations derived from the program's configs (numeric
+  parameters scaled, options swapped): one estimate call, against one
+  ``/tools/calc`` call per configuration.
+
+Any points/day that differs from upstream by more than ``--tolerance`` is a
+mismatch and makes the check exit with status 1. The mock prices with the
+same linear model the engine assumes, so this covers the plumbing and the
+timing; the fallback for prices the model does not fit (tiers) is covered
+by the backend's ``tests/test_points.py``.
+
+    python -m benchmarks.points_engine
+    python -m benchmarks.points_engine --entitlements 50000 --what-ifs 5000 --json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import random
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import httpx
+
+from benchmarks.services import APPS_DIR, free_port, spawn, uvicorn_args
+
+FORTIFLEX_APP_DIR = APPS_DIR / "vm-poc-backend-fortiflex" / "app"
+MOCK_APP_DIR = APPS_DIR / "vm-poc-fortiflex-mock" / "app"
+CREDENTIALS = {"username": "bench", "apiKey": "bench", "serialNumber": "ELAVMS0000000001", "accountId": "1234567"}
+DAYS = 30
+
+
+@contextlib.contextmanager
+def stack(entitlements: int, configs: int) -> Iterator[str]:
+    mock_port, backend_port = free_port(), free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock_env = {"MOCK_ENTITLEMENTS": str(entitlements), "MOCK_CONFIGS": str(configs), "MOCK_PAGE_SIZE": "0"}
+    backend_env = {"FORTICLOUD_AUTH_BASE": f"{mock_url}/api/v1", "FORTIFLEX_API_BASE": f"{mock_url}/ES/api/fortiflex/v2",
+                   "FORTIFLEX_RATE_PER_SECOND": "0", "PRODUCTS_TABLE_NAME": "", "SESSION_SECRET": "benchmark",
+                   "HTTP2_ENABLED": "false", "LOG_LEVEL": "WARNING"}
+    with spawn(uvicorn_args("app.main:app", mock_port, MOCK_APP_DIR), mock_port, cwd=MOCK_APP_DIR, env=mock_env), \
+            spawn(uvicorn_args("app.main:app", backend_port, FORTIFLEX_APP_DIR), backend_port,
+                  cwd=FORTIFLEX_APP_DIR, env=backend_env):
+        yield f"http://127.0.0.1:{backend_port}"
+
+
+def what_ifs(configs: List[Dict[str, Any]], count: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Cart-style configurations: each program config with numbers scaled and options swapped."""
+    rng = random.Random(seed)
+    options: Dict[Tuple[int, int], set] = {}
+    for config in configs:
+        for param in config["parameters"]:
+            if not str(param["value"]).lstrip("-").replace(".", "", 1).isdigit():
+                options.setdefault((config["productType"]["id"], param["id"]), set()).add(param["value"])
+    items = []
+    for i in range(count):
+        config = configs[i % len(configs)]
+        product_type_id = config["productType"]["id"]
+        parameters = []
+        for param in config["parameters"]:
+            choices = options.get((product_type_id, param["id"]))
+            if choices:
+                value = rng.choice(sorted(choices))
+            else:
+                value = int(float(param["value"]) * rng.choice([0.5, 1, 2, 4, 8])) or 1
+            parameters.append({"id": param["id"], "value": value})
+        items.append({"productTypeId": product_type_id, "parameters": parameters, "count": rng.randint(1, 5)})
+    return items
+
+
+def _timed_post(client: httpx.Client, path: str, body: Dict[str, Any]) -> Tuple[Dict[str, Any], float]:
+    started = time.perf_counter()
+    response = client.post(path, json=body)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return response.json(), elapsed
+
+
+async def _calc_all(base_url: str, cookie: str, items: List[Dict[str, Any]], concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, headers={"Cookie": cookie}, limits=limits, timeout=60) as client:
+        async def calc(item):
+            async with semaphore:
+                response = await client.post("/api/fortiflex/tools/calc", json={**item, "count": 1})
+                response.raise_for_status()
+                return response.json()["pointsPerDay"]
+
+        return await asyncio.gather(*(calc(item) for item in items))
+
+
+def _compare(name: str, local: List[float], upstream: List[float], tolerance: float) -> Dict[str, Any]:
+    errors = [abs(a - b) for a, b in zip(local, upstream)]
+    return {"name": name, "items": len(errors), "max_abs_error": round(max(errors, default=0.0), 6),
+            "mismatches": sum(error > tolerance for error in errors)}
+
+
+def run(entitlements: int = 10000, configs: int = 20, what_if_count: int = 2000, concurrency: int = 16,
+        tolerance: float = 0.01) -> List[Dict[str, Any]]:
+    rows = []
+    with stack(entitlements, configs) as base_url, httpx.Client(base_url=base_url, timeout=120) as client:
+        client.post("/api/fortiflex/credentials", json=CREDENTIALS).raise_for_status()
+        cookie = f"session={client.cookies['session']}"
+
+        listed, _ = _timed_post(client, "/api/fortiflex/entitlements/list-all", {})
+        fleet = listed["entitlements"]
+        upstream, upstream_s = _timed_post(client, "/api/fortiflex/entitlements/points", {"days": DAYS})
+        # Cold: includes fetching the configs and calibrating the rates
+        cold, cold_s = _timed_post(client, "/api/fortiflex/estimate", {"items": fleet, "days": DAYS})
+        warm, warm_s = _timed_post(client, "/api/fortiflex/estimate", {"items": fleet, "days": DAYS})
+        expected = {row["serialNumber"]: row["points"] / DAYS for row in upstream["entitlements"]}
+        local = {row["serialNumber"]: row["pointsPerDay"] for row in warm["items"] if row["serialNumber"] in expected}
+        check = _compare("entitlements vs /entitlements/points", [local.get(s, 0.0) for s in expected],
+                         list(expected.values()), tolerance)
+        inactive = sum(1 for row in warm["items"] if row["serialNumber"] not in expected and row["points"])
+        check["mismatches"] += inactive
+        rows.append({**check, "local_cold_ms": round(cold_s * 1000, 1), "local_warm_ms": round(warm_s * 1000, 1),
+                     "upstream_ms": round(upstream_s * 1000, 1),
+                     "elements_per_s": round(len(fleet) / warm_s, 1), "distinct_configs": warm["distinctConfigs"]})
+
+        config_list = client.post("/api/fortiflex/configs/list", json={}).json()["configs"]
+        items = what_ifs(config_list, what_if_count)
+        estimate, local_s = _timed_post(client, "/api/fortiflex/estimate", {"items": items})
+        started = time.perf_counter()
+        calc = asyncio.run(_calc_all(base_url, cookie, items, concurrency))
+        calc_s = time.perf_counter() - started
+        check = _compare("what-ifs vs /tools/calc", [row["pointsPerDay"] for row in estimate["items"]], calc, tolerance)
+        rows.append({**check, "local_ms": round(local_s * 1000, 1), "upstream_ms": round(calc_s * 1000, 1),
+                     "elements_per_s": round(len(items) / local_s, 1),
+                     "upstream_elements_per_s": round(len(items) / calc_s, 1),
+                     "distinct_configs": estimate["distinctConfigs"]})
+        rates = client.get("/api/fortiflex/estimate/rates").json()["rates"]
+        for row in rows:
+            row["rate_signatures"] = len(rates)
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    return "\n".join(
+        f"{row['name']}: {row['items']} items, max error {row['max_abs_error']} pts/day, "
+        f"{row['mismatches']} mismatches; local "
+        + (f"{row['local_cold_ms']} ms cold / {row['local_warm_ms']} ms warm"
+           if "local_cold_ms" in row else f"{row['local_ms']} ms")
+        + f", upstream {row['upstream_ms']} ms ({row['distinct_configs']} distinct configs)"
+        for row in rows
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entitlements", type=int, default=10000)
+    parser.add_argument("--configs", type=int, default=20)
+    parser.add_argument("--what-ifs", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16, help="Parallel /tools/calc calls for the reference")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="Allowed points/day difference")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    rows = run(args.entitlements, args.configs, args.what_ifs, args.concurrency, args.tolerance)
+    print(json.dumps(rows, indent=2) if args.json else format_rows(rows))
+    mismatches = sum(row["mismatches"] for row in rows)
+    if mismatches:
+        print(f"POINTS MISMATCH: {mismatches} item(s) differ from the FortiFlex calculator", file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""Compare SAML ACS handling: per-request settings parse on the event loop vs cached settings in a thread pool.
+
+A throwaway IdP key/certificate is generated with ``openssl`` and used to
+sign one unique assertion per login, so the replay cache never rejects a
+benchmark request. The FortiFlex backend's ``saml_router`` is served by
+uvicorn in a child process, once per mode:
+
+- ``legacy``: the original handler, which parses settings/certs and
+  validates the signature inline on the event loop.
+- ``pooled``: the current handler (cached settings, ``SAML_ACS_WORKERS``).
+
+While logins are driven at ``--concurrency``, a single client polls a
+trivial endpoint; its p99 shows how much ACS work stalls the event loop.
+
+    python -m benchmarks.saml_acs --concurrency 8 --duration 5
+"""
+import argparse
+import asyncio
+import base64
+import json
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.loadgen import format_table, run_load
+from benchmarks.services import APPS_DIR, free_port, spawn
+
+FORTIFLEX_APP_DIR = APPS_DIR / "vm-poc-backend-fortiflex" / "app"
+SP_HOST = "ec2-52-43-126-239.us-west-2.compute.amazonaws.com"
+IDP_ENTITY_ID = "https://idp.benchmark.invalid/"
+
+
+def _pem_body(path: Path) -> str:
+    return "".join(line for line in path.read_text().splitlines() if "-----" not in line)
+
+
+def write_fixtures(directory: Path, port: int) -> Dict:
+    """Create an IdP key pair and a settings dict whose ACS URL points at ``port``."""
+    key, cert = directory / "idp.key", directory / "idp.crt"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2",
+         "-subj", "/CN=benchmark-idp", "-keyout", str(key), "-out", str(cert)],
+        check=True, capture_output=True,
+    )
+    base = json.loads((FORTIFLEX_APP_DIR / "app" / "routes" / "saml" / "settings.json").read_text())
+    base["debug"] = False
+    base["sp"]["assertionConsumerService"]["url"] = f"http://{SP_HOST}:{port}/saml/acs"
+    base["idp"] = {
+        "entityId": IDP_ENTITY_ID,
+        "singleSignOnService": {"url": "https://idp.benchmark.invalid/sso",
+                                "binding": "urn:oasis:names:tc:SAML:2.0:bindings:HTTP-Redirect"},
+        "x509cert": _pem_body(cert),
+    }
+    (directory / "settings.json").write_text(json.dumps(base))
+    return base
+
+
+def _saml_time(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def signed_responses(settings: Dict, key_pem: str, cert_pem: str, count: int) -> List[str]:
+    from onelogin.saml2.utils import OneLogin_Saml2_Utils
+
+    acs_url = settings["sp"]["assertionConsumerService"]["url"]
+    audience = settings["sp"]["entityId"]
+    now = datetime.now(timezone.utc)
+    issued, expires = _saml_time(now - timedelta(minutes=1)), _saml_time(now + timedelta(hours=1))
+    responses = []
+    for i in range(count):
+        assertion_id = f"_a{uuid.uuid4().hex}"
+        assertion = f"""<saml:Assertion xmlns:saml="urn:oasis:names:tc:SAML:2.0:assertion" xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" ID="{assertion_id}" Version="2.0" IssueInstant="{issued}"><saml:Issuer>{IDP_ENTITY_ID}</saml:Issuer><saml:Subject><saml:NameID Format="urn:oasis:names:tc:SAML:1.1:nameid-format:emailAddress">user{i}@example.com</saml:NameID><saml:SubjectConfirmation Method="urn:oasis:names:tc:SAML:2.0:cm:bearer"><saml:SubjectConfirmationData NotOnOrAfter="{expires}" Recipient="{acs_url}"/></saml:SubjectConfirmation></saml:Subject><saml:Conditions NotBefore="{issued}" NotOnOrAfter="{expires}"><saml:AudienceRestriction><saml:Audience>{audience}</saml:Audience></saml:AudienceRestriction></saml:Conditions><saml:AuthnStatement AuthnInstant="{issued}" SessionIndex="{assertion_id}"><saml:AuthnContext><saml:AuthnContextClassRef>urn:oasis:names:tc:SAML:2.0:ac:classes:Password</saml:AuthnContextClassRef></saml:AuthnContext></saml:AuthnStatement><saml:AttributeStatement><saml:Attribute Name="email"><saml:AttributeValue xsi:type="xs:string">user{i}@example.com</saml:AttributeValue></saml:Attribute></saml:AttributeStatement></saml:Assertion>"""
+        signed = OneLogin_Saml2_Utils.add_sign(assertion, key_pem, cert_pem)
+        if isinstance(signed, bytes):
+            signed = signed.decode("utf-8")
+        signed = signed.split("?>", 1)[-1].strip()
+        response = (
+            f'<samlp:Response xmlns:samlp="urn:oasis:names:tc:SAML:2.0:protocol" '
+            f'xmlns:saml="urn:oasis:names:tc:SAML:2.0:assertion" ID="_r{uuid.uuid4().hex}" Version="2.0" '
+            f'IssueInstant="{issued}" Destination="{acs_url}"><saml:Issuer>{IDP_ENTITY_ID}</saml:Issuer>'
+            f'<samlp:Status><samlp:StatusCode Value="urn:oasis:names:tc:SAML:2.0:status:Success"/></samlp:Status>'
+            f"{signed}</samlp:Response>"
+        )
+        responses.append(base64.b64encode(response.encode("utf-8")).decode("ascii"))
+    return responses
+
+
+def build_app(mode: str, settings: Dict):
+    """ASGI app for the child process: the SAML router plus a trivial /ping."""
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, RedirectResponse
+    from onelogin.saml2.auth import OneLogin_Saml2_Auth
+
+    from app.routes import saml
+    from app.sessions import MemorySessionStore, ServerSideSessionMiddleware
+
+    app = FastAPI()
+    app.add_middleware(ServerSideSessionMiddleware, secret_key="benchmark", store=MemorySessionStore())
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if mode == "pooled":
+        saml.load_saml_settings(settings)
+        app.include_router(saml.saml_router)
+        return app
+
+    @app.post("/saml/acs")
+    async def legacy_acs(request: Request):
+        form = await request.form()
+        url_data = {
+            "https": "on" if request.url.scheme == "https" else "off",
+            "http_host": SP_HOST,
+            "server_port": str(request.url.port or 443),
+            "script_name": request.url.path,
+            "get_data": {},
+            "post_data": dict(form),
+        }
+        auth = OneLogin_Saml2_Auth(url_data, old_settings=json.loads(json.dumps(settings)))
+        auth.process_response()
+        if auth.get_errors():
+            return JSONResponse(status_code=400, content={"errors": auth.get_errors()})
+        request.session["user"] = {"nameid": auth.get_nameid()}
+        return RedirectResponse("/")
+
+    return app
+
+
+def serve(args) -> int:
+    import uvicorn
+
+    sys.path.insert(0, str(FORTIFLEX_APP_DIR))
+    settings = json.loads(Path(args.settings).read_text())
+    uvicorn.run(build_app(args.mode, settings), host="127.0.0.1", port=args.port, log_level="warning")
+    return 0
+
+
+async def measure(base_url: str, mode: str, responses: List[str], concurrency: int, duration: float):
+    logins = iter(responses)
+
+    def next_login(_i: int):
+        # Once exhausted the last response repeats and shows up as replay errors
+        return {"data": {"SAMLResponse": next(logins, responses[-1])}}
+
+    acs = run_load(f"{mode} /saml/acs", f"{base_url}/saml/acs", concurrency, duration,
+                   method="POST", request_kwargs=next_login, warmup=0)
+    ping = run_load(f"{mode} /ping during logins", f"{base_url}/ping", 1, duration, warmup=0)
+    return [result.summary() for result in await asyncio.gather(acs, ping)]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command")
+    child = sub.add_parser("serve", help=argparse.SUPPRESS)
+    child.add_argument("--mode", choices=["legacy", "pooled"], required=True)
+    child.add_argument("--port", type=int, required=True)
+    child.add_argument("--settings", required=True)
+    parser.add_argument("--modes", default="legacy,pooled")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--logins", type=int, default=3000, help="Signed responses to pre-generate per mode")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    if args.command == "serve":
+        return serve(args)
+
+    sys.path.insert(0, str(FORTIFLEX_APP_DIR))
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for mode in args.modes.split(","):
+            port = free_port()
+            settings = write_fixtures(directory, port)
+            key_pem = (directory / "idp.key").read_text()
+            cert_pem = (directory / "idp.crt").read_text()
+            started = time.perf_counter()
+            responses = signed_responses(settings, key_pem, cert_pem, args.logins)
+            print(f"{mode}: signed {len(responses)} responses in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            cmd = [sys.executable, "-m", "benchmarks.saml_acs", "serve", "--mode", mode,
+                   "--port", str(port), "--settings", str(directory / "settings.json")]
+            with spawn(cmd, port):
+                rows.extend(asyncio.run(measure(f"http://127.0.0.1:{port}", mode, responses,
+                                                args.concurrency, args.duration)))
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
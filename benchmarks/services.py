@@ -0,0 +1,58 @@
+"""Start local service processes for a benchmark run and wait until they listen."""
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+APPS_DIR = REPO_ROOT / "apps"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 20.0, proc: Optional[subprocess.Popen] = None) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"Process exited early with code {proc.returncode}: {proc.args}")
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise TimeoutError(f"Nothing listening on port {port} after {timeout}s")
+
+
+@contextlib.contextmanager
+def spawn(args: List[str], port: int, cwd: Optional[Path] = None,
+          env: Optional[Dict[str, str]] = None, quiet: bool = True) -> Iterator[subprocess.Popen]:
+    """Run ``args`` until the block exits; blocks until ``port`` accepts connections."""
+    proc_env = {**os.environ, **(env or {})}
+    output = subprocess.DEVNULL if quiet else None
+    proc = subprocess.Popen(args, cwd=cwd, env=proc_env, stdout=output, stderr=output)
+    try:
+        wait_for_port(port, proc=proc)
+        yield proc
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def uvicorn_args(app: str, port: int, app_dir: Path, workers: int = 1) -> List[str]:
+    return [
+        sys.executable, "-m", "uvicorn", app,
+        "--app-dir", str(app_dir),
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers),
+        "--log-level", "warning",
+    ]
@@ -0,0 +1,162 @@
+"""Cold-start profile and budget check for the fortiflex backend.
+
+Three measurements, each the median of ``--runs`` fresh processes:
+
+- ``import``: ``python -X importtime -c "import app.main"``, plus a report of
+  where the time goes, grouped by top-level package.
+- ``listen``: from spawning uvicorn until the port accepts connections. This
+  is what delays a new pod or HPA replica.
+- ``ready``: until ``/readyz`` answers 200, i.e. the background warm-up
+  (catalog load, SAML settings) has finished.
+
+The check fails (exit status 1) when a median exceeds its budget, or when a
+module that is supposed to load lazily (``--lazy``) is imported by
+``import app.main``.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 5 --listen-budget-ms 2000 --json
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.services import APPS_DIR, free_port, uvicorn_args
+
+FORTIFLEX_APP_DIR = APPS_DIR / "vm-poc-backend-fortiflex" / "app"
+APP_ENV = {"PRODUCTS_TABLE_NAME": "", "SESSION_SECRET": "benchmark", "HTTP2_ENABLED": "false", "LOG_LEVEL": "WARNING"}
+# Heavy dependencies that must stay out of the import path of app.main
+LAZY_MODULES = ("boto3", "botocore", "onelogin", "xmlsec", "lxml", "numpy")
+
+# Generous for a 1-2 vCPU pod; tighten once a baseline exists for the target hardware
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+LISTEN_BUDGET_MS = float(os.getenv("STARTUP_LISTEN_BUDGET_MS", "3000"))
+READY_BUDGET_MS = float(os.getenv("STARTUP_READY_BUDGET_MS", "5000"))
+
+_IMPORTTIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def _env() -> Dict[str, str]:
+    return {**os.environ, **APP_ENV, "PYTHONPATH": str(FORTIFLEX_APP_DIR)}
+
+
+def import_profile() -> Tuple[float, List[Tuple[str, int, int]]]:
+    """Return (wall ms, [(module, self_us, cumulative_us)]) for one ``import app.main``."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=FORTIFLEX_APP_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2))))
+    return wall_ms, modules
+
+
+def by_package(modules: List[Tuple[str, int, int]]) -> List[Tuple[str, float]]:
+    """Self time per top-level package in ms, largest first."""
+    totals: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in modules:
+        totals[name.split(".")[0]] += self_us
+    return sorted(((name, us / 1000) for name, us in totals.items()), key=lambda pair: -pair[1])
+
+
+def cold_start(timeout: float = 30.0) -> Tuple[float, Optional[float]]:
+    """Spawn uvicorn once; return (ms until listening, ms until /readyz is 200)."""
+    port = free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(uvicorn_args("app.main:app", port, FORTIFLEX_APP_DIR), cwd=FORTIFLEX_APP_DIR,
+                            env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listen_ms = ready_ms = None
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            with socket.socket() as sock:
+                if sock.connect_ex(("127.0.0.1", port)) == 0:
+                    listen_ms = (time.perf_counter() - started) * 1000
+                    break
+            time.sleep(0.005)
+        if listen_ms is None:
+            raise TimeoutError(f"Not listening after {timeout}s")
+        with httpx.Client(timeout=5.0) as client:
+            while time.perf_counter() < deadline:
+                if client.get(f"http://127.0.0.1:{port}/readyz").status_code == 200:
+                    ready_ms = (time.perf_counter() - started) * 1000
+                    break
+                time.sleep(0.01)
+        return listen_ms, ready_ms
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def run(runs: int = 3) -> Dict[str, Any]:
+    imports = [import_profile() for _ in range(runs)]
+    starts = [cold_start() for _ in range(runs)]
+    modules = imports[-1][1]
+    loaded = {name.split(".")[0] for name, _, _ in modules}
+    ready = [ms for _, ms in starts if ms is not None]
+    return {
+        "name": "fortiflex cold start",
+        "runs": runs,
+        "import_ms": round(statistics.median(ms for ms, _ in imports), 1),
+        "listen_ms": round(statistics.median(ms for ms, _ in starts), 1),
+        "ready_ms": round(statistics.median(ready), 1) if ready else None,
+        "eager_lazy_modules": sorted(loaded & set(LAZY_MODULES)),
+        "top_packages": [[name, round(ms, 1)] for name, ms in by_package(modules)[:15]],
+    }
+
+
+def budget_failures(row: Dict[str, Any], budgets: Dict[str, float]) -> List[str]:
+    failures = [f"{metric} {row[metric]} ms > budget {limit:.0f} ms"
+                for metric, limit in budgets.items() if row.get(metric) is None or row[metric] > limit]
+    if row["eager_lazy_modules"]:
+        failures.append(f"imported at startup but should load lazily: {', '.join(row['eager_lazy_modules'])}")
+    return failures
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    lines = [f"{row['name']} (median of {row['runs']}): import {row['import_ms']} ms, "
+             f"listening {row['listen_ms']} ms, ready {row['ready_ms']} ms",
+             "Import self time by package:"]
+    lines += [f"  {name:<28} {ms:>8.1f} ms" for name, ms in row["top_packages"]]
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--listen-budget-ms", type=float, default=LISTEN_BUDGET_MS)
+    parser.add_argument("--ready-budget-ms", type=float, default=READY_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    row = run(args.runs)
+    failures = budget_failures(row, {"import_ms": args.import_budget_ms, "listen_ms": args.listen_budget_ms,
+                                     "ready_ms": args.ready_budget_ms})
+    print(json.dumps({**row, "failures": failures}, indent=2) if args.json else format_row(row))
+    for failure in failures:
+        print(f"STARTUP BUDGET EXCEEDED: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
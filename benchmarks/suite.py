@@ -0,0 +1,378 @@
+"""Run every service benchmark, save the results as JSON and compare runs.
+
+Scenarios (each starts its own local processes on free ports):
+
+- ``products``: ``GET /api/products`` on the fortiflex backend, full catalog
+  and a filtered query, using the fallback catalog. With
+  ``--dynamodb-endpoint`` the seeded table in DynamoDB Local is used too.
+- ``fortiflex``: proxied FortiFlex routes against the local FortiFlex mock
+  (``apps/vm-poc-fortiflex-mock``).
+- ``saml``: SAML ACS validation (see ``benchmarks.saml_acs``).
+- ``gateway``: the frontend gateway's ``/greet`` and ``/sum`` proxies in
+  front of a latency stub.
+- ``backends``: the math, greeting and echo services directly.
+- ``math-batch``: elements/s of ``GET /sum`` vs JSON and binary
+  ``POST /sum/batch``, direct and through the gateway (see
+  ``benchmarks.math_batch``).
+- ``micro``: in-process serialization and token-path micro-benchmarks.
+- ``startup``: fortiflex backend import, listen and ready times (see
+  ``benchmarks.startup``).
+- ``workers``: fortiflex backend req/s and memory for 1, 2 and 4 workers
+  of the pre-fork launcher (see ``benchmarks.worker_scaling``).
+- ``encoding``: response encoding time and peak memory per hot endpoint,
+  before and after the shared ``fastjson`` layer (see ``benchmarks.encoding``).
+
+    python -m benchmarks.suite run --out benchmarks/results/base.json
+    python -m benchmarks.suite run --scenarios fortiflex,micro --out new.json
+    python -m benchmarks.suite compare base.json new.json --threshold 10
+
+``compare`` exits with status 1 when any shared case regressed by more than
+``--threshold`` percent (lower throughput, higher p95/p99 or ns/op).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import encoding, math_batch, micro, saml_acs, startup, worker_scaling
+from benchmarks.loadgen import format_table, run_load
+from benchmarks.services import APPS_DIR, REPO_ROOT, free_port, spawn, uvicorn_args
+
+FORTIFLEX_APP_DIR = APPS_DIR / "vm-poc-backend-fortiflex" / "app"
+MOCK_APP_DIR = APPS_DIR / "vm-poc-fortiflex-mock" / "app"
+RESULTS_DIR = REPO_ROOT / "benchmarks" / "results"
+SCENARIOS = ("products", "fortiflex", "saml", "gateway", "backends", "math-batch", "startup", "workers", "micro",
+             "encoding")
+
+# Metric -> True when bigger is better
+COMPARED_METRICS = {"rps": True, "p95_ms": False, "p99_ms": False, "ns_per_op": False, "elements_per_s": True,
+                    "peak_bytes": False, "import_ms": False, "listen_ms": False, "ready_ms": False}
+
+ECHO_RAW_BODY = os.urandom(64 * 1024)
+
+Scenario = Callable[[argparse.Namespace], List[Dict[str, Any]]]
+
+
+@contextlib.contextmanager
+def fortiflex_backend(env: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    port = free_port()
+    base_env = {"PRODUCTS_TABLE_NAME": "", "SESSION_SECRET": "benchmark", "HTTP2_ENABLED": "false"}
+    with spawn(uvicorn_args("app.main:app", port, FORTIFLEX_APP_DIR), port, cwd=FORTIFLEX_APP_DIR,
+               env={**base_env, **(env or {})}):
+        yield f"http://127.0.0.1:{port}"
+
+
+async def _load_rows(scenario: str, base_url: str, cases, args) -> List[Dict[str, Any]]:
+    rows = []
+    for name, path, options in cases:
+        method, kwargs = options.get("method", "GET"), options.get("kwargs")
+        for concurrency in args.levels:
+            result = await run_load(name, f"{base_url}{path}", concurrency, args.duration,
+                                    method=method, request_kwargs=kwargs)
+            rows.append({"scenario": scenario, **result.summary()})
+            print(format_table(rows[-1:]).splitlines()[-1], file=sys.stderr)
+    return rows
+
+
+def _products_cases():
+    return [
+        ("products full catalog", "/api/products", {}),
+        ("products filtered", "/api/products?cloud=aws&sort=price&limit=50", {}),
+    ]
+
+
+def seed_dynamodb(endpoint: str, table: str) -> None:
+    subprocess.run(
+        [sys.executable, str(REPO_ROOT / "dynamodb" / "seed_products.py"),
+         "--table-name", table, "--endpoint-url", endpoint],
+        check=True, cwd=REPO_ROOT,
+    )
+
+
+def scenario_products(args) -> List[Dict[str, Any]]:
+    rows = []
+    with fortiflex_backend() as base_url:
+        rows += asyncio.run(_load_rows("products-fallback", base_url, _products_cases(), args))
+    if args.dynamodb_endpoint:
+        seed_dynamodb(args.dynamodb_endpoint, args.products_table)
+        env = {"PRODUCTS_TABLE_NAME": args.products_table, "AWS_ENDPOINT_URL_DYNAMODB": args.dynamodb_endpoint,
+               "AWS_ACCESS_KEY_ID": os.environ.get("AWS_ACCESS_KEY_ID", "local"),
+               "AWS_SECRET_ACCESS_KEY": os.environ.get("AWS_SECRET_ACCESS_KEY", "local"),
+               "AWS_REGION": os.environ.get("AWS_REGION", "us-east-1")}
+        with fortiflex_backend(env) as base_url:
+            rows += asyncio.run(_load_rows("products-dynamodb", base_url, _products_cases(), args))
+    return rows
+
+
+def _session_cookie(base_url: str) -> str:
+    credentials = {"username": "bench", "apiKey": "bench", "serialNumber": "ELAVMS0000000001", "accountId": "1234567"}
+    response = httpx.post(f"{base_url}/api/fortiflex/credentials", json=credentials)
+    response.raise_for_status()
+    return f"session={response.cookies['session']}"
+
+
+def scenario_fortiflex(args) -> List[Dict[str, Any]]:
+    mock_port = free_port()
+    mock_url = f"http://127.0.0.1:{mock_port}"
+    mock_env = {"MOCK_ENTITLEMENTS": str(args.entitlements), "MOCK_PAGE_SIZE": "1000",
+                "MOCK_LATENCY_MS": str(args.upstream_latency_ms)}
+    backend_env = {"FORTICLOUD_AUTH_BASE": f"{mock_url}/api/v1",
+                   "FORTIFLEX_API_BASE": f"{mock_url}/ES/api/fortiflex/v2",
+                   "FORTIFLEX_RATE_PER_SECOND": "0"}
+    with spawn(uvicorn_args("app.main:app", mock_port, MOCK_APP_DIR), mock_port, cwd=MOCK_APP_DIR, env=mock_env), \
+            fortiflex_backend(backend_env) as base_url:
+        cookie = _session_cookie(base_url)
+
+        def post(body: Dict[str, Any]):
+            options = {"headers": {"Cookie": cookie}, "json": body}
+            return {"method": "POST", "kwargs": lambda _i: options}
+
+        cases = [
+            ("fortiflex programs/list (cached)", "/api/fortiflex/programs/list", post({})),
+            ("fortiflex programs/points (proxied)", "/api/fortiflex/programs/points", post({})),
+            ("fortiflex configs/list", "/api/fortiflex/configs/list", post({})),
+            ("fortiflex entitlements/stream", "/api/fortiflex/entitlements/stream", post({})),
+        ]
+        return asyncio.run(_load_rows("fortiflex", base_url, cases, args))
+
+
+def scenario_saml(args) -> List[Dict[str, Any]]:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        port = free_port()
+        settings = saml_acs.write_fixtures(directory, port)
+        responses = saml_acs.signed_responses(
+            settings, (directory / "idp.key").read_text(), (directory / "idp.crt").read_text(), args.saml_logins
+        )
+        cmd = [sys.executable, "-m", "benchmarks.saml_acs", "serve", "--mode", "pooled",
+               "--port", str(port), "--settings", str(directory / "settings.json")]
+        with spawn(cmd, port, cwd=REPO_ROOT):
+            # Each assertion is single-use, so every level gets its own slice
+            per_level = len(responses) // len(args.levels)
+            for i, concurrency in enumerate(args.levels):
+                chunk = responses[i * per_level:(i + 1) * per_level]
+                summaries = asyncio.run(saml_acs.measure(f"http://127.0.0.1:{port}", "pooled", chunk,
+                                                         concurrency, args.duration))
+                for summary in summaries:
+                    if summary["concurrency"] != concurrency:
+                        # The /ping probe always runs at 1; keep its rows distinct per login level
+                        summary["name"] += f" @{concurrency}"
+                    rows.append({"scenario": "saml", **summary})
+    return rows
+
+
+def scenario_gateway(args) -> List[Dict[str, Any]]:
+    from benchmarks.gateway_scaling import local_stack
+
+    cases = [("gateway /greet", "/greet?name=bench", {}), ("gateway /sum", "/sum?a=1.5&b=2.75", {})]
+    with local_stack(args.backend_latency) as gateway_url:
+        return asyncio.run(_load_rows("gateway", gateway_url, cases, args))
+
+
+def scenario_backends(args) -> List[Dict[str, Any]]:
+    services: List[Tuple[str, str, Path, str, Dict[str, Any]]] = [
+        ("math /sum", "app:app", APPS_DIR / "vm-poc-backend-math" / "app", "/sum?a=1.5&b=2.75", {}),
+        ("greeting /greet", "greeting_backend_app:app", APPS_DIR / "vm-poc-backend-greeting" / "app",
+         "/greet?name=bench", {}),
+        ("echo /echo", "app.main:app", APPS_DIR / "vm-poc-backend-echo" / "app", "/echo",
+         {"method": "POST", "kwargs": lambda _i: {"json": {"hello": "world", "items": list(range(32))}}}),
+        ("echo /echo/raw 64KiB", "app.main:app", APPS_DIR / "vm-poc-backend-echo" / "app", "/echo/raw",
+         {"method": "POST", "kwargs": lambda _i: {"content": ECHO_RAW_BODY}}),
+        ("echo /synthetic 64KiB", "app.main:app", APPS_DIR / "vm-poc-backend-echo" / "app",
+         "/synthetic?size=65536", {}),
+    ]
+    rows = []
+    for name, app, app_dir, path, options in services:
+        port = free_port()
+        with spawn(uvicorn_args(app, port, app_dir), port, cwd=app_dir):
+            rows += asyncio.run(_load_rows("backends", f"http://127.0.0.1:{port}", [(name, path, options)], args))
+    return rows
+
+
+def scenario_math_batch(args) -> List[Dict[str, Any]]:
+    rows = math_batch.run([1000, 100_000], [1_000_000], args.levels, args.duration, min_time=1.0)
+    return [{"scenario": "math-batch", **row} for row in rows]
+
+
+def scenario_startup(args) -> List[Dict[str, Any]]:
+    row = startup.run(runs=3)
+    print(startup.format_row(row), file=sys.stderr)
+    return [{"scenario": "startup", **row}]
+
+
+def scenario_workers(args) -> List[Dict[str, Any]]:
+    rows = worker_scaling.run([1, 2, 4], clients=min(4, os.cpu_count() or 1), concurrency=max(args.levels),
+                              duration=args.duration)
+    return [{"scenario": "workers", **row} for row in rows]
+
+
+def scenario_micro(args) -> List[Dict[str, Any]]:
+    return [{"scenario": "micro", **row} for row in micro.run(min_time=args.micro_time)]
+
+
+def scenario_encoding(args) -> List[Dict[str, Any]]:
+    return [{"scenario": "encoding", **row} for row in encoding.run(min_time=args.micro_time)]
+
+
+SCENARIO_RUNNERS: Dict[str, Scenario] = {
+    "products": scenario_products,
+    "fortiflex": scenario_fortiflex,
+    "saml": scenario_saml,
+    "gateway": scenario_gateway,
+    "backends": scenario_backends,
+    "math-batch": scenario_math_batch,
+    "startup": scenario_startup,
+    "workers": scenario_workers,
+    "micro": scenario_micro,
+    "encoding": scenario_encoding,
+}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> int:
+    args.levels = [int(level) for level in args.concurrency.split(",")]
+    selected = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(SCENARIO_RUNNERS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    results, failures = [], {}
+    for scenario in selected:
+        print(f"== {scenario}", file=sys.stderr)
+        try:
+            results += SCENARIO_RUNNERS[scenario](args)
+        except Exception as exc:  # keep going; a broken scenario is reported, not fatal
+            failures[scenario] = f"{type(exc).__name__}: {exc}"
+            print(f"{scenario} failed: {failures[scenario]}", file=sys.stderr)
+
+    document = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "duration_s": args.duration,
+            "concurrency": args.levels,
+            "scenarios": selected,
+            "failures": failures,
+        },
+        "results": results,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{_git_revision()}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(document, indent=2))
+
+    load_rows = [r for r in results if "rps" in r]
+    if load_rows:
+        print(format_table(load_rows))
+    batch_rows = [r for r in results if r.get("scenario") == "math-batch"]
+    if batch_rows:
+        print(math_batch.format_rows(batch_rows))
+    worker_rows = [r for r in results if r.get("scenario") == "workers"]
+    if worker_rows:
+        print(worker_scaling.format_rows(worker_rows))
+    micro_rows = [r for r in results if r.get("scenario") == "micro"]
+    if micro_rows:
+        print(micro.format_rows(micro_rows))
+    encoding_rows = [r for r in results if r.get("scenario") == "encoding"]
+    if encoding_rows:
+        print(encoding.format_rows(encoding_rows))
+    print(f"Results written to {out}")
+    return 1 if failures else 0
+
+
+def _case_key(row: Dict[str, Any]) -> Tuple[str, str, int]:
+    return row.get("scenario", ""), row["name"], int(row.get("concurrency", 0))
+
+
+def compare_results(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """One entry per shared case and metric, with the percent change and a regression flag."""
+    base_rows = {_case_key(row): row for row in base["results"]}
+    changes = []
+    for row in new["results"]:
+        previous = base_rows.get(_case_key(row))
+        if previous is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, current = previous.get(metric), row.get(metric)
+            if not old or current is None:
+                continue
+            change = (current - old) / old * 100
+            worse = -change if higher_is_better else change
+            changes.append({
+                "scenario": row.get("scenario", ""), "name": row["name"], "concurrency": row.get("concurrency", ""),
+                "metric": metric, "base": old, "new": current, "change_pct": round(change, 1),
+                "regression": worse > threshold,
+            })
+    return changes
+
+
+def compare(args) -> int:
+    base = json.loads(Path(args.base).read_text())
+    new = json.loads(Path(args.new).read_text())
+    changes = compare_results(base, new, args.threshold)
+    if args.json:
+        print(json.dumps(changes, indent=2))
+    else:
+        header = f"{'case':<52} {'metric':<10} {'base':>14} {'new':>14} {'change':>9}"
+        print(header)
+        for c in changes:
+            case = f"{c['scenario']}: {c['name']}" + (f" @{c['concurrency']}" if c["concurrency"] else "")
+            flag = "  REGRESSION" if c["regression"] else ""
+            print(f"{case[:52]:<52} {c['metric']:<10} {c['base']:>14.6g} {c['new']:>14.6g} {c['change_pct']:>8}%{flag}")
+    regressions = [c for c in changes if c["regression"]]
+    print(f"{len(regressions)} regression(s) above {args.threshold}% across {len(changes)} comparisons",
+          file=sys.stderr)
+    return 1 if regressions else 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub.add_parser("run", help="Run scenarios and write a JSON result file")
+    run_parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    run_parser.add_argument("--concurrency", default="1,16")
+    run_parser.add_argument("--duration", type=float, default=5.0)
+    run_parser.add_argument("--out", help="Result file (default: benchmarks/results/<timestamp>-<rev>.json)")
+    run_parser.add_argument("--dynamodb-endpoint", help="DynamoDB Local URL for the products-dynamodb runs")
+    run_parser.add_argument("--products-table", default="vm-poc-products-bench")
+    run_parser.add_argument("--entitlements", type=int, default=10_000, help="Entitlements in the FortiFlex mock")
+    run_parser.add_argument("--upstream-latency-ms", type=float, default=50.0, help="FortiFlex mock median latency")
+    run_parser.add_argument("--backend-latency", type=float, default=0.05, help="Gateway stub latency in seconds")
+    run_parser.add_argument("--saml-logins", type=int, default=2000, help="Signed SAML responses to pre-generate")
+    run_parser.add_argument("--micro-time", type=float, default=0.5, help="Seconds per micro-benchmark case")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub.add_parser("compare", help="Compare two result files and flag regressions")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    compare_parser.add_argument("--json", action="store_true")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
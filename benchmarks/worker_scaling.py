@@ -0,0 +1,111 @@
+"""Throughput of the fortiflex backend's pre-fork launcher by worker count.
+
+For each worker count ``python -m app.server`` is started with
+``WEB_CONCURRENCY=<n>`` and driven by ``--clients`` load generator processes
+(one Python client saturates about a core on its own, so a single one would
+hide the scaling). Req/s should grow with workers up to the number of cores
+left over for the server; on a 1-2 core machine it stays flat.
+
+Memory is reported as the summed RSS and PSS (proportional set size) of the
+master and workers: RSS counts pages shared copy-on-write once per process,
+PSS splits them, so a large gap means the preloaded state really is shared.
+
+    python -m benchmarks.worker_scaling
+    python -m benchmarks.worker_scaling --workers 1,2,4,8 --clients 4 --json
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.loadgen import LoadResult, format_table, run_load
+from benchmarks.services import APPS_DIR, free_port, spawn
+
+FORTIFLEX_APP_DIR = APPS_DIR / "vm-poc-backend-fortiflex" / "app"
+APP_ENV = {"PRODUCTS_TABLE_NAME": "", "SESSION_SECRET": "benchmark", "HTTP2_ENABLED": "false",
+           "LOG_LEVEL": "WARNING", "PYTHONPATH": str(FORTIFLEX_APP_DIR)}
+PATH = "/api/products?cloud=aws&sort=price&limit=50"
+
+
+def _client(url: str, concurrency: int, duration: float) -> LoadResult:
+    return asyncio.run(run_load("client", url, concurrency, duration))
+
+
+def memory_kb(pid: int) -> Optional[Dict[str, int]]:
+    """Summed RSS/PSS in kB of ``pid`` and its children (Linux only)."""
+    pids = [pid]
+    try:
+        for task in Path(f"/proc/{pid}/task").iterdir():
+            pids += [int(child) for child in (task / "children").read_text().split()]
+        totals = {"rss_kb": 0, "pss_kb": 0}
+        for process in pids:
+            for line in Path(f"/proc/{process}/smaps_rollup").read_text().splitlines():
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss"):
+                    totals[f"{key.lower()}_kb"] += int(value.split()[0])
+    except OSError:
+        return None
+    return totals
+
+
+def measure(workers: int, clients: int, concurrency: int, duration: float) -> Dict[str, Any]:
+    port = free_port()
+    args = [sys.executable, "-m", "app.server"]
+    env = {**APP_ENV, "PORT": str(port), "HOST": "127.0.0.1", "WEB_CONCURRENCY": str(workers)}
+    with spawn(args, port, cwd=FORTIFLEX_APP_DIR, env=env) as proc:
+        url = f"http://127.0.0.1:{port}{PATH}"
+        per_client = max(1, concurrency // clients)
+        with ProcessPoolExecutor(max_workers=clients) as pool:
+            parts = list(pool.map(_client, [url] * clients, [per_client] * clients, [duration] * clients))
+        memory = memory_kb(proc.pid)
+
+    merged = LoadResult(name=f"products filtered x{workers} workers", concurrency=per_client * clients,
+                        elapsed=max(part.elapsed for part in parts))
+    for part in parts:
+        merged.latencies += part.latencies
+        merged.errors += part.errors
+        for status, count in part.statuses.items():
+            merged.statuses[status] = merged.statuses.get(status, 0) + count
+    return {**merged.summary(), "workers": workers, **(memory or {})}
+
+
+def run(worker_counts: List[int], clients: int, concurrency: int, duration: float) -> List[Dict[str, Any]]:
+    rows = []
+    for workers in worker_counts:
+        rows.append(measure(workers, clients, concurrency, duration))
+        base = rows[0]["rps"]
+        rows[-1]["speedup"] = round(rows[-1]["rps"] / base, 2) if base else None
+        print(format_rows(rows[-1:]).splitlines()[-1], file=sys.stderr)
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'workers':>7} {'rps':>10} {'speedup':>8} {'p95_ms':>8} {'rss_mb':>8} {'pss_mb':>8}"]
+    for row in rows:
+        rss, pss = row.get("rss_kb"), row.get("pss_kb")
+        lines.append(f"{row['workers']:>7} {row['rps']:>10} {row.get('speedup') or '':>8} {row['p95_ms']:>8} "
+                     f"{(rss or 0) / 1024:>8.1f} {(pss or 0) / 1024:>8.1f}")
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Load generator processes")
+    parser.add_argument("--concurrency", type=int, default=64, help="Total in-flight requests")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    rows = run([int(n) for n in args.workers.split(",")], args.clients, args.concurrency, args.duration)
+    print(json.dumps(rows, indent=2) if args.json else format_table(rows) + "\n\n" + format_rows(rows))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,42 @@
 #!/usr/bin/env python3
-"""Seed the shared products DynamoDB table with catalog entries."""
+"""Seed the shared products DynamoDB table with catalog entries.
+
+The seed file is streamed, so large inputs never sit in memory: either a JSON
+array (``products_seed.json``) or JSON Lines with one product per line
+(``.gz`` files are decompressed on the fly). Each run diffs the input against
+the table: the current items are read with a parallel scan, and only new or
+changed products are written. Products missing from the input are deleted
+unless ``--keep-missing`` is given. Writes go out as 25-item
+``BatchWriteItem`` calls on ``--workers`` threads, and unprocessed items are
+retried with jittered exponential backoff.
+"""
 
 import argparse
+import gzip
+import hashlib
 import json
+import os
+import random
 import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from decimal import Decimal
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO
 
 import boto3
+from boto3.dynamodb.types import TypeSerializer
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 
+BATCH_SIZE = 25  # BatchWriteItem limit
+MAX_BATCH_ATTEMPTS = 8
+READ_CHUNK = 1 << 20
 
 def parse_args() -> argparse.Namespace:
     default_seed = Path(__file__).with_name("products_seed.json")
-    parser = argparse.ArgumentParser(description=__doc__)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument(
         "--table-name",
         required=True,
@@ -33,77 +56,478 @@ def parse_args() -> argparse.Namespace:
         "--seed-file",
         type=Path,
         default=default_seed,
-        help=f"Path to JSON seed data (defaults to {default_seed.name}).",
+        help=f"Path to a JSON array or JSON Lines seed file, optionally gzipped (defaults to {default_seed.name}).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Parallel BatchWriteItem threads (default: 8).",
+    )
+    parser.add_argument(
+        "--scan-segments",
+        type=int,
+        default=4,
+        help="Parallel scan segments used to read the current table contents (default: 4).",
+    )
+    parser.add_argument(
+        "--keep-missing",
+        action="store_true",
+        help="Do not delete products that are in the table but not in the seed file.",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Skip the diff and rewrite every product in the seed file.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Report what would be written and deleted without changing the table.",
+    )
+    parser.add_argument(
+        "--version-id",
+        default=os.getenv("CATALOG_VERSION_ID"),
+        help=(
+            "Id of the catalog version item (CATALOG_VERSION_ID); it is never deleted and is "
+            "bumped after changes so the backend reloads its snapshot."
+        ),
     )
     return parser.parse_args()
 
 
-def load_seed_data(path: Path) -> List[Dict[str, Any]]:
+def _open_seed(path: Path) -> TextIO:
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return path.open("r", encoding="utf-8")
+
+
+def _iter_json_array(handle: TextIO, decoder: json.JSONDecoder) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array, reading ``READ_CHUNK`` at a time."""
+    buffer, pos = "", 0
+
+    def more() -> bool:
+        nonlocal buffer, pos
+        chunk = handle.read(READ_CHUNK)
+        buffer, pos = buffer[pos:] + chunk, 0
+        return bool(chunk)
+
+    def peek() -> str:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not more():
+                return ""
+
+    if peek() != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    if peek() == "]":
+        return
+    while True:
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+                continue
+            if end == len(buffer) and more():
+                continue  # a trailing number may continue in the next chunk
+            break
+        pos = end
+        yield value
+        separator = peek()
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(f"expected ',' or ']' in JSON array, got {separator[:1]!r}")
+        pos += 1
+
+
+def iter_seed_data(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream products from a JSON array or JSON Lines file; numbers become Decimal."""
+    decoder = json.JSONDecoder(parse_float=Decimal)
     try:
-        with path.open("r", encoding="utf-8") as handle:
-            data = json.load(handle)
+        with _open_seed(path) as handle:
+            first = ""
+            while not first:
+                char = handle.read(1)
+                if not char:
+                    return
+                first = char.strip()
+            handle.seek(0)
+            if first == "[":
+                items: Iterator[Any] = _iter_json_array(handle, decoder)
+            else:
+                items = (decoder.decode(line) for line in handle if line.strip())
+            for index, product in enumerate(items):
+                if not isinstance(product, dict) or not isinstance(product.get("id"), str) or not product["id"]:
+                    raise SystemExit(f"Product #{index} in {path} needs a non-empty string 'id': {product!r:.200}")
+                yield product
     except FileNotFoundError as exc:
         raise SystemExit(f"Seed file not found: {path}") from exc
-    except json.JSONDecodeError as exc:
+    except (json.JSONDecodeError, ValueError) as exc:
         raise SystemExit(f"Invalid JSON in {path}: {exc}") from exc
 
-    if not isinstance(data, list):
-        raise SystemExit(f"Seed data must be a list of products, got: {type(data)}")
-    return data
 
+# Secondary indexes let the catalog service answer cloud/SKU lookups with
+# Query instead of Scan (see CLOUD_SKU_INDEX / SKU_INDEX in app/catalog.py).
+# GSI keys match exactly, so they are lower-cased copies of cloud/sku that
+# every written item carries (see with_index_keys); the API is case-insensitive.
+CLOUD_SKU_INDEX = "cloud-sku-lower-index"
+SKU_INDEX = "sku-lower-index"
+INDEXED_ATTRIBUTES = ("cloud", "sku")
 
-def ensure_table(client, table_name: str) -> None:
+ATTRIBUTE_DEFINITIONS = [
+    {"AttributeName": "id", "AttributeType": "S"},
+    {"AttributeName": "cloud_lower", "AttributeType": "S"},
+    {"AttributeName": "sku_lower", "AttributeType": "S"},
+]
+
+GLOBAL_SECONDARY_INDEXES = [
+    {
+        "IndexName": CLOUD_SKU_INDEX,
+        "KeySchema": [
+            {"AttributeName": "cloud_lower", "KeyType": "HASH"},
+            {"AttributeName": "sku_lower", "KeyType": "RANGE"},
+        ],
+        "Projection": {"ProjectionType": "ALL"},
+    },
+    {
+        "IndexName": SKU_INDEX,
+        "KeySchema": [{"AttributeName": "sku_lower", "KeyType": "HASH"}],
+        "Projection": {"ProjectionType": "ALL"},
+    },
+]
+
+
+def with_index_keys(product: Dict[str, Any]) -> Dict[str, Any]:
+    """The product plus the lower-cased GSI key attributes (``cloud_lower``, ``sku_lower``)."""
+    keyed = dict(product)
+    for attribute in INDEXED_ATTRIBUTES:
+        value = product.get(attribute)
+        # Index keys must be non-empty strings; such items are simply not indexed
+        if value is not None and str(value):
+            keyed[f"{attribute}_lower"] = str(value).lower()
+    return keyed
+
+
+def wait_for_indexes(client, table_name: str, timeout: float = 300.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        table = client.describe_table(TableName=table_name)["Table"]
+        statuses = [gsi.get("IndexStatus") for gsi in table.get("GlobalSecondaryIndexes", [])]
+        if all(status == "ACTIVE" for status in statuses):
+            return
+        time.sleep(5)
+    raise SystemExit(f"Timed out waiting for indexes on {table_name}")
+
+
+def ensure_indexes(client, table_name: str, description: Dict[str, Any]) -> None:
+    existing = {gsi["IndexName"] for gsi in description.get("GlobalSecondaryIndexes", [])}
+    for index in GLOBAL_SECONDARY_INDEXES:
+        if index["IndexName"] in existing:
+            continue
+        try:
+            # DynamoDB builds one new GSI per UpdateTable call
+            client.update_table(
+                TableName=table_name,
+                AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+                GlobalSecondaryIndexUpdates=[{"Create": index}],
+            )
+        except ClientError as exc:
+            raise SystemExit(
+                f"Failed to add index {index['IndexName']} to {table_name}: {exc}"
+            ) from exc
+        wait_for_indexes(client, table_name)
+        print(f"Added index {index['IndexName']} to {table_name}")
+
+
+def describe_table(client, table_name: str) -> Optional[Dict[str, Any]]:
+    """The table description, or None when it does not exist."""
     try:
-        client.describe_table(TableName=table_name)
-        return
+        return client.describe_table(TableName=table_name)["Table"]
     except client.exceptions.ResourceNotFoundException:
-        pass
+        return None
     except ClientError as exc:
         raise SystemExit(f"Failed to describe table {table_name}: {exc}") from exc
 
+
+def report_table_changes(client, table_name: str) -> bool:
+    """Dry run: print what ensure_table would change; returns whether the table exists."""
+    description = describe_table(client, table_name)
+    if description is None:
+        print(f"Dry run: would create DynamoDB table {table_name} with indexes "
+              f"{', '.join(index['IndexName'] for index in GLOBAL_SECONDARY_INDEXES)}")
+        return False
+    existing = {gsi["IndexName"] for gsi in description.get("GlobalSecondaryIndexes", [])}
+    for index in GLOBAL_SECONDARY_INDEXES:
+        if index["IndexName"] not in existing:
+            print(f"Dry run: would add index {index['IndexName']} to {table_name}")
+    return True
+
+
+def ensure_table(client, table_name: str) -> None:
+    description = describe_table(client, table_name)
+    if description is not None:
+        ensure_indexes(client, table_name, description)
+        return
+
     try:
         client.create_table(
             TableName=table_name,
             KeySchema=[{"AttributeName": "id", "KeyType": "HASH"}],
-            AttributeDefinitions=[{"AttributeName": "id", "AttributeType": "S"}],
+            AttributeDefinitions=ATTRIBUTE_DEFINITIONS,
+            GlobalSecondaryIndexes=GLOBAL_SECONDARY_INDEXES,
             BillingMode="PAY_PER_REQUEST",
         )
         client.get_waiter("table_exists").wait(TableName=table_name)
+        wait_for_indexes(client, table_name)
         print(f"Created DynamoDB table {table_name}")
     except ClientError as exc:
         raise SystemExit(f"Failed to create table {table_name}: {exc}") from exc
 
 
-def seed_table(
-    table, products: List[Dict[str, Any]], overwrite_keys: Optional[List[str]] = None
-) -> None:
-    overwrite_keys = overwrite_keys or ["id"]
+_serializer = TypeSerializer()
+
+
+def _normalize(value: Dict[str, Any]) -> Any:
+    """Canonical form of a typed attribute value, so seed and scanned items hash alike."""
+    (kind, raw), = value.items()
+    if kind == "N":
+        return {kind: str(Decimal(raw).normalize())}
+    if kind == "NS":
+        return {kind: sorted(str(Decimal(v).normalize()) for v in raw)}
+    if kind in ("SS", "BS"):
+        return {kind: sorted(raw)}
+    if kind == "M":
+        return {kind: {k: _normalize(v) for k, v in raw.items()}}
+    if kind == "L":
+        return {kind: [_normalize(v) for v in raw]}
+    return value
+
+
+def item_hash(typed_item: Dict[str, Any]) -> str:
+    canonical = {key: _normalize(value) for key, value in typed_item.items()}
+    raw = json.dumps(canonical, sort_keys=True, separators=(",", ":"),
+                     default=lambda v: v.hex() if isinstance(v, (bytes, bytearray)) else str(v))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SeedStats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.read = 0
+        self.written = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.duplicates = 0
+        self.retries = 0
+        self.read_capacity = 0.0
+        self.write_capacity = 0.0
+
+    def add_capacity(self, response: Dict[str, Any], write: bool) -> None:
+        consumed = response.get("ConsumedCapacity") or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        units = sum(float(entry.get("CapacityUnits", 0)) for entry in consumed)
+        with self.lock:
+            if write:
+                self.write_capacity += units
+            else:
+                self.read_capacity += units
+
+
+def _scan_segment(client, table_name: str, segment: int, total_segments: int,
+                  skip_id: Optional[str], stats: SeedStats) -> Dict[str, str]:
+    kwargs: Dict[str, Any] = {"TableName": table_name, "ReturnConsumedCapacity": "TOTAL"}
+    if total_segments > 1:
+        kwargs.update(Segment=segment, TotalSegments=total_segments)
+    hashes: Dict[str, str] = {}
+    while True:
+        response = client.scan(**kwargs)
+        stats.add_capacity(response, write=False)
+        for raw in response.get("Items", []):
+            item_id = raw["id"]["S"]
+            if item_id != skip_id:
+                hashes[item_id] = item_hash(raw)
+        last_key = response.get("LastEvaluatedKey")
+        if not last_key:
+            return hashes
+        kwargs["ExclusiveStartKey"] = last_key
+
+
+def scan_existing(client, table_name: str, segments: int, skip_id: Optional[str], stats: SeedStats) -> Dict[str, str]:
+    """Map every product id in the table to its content hash, using a parallel scan."""
+    segments = max(1, segments)
+    with ThreadPoolExecutor(max_workers=segments, thread_name_prefix="seed-scan") as pool:
+        parts = pool.map(
+            lambda segment: _scan_segment(client, table_name, segment, segments, skip_id, stats), range(segments)
+        )
+        existing: Dict[str, str] = {}
+        for part in parts:
+            existing.update(part)
+    return existing
+
+
+class ParallelBatchWriter:
+    """Groups put/delete requests into 25-item batches written on a thread pool."""
+
+    def __init__(self, client, table_name: str, workers: int, stats: SeedStats, dry_run: bool = False):
+        self.client = client
+        self.table_name = table_name
+        self.workers = max(1, workers)
+        self.stats = stats
+        self.dry_run = dry_run
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="seed-write")
+        self._inflight: Set[Future] = set()
+        self._pending: List[Dict[str, Any]] = []
+
+    def put(self, typed_item: Dict[str, Any]) -> None:
+        self._add({"PutRequest": {"Item": typed_item}})
+
+    def delete(self, item_id: str) -> None:
+        self._add({"DeleteRequest": {"Key": {"id": {"S": item_id}}}})
+
+    def _add(self, request: Dict[str, Any]) -> None:
+        self._pending.append(request)
+        if len(self._pending) == BATCH_SIZE:
+            self._submit()
+
+    def _submit(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch or self.dry_run:
+            return
+        # Bound queued batches so a fast reader cannot buffer the whole input
+        while len(self._inflight) >= self.workers * 2:
+            done, self._inflight = wait(self._inflight, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        self._inflight.add(self._pool.submit(self._write, batch))
+
+    def _write(self, requests: List[Dict[str, Any]]) -> None:
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            if attempt:
+                with self.stats.lock:
+                    self.stats.retries += 1
+                time.sleep(min(0.05 * 2 ** attempt, 5.0) * random.uniform(0.5, 1.0))
+            try:
+                response = self.client.batch_write_item(
+                    RequestItems={self.table_name: requests}, ReturnConsumedCapacity="TOTAL"
+                )
+            except ClientError as exc:
+                code = exc.response.get("Error", {}).get("Code", "")
+                if code in ("ProvisionedThroughputExceededException", "ThrottlingException", "RequestLimitExceeded"):
+                    continue
+                raise
+            self.stats.add_capacity(response, write=True)
+            requests = response.get("UnprocessedItems", {}).get(self.table_name) or []
+            if not requests:
+                return
+        raise RuntimeError(f"{len(requests)} items still unprocessed after {MAX_BATCH_ATTEMPTS} attempts")
+
+    def close(self) -> None:
+        self._submit()
+        try:
+            for future in self._inflight:
+                future.result()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def seed_table(client, table_name: str, products: Iterator[Dict[str, Any]], workers: int = 8,
+               scan_segments: int = 4, delete_missing: bool = True, full: bool = False,
+               dry_run: bool = False, version_id: Optional[str] = None) -> SeedStats:
+    """Write new/changed products, delete vanished ones and bump the catalog version item."""
+    stats = SeedStats()
+    existing = {} if full else scan_existing(client, table_name, scan_segments, version_id, stats)
+    seen: Set[str] = set()
+    catalog_digest = 0  # order-independent hash of the whole input
+    writer = ParallelBatchWriter(client, table_name, workers, stats, dry_run=dry_run)
     try:
-        with table.batch_writer(overwrite_by_pkeys=overwrite_keys) as batch:
-            for product in products:
-                batch.put_item(Item=product)
-    except (BotoCoreError, ClientError) as exc:
-        raise SystemExit(f"Failed to write seed data: {exc}") from exc
+        for product in products:
+            item_id = product["id"]
+            if item_id in seen or item_id == version_id:
+                stats.duplicates += 1
+                continue
+            seen.add(item_id)
+            stats.read += 1
+            typed = {key: _serializer.serialize(value) for key, value in with_index_keys(product).items()}
+            digest = item_hash(typed)
+            catalog_digest ^= int(digest, 16)
+            if existing.get(item_id) == digest:
+                stats.unchanged += 1
+                continue
+            writer.put(typed)
+            stats.written += 1
+        if delete_missing and not full:
+            for item_id in existing.keys() - seen:
+                writer.delete(item_id)
+                stats.deleted += 1
+    finally:
+        writer.close()
+
+    if version_id and (stats.written or stats.deleted) and not dry_run:
+        version = f"{catalog_digest:064x}"[:16]
+        client.put_item(TableName=table_name, Item={"id": {"S": version_id}, "version": {"S": version}})
+        print(f"Catalog version item {version_id} set to {version}")
+    return stats
 
 
 def main() -> int:
     args = parse_args()
-    session_kwargs: Dict[str, Any] = {}
+    client_kwargs: Dict[str, Any] = {}
     if args.region:
-        session_kwargs["region_name"] = args.region
-    resource_kwargs: Dict[str, Any] = session_kwargs.copy()
+        client_kwargs["region_name"] = args.region
     if args.endpoint_url:
-        resource_kwargs["endpoint_url"] = args.endpoint_url
-
-    products = load_seed_data(args.seed_file)
+        client_kwargs["endpoint_url"] = args.endpoint_url
+    config = Config(
+        max_pool_connections=max(args.workers, args.scan_segments) + 2,
+        retries={"max_attempts": 10, "mode": "standard"},
+    )
+    client = boto3.client("dynamodb", config=config, **client_kwargs)
+    table_exists = True
+    if args.dry_run:
+        # Only describe: a dry run never creates the table or adds indexes
+        table_exists = report_table_changes(client, args.table_name)
+    else:
+        ensure_table(client, args.table_name)
 
-    resource = boto3.resource("dynamodb", **resource_kwargs)
-    client = resource.meta.client
-    ensure_table(client, args.table_name)
-    table = resource.Table(args.table_name)
+    started = time.perf_counter()
+    try:
+        stats = seed_table(
+            client,
+            args.table_name,
+            iter_seed_data(args.seed_file),
+            workers=args.workers,
+            scan_segments=args.scan_segments,
+            delete_missing=not args.keep_missing,
+            # Nothing to diff against (or delete) in a table that does not exist yet
+            full=args.full or not table_exists,
+            dry_run=args.dry_run,
+            version_id=args.version_id,
+        )
+    except (BotoCoreError, ClientError, RuntimeError) as exc:
+        raise SystemExit(f"Failed to write seed data: {exc}") from exc
+    elapsed = time.perf_counter() - started
 
-    seed_table(table, products)
-    print(f"Seeded {len(products)} products into {args.table_name}")
+    prefix = "Dry run: would seed" if args.dry_run else "Seeded"
+    print(
+        f"{prefix} {stats.read} products into {args.table_name} in {elapsed:.2f}s "
+        f"({stats.read / elapsed if elapsed else 0:,.0f} items/s): {stats.written} written, "
+        f"{stats.unchanged} unchanged, {stats.deleted} deleted"
+    )
+    if stats.duplicates:
+        print(f"Skipped {stats.duplicates} duplicate or reserved ids (first occurrence wins)")
+    print(
+        f"Consumed {stats.read_capacity:,.1f} RCU (diff scan) and {stats.write_capacity:,.1f} WCU; "
+        f"{stats.retries} unprocessed-item retries"
+    )
     return 0
 
 